@@ -43,9 +43,12 @@ Modified by Yannis Maragos
 """
 import pygame
 from pygame.locals import *
+import sthelper
+from collections import OrderedDict
 
-pygame.font.init()
-PYGBUTTON_FONT = pygame.font.Font('freesansbold.ttf', 14)
+# the default font is loaded through the sthelper font registry on first use
+PYGBUTTON_FONT_FACE = 'freesansbold.ttf'
+PYGBUTTON_FONT_SIZE = 14
 
 BLACK = (0,   0,   0)
 WHITE = (255, 255, 255)
@@ -53,6 +56,13 @@ DARKGRAY = (64,  64,  64)
 GRAY = (128, 128, 128)
 LIGHTGRAY = (212, 208, 200)
 
+# rendered button surfaces shared by all buttons that look the same, keyed by
+# (size, caption, fgcolor, bgcolor, font) or (size, custom surfaces).
+# They must not be drawn on. The least recently used ones are dropped beyond
+# MAX_SKINS, e.g. the skins of old window sizes.
+MAX_SKINS = 256
+skins = OrderedDict()
+
 
 class PygButton(object):
     def __init__(self, rect=None, caption='', bid='', bgcolor=LIGHTGRAY, fgcolor=BLACK, font=None, normal=None, down=None, highlight=None):
@@ -94,7 +104,8 @@ class PygButton(object):
         self._fgcolor = fgcolor
 
         if font is None:
-            self._font = PYGBUTTON_FONT
+            self._font = sthelper.get_font(
+                PYGBUTTON_FONT_SIZE, PYGBUTTON_FONT_FACE)
         else:
             self._font = font
 
@@ -109,9 +120,6 @@ class PygButton(object):
 
         if normal is None:
             # create the surfaces for a text button
-            self.surfaceNormal = pygame.Surface(self._rect.size)
-            self.surfaceDown = pygame.Surface(self._rect.size)
-            self.surfaceHighlight = pygame.Surface(self._rect.size)
             self._update()  # draw the initial button images
         else:
             # create the surfaces for a custom image button
@@ -204,54 +212,72 @@ class PygButton(object):
     def _update(self):
         """Redraw the button's Surface object. Call this method when the button has changed appearance."""
         if self.customSurfaces:
-            self.surfaceNormal = pygame.transform.smoothscale(
-                self.origSurfaceNormal, self._rect.size)
-            self.surfaceDown = pygame.transform.smoothscale(
-                self.origSurfaceDown, self._rect.size)
-            self.surfaceHighlight = pygame.transform.smoothscale(
-                self.origSurfaceHighlight, self._rect.size)
-            return
+            key = (self._rect.size, self.origSurfaceNormal,
+                   self.origSurfaceDown, self.origSurfaceHighlight)
+        else:
+            key = (self._rect.size, self._caption, tuple(self._fgcolor),
+                   tuple(self._bgcolor), self._font)
+        skin = skins.get(key)
+        if skin is None:
+            skin = self._renderSkin()
+            skins[key] = skin
+            while len(skins) > MAX_SKINS:
+                skins.popitem(last=False)
+        else:
+            skins.move_to_end(key)
+        self.surfaceNormal, self.surfaceDown, self.surfaceHighlight = skin
+
+    def _renderSkin(self):
+        """Return new (normal, down, highlight) surfaces for the button's
+        current appearance."""
+        if self.customSurfaces:
+            return (pygame.transform.smoothscale(self.origSurfaceNormal, self._rect.size),
+                    pygame.transform.smoothscale(
+                        self.origSurfaceDown, self._rect.size),
+                    pygame.transform.smoothscale(self.origSurfaceHighlight, self._rect.size))
 
         w = self._rect.width  # syntactic sugar
         h = self._rect.height  # syntactic sugar
 
+        surfaceNormal = pygame.Surface(self._rect.size)
+        surfaceDown = pygame.Surface(self._rect.size)
+
         # fill background color for all buttons
-        self.surfaceNormal.fill(self.bgcolor)
-        self.surfaceDown.fill(self.bgcolor)
-        self.surfaceHighlight.fill(self.bgcolor)
+        surfaceNormal.fill(self.bgcolor)
+        surfaceDown.fill(self.bgcolor)
 
         # draw caption text for all buttons
         captionSurf = self._font.render(
             self._caption, True, self.fgcolor, self.bgcolor)
         captionRect = captionSurf.get_rect()
         captionRect.center = int(w / 2), int(h / 2)
-        self.surfaceNormal.blit(captionSurf, captionRect)
-        self.surfaceDown.blit(captionSurf, captionRect)
+        surfaceNormal.blit(captionSurf, captionRect)
+        surfaceDown.blit(captionSurf, captionRect)
 
         # draw border for normal button
-        pygame.draw.rect(self.surfaceNormal, BLACK, pygame.Rect(
+        pygame.draw.rect(surfaceNormal, BLACK, pygame.Rect(
             (0, 0, w, h)), 1)  # black border around everything
-        pygame.draw.line(self.surfaceNormal, WHITE, (1, 1), (w - 2, 1))
-        pygame.draw.line(self.surfaceNormal, WHITE, (1, 1), (1, h - 2))
-        pygame.draw.line(self.surfaceNormal, DARKGRAY,
+        pygame.draw.line(surfaceNormal, WHITE, (1, 1), (w - 2, 1))
+        pygame.draw.line(surfaceNormal, WHITE, (1, 1), (1, h - 2))
+        pygame.draw.line(surfaceNormal, DARKGRAY,
                          (1, h - 1), (w - 1, h - 1))
-        pygame.draw.line(self.surfaceNormal, DARKGRAY,
+        pygame.draw.line(surfaceNormal, DARKGRAY,
                          (w - 1, 1), (w - 1, h - 1))
-        pygame.draw.line(self.surfaceNormal, GRAY, (2, h - 2), (w - 2, h - 2))
-        pygame.draw.line(self.surfaceNormal, GRAY, (w - 2, 2), (w - 2, h - 2))
+        pygame.draw.line(surfaceNormal, GRAY, (2, h - 2), (w - 2, h - 2))
+        pygame.draw.line(surfaceNormal, GRAY, (w - 2, 2), (w - 2, h - 2))
 
         # draw border for down button
-        pygame.draw.rect(self.surfaceDown, BLACK, pygame.Rect(
+        pygame.draw.rect(surfaceDown, BLACK, pygame.Rect(
             (0, 0, w, h)), 1)  # black border around everything
-        pygame.draw.line(self.surfaceDown, WHITE, (1, 1), (w - 2, 1))
-        pygame.draw.line(self.surfaceDown, WHITE, (1, 1), (1, h - 2))
-        pygame.draw.line(self.surfaceDown, DARKGRAY, (1, h - 2), (1, 1))
-        pygame.draw.line(self.surfaceDown, DARKGRAY, (1, 1), (w - 2, 1))
-        pygame.draw.line(self.surfaceDown, GRAY, (2, h - 3), (2, 2))
-        pygame.draw.line(self.surfaceDown, GRAY, (2, 2), (w - 3, 2))
+        pygame.draw.line(surfaceDown, WHITE, (1, 1), (w - 2, 1))
+        pygame.draw.line(surfaceDown, WHITE, (1, 1), (1, h - 2))
+        pygame.draw.line(surfaceDown, DARKGRAY, (1, h - 2), (1, 1))
+        pygame.draw.line(surfaceDown, DARKGRAY, (1, 1), (w - 2, 1))
+        pygame.draw.line(surfaceDown, GRAY, (2, h - 3), (2, 2))
+        pygame.draw.line(surfaceDown, GRAY, (2, 2), (w - 3, 2))
 
-        # draw border for highlight button
-        self.surfaceHighlight = self.surfaceNormal
+        # the highlight button looks like the normal one
+        return (surfaceNormal, surfaceDown, surfaceNormal)
 
     def mouseClick(self, event):
         pass  # This class is meant to be overridden.
@@ -308,6 +334,8 @@ class PygButton(object):
         return self._caption
 
     def _propSetCaption(self, captionText):
+        if captionText == self._caption and not self.customSurfaces:
+            return  # nothing to redraw
         self.customSurfaces = False
         self._caption = captionText
         self._update()
@@ -323,8 +351,8 @@ class PygButton(object):
 
     def _propSetRect(self, newRect):
         # Note that changing the attributes of the Rect won't update the button. You have to re-assign the rect member.
+        self._rect = pygame.Rect(newRect)
         self._update()
-        self._rect = newRect
 
     def _propGetVisible(self):
         return self._visible
@@ -336,6 +364,8 @@ class PygButton(object):
         return self._fgcolor
 
     def _propSetFgColor(self, setting):
+        if setting == self._fgcolor and not self.customSurfaces:
+            return  # nothing to redraw
         self.customSurfaces = False
         self._fgcolor = setting
         self._update()
@@ -344,6 +374,8 @@ class PygButton(object):
         return self._bgcolor
 
     def _propSetBgColor(self, setting):
+        if setting == self._bgcolor and not self.customSurfaces:
+            return  # nothing to redraw
         self.customSurfaces = False
         self._bgcolor = setting
         self._update()
@@ -352,6 +384,8 @@ class PygButton(object):
         return self._font
 
     def _propSetFont(self, setting):
+        if setting == self._font and not self.customSurfaces:
+            return  # nothing to redraw
         self.customSurfaces = False
         self._font = setting
         self._update()
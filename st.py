@@ -27,7 +27,15 @@ import pygbutton
 import sys
 import os
 import sthelper
+import stlayout
+import strules
+import stboard
 import random
+import time
+from collections import deque, OrderedDict
+
+# posted when a music track ends, so that an idle loop wakes up
+MUSIC_END = pg.USEREVENT + 1
 
 
 class States(object):
@@ -37,21 +45,24 @@ class States(object):
     music_on = stconfig.MUSIC_ON
     sound_on = stconfig.SOUND_ON
     screen_copy = None
+    renderer = None  # sthelper.TextureRenderer, None for software rendering
 
     def __init__(self):
         self.done = False
         self.quit = False
         self.target = None
         self.dirty_rects = []
+        self.redraw = True
+        self.fps = 0
+        self.layers = sthelper.Compositor(stconfig.LAYERS)
         self.menuButtons = []
         self.soundButtons = []
+        self.buttons_screen_size = None
         self.dice_locked = False
 
         # load sounds
-        self.sound_button_hover = sthelper.load_sound('button-hover.wav')
-        self.sound_button_hover.set_volume(0.04)
-        self.sound_button_click = sthelper.load_sound('button-click.wav')
-        self.sound_button_click.set_volume(0.1)
+        self.sound_button_hover = sthelper.load_sound('button-hover.wav', 0.04)
+        self.sound_button_click = sthelper.load_sound('button-click.wav', 0.1)
 
         # load sound icons
         self.icon_music_on, self.rect_icon_music_on = sthelper.load_image(
@@ -111,12 +122,18 @@ class States(object):
     def update(self, screen):
         pass
 
-    def draw(self, screen, background):
+    def get_frame_rates(self):
+        """
+        Returns: dict of the frame rates needed by the state and its running
+        animations, 0 if the screen changes only in response to events
+        """
+        return {'state': self.fps}
+
+    def draw(self, screen):
         """
-        Blits persistent elements to background.
-        Final blit of background happens in this function.
+        Adds persistent elements to the frame and presents it.
         """
-        # draw sound icons buttons
+        # draw sound icons buttons, their icons change only when toggled
         if States.music_on == True:
             music_icon = self.icon_music_on
         else:
@@ -126,26 +143,90 @@ class States(object):
         else:
             sound_icon = self.icon_sound_off
 
-        musicToggleButton = pygbutton.PygButton((screen.get_width() - stconfig.TOOLBAR_WIDTH/2 - 1.5*music_icon.get_width(
-        ), stconfig.TOPBAR_HEIGHT/2 - music_icon.get_height()/2, music_icon.get_width(), music_icon.get_height()), bid="music_toggle", normal=music_icon)
-        soundToggleButton = pygbutton.PygButton((screen.get_width() - stconfig.TOOLBAR_WIDTH/2 + 0.5*sound_icon.get_width(
-        ), stconfig.TOPBAR_HEIGHT/2 - sound_icon.get_height()/2, sound_icon.get_width(), sound_icon.get_height()), bid="sound_toggle", normal=sound_icon)
+        for soundButton in self.soundButtons:
+            if soundButton._propGetId() == 'music_toggle':
+                icon = music_icon
+            else:
+                icon = sound_icon
+            if soundButton.surfaceNormal is not icon:
+                soundButton.setSurfaces(icon)
+            soundButton.draw(self.layers['hud'])
 
-        sound_buttons = {
-            "music_toggle": musicToggleButton,
-            "sound_toggle": soundToggleButton,
-        }
-        for (button_id, button) in sound_buttons.items():
-            button.draw(background)
-            if len(self.soundButtons) < len(sound_buttons):
-                self.soundButtons.append(button)
+        self.present(screen)
+
+    def prepare_buttons(self, screen):
+        """
+        Creates the persistent buttons of the state the first time it is
+        drawn, and again only if the screen size changes.
+        """
+        if self.buttons_screen_size != screen.get_size():
+            self.create_buttons(screen)
+            self.buttons_screen_size = screen.get_size()
+
+    def create_buttons(self, screen):
+        """
+        Creates the buttons that persist across frames.
+        Buttons render their appearance once and are redrawn only when
+        their visual state changes.
+        """
+        musicbox = stlayout.get_layout(screen.get_size()).musicbox
+        music_icon = self.icon_music_on
+        sound_icon = self.icon_sound_on
+        musicToggleButton = pygbutton.PygButton((musicbox.centerx - 1.5*music_icon.get_width(), musicbox.centery - music_icon.get_height()/2,
+                                                music_icon.get_width(), music_icon.get_height()), bid="music_toggle", normal=music_icon)
+        soundToggleButton = pygbutton.PygButton((musicbox.centerx + 0.5*sound_icon.get_width(), musicbox.centery - sound_icon.get_height()/2,
+                                                sound_icon.get_width(), sound_icon.get_height()), bid="sound_toggle", normal=sound_icon)
+        self.soundButtons = [musicToggleButton, soundToggleButton]
+
+    def draw_background(self, screen):
+        """
+        Returns a surface with the static part of the state's screen.
+        It is drawn again only on full redraws.
+        """
+        background = pg.Surface(screen.get_size())
+        background = background.convert()
+        return background
+
+    def draw_layers(self, screen):
+        """
+        Renders the static layers of the state's screen.
+        They are rendered again only on full redraws.
+        """
+        self.layers['chrome'].set_surface(self.draw_background(screen))
 
-        screen.blit(background, (0, 0))
+    def invalidate(self):
+        """
+        Requests a full redraw of the screen on the next frame.
+        """
+        self.redraw = True
+
+    def present(self, screen):
+        """
+        Composites the layers to the screen.
+        On a full redraw the static layers are rendered again and the whole
+        screen is redrawn. Otherwise only the areas where a layer differs from
+        the previous frame are redrawn.
+        The redrawn areas are left in self.dirty_rects for display update.
+        """
+        if self.redraw:
+            self.draw_layers(screen)
+            self.layers.invalidate()
+            self.redraw = False
+        if States.renderer is not None:
+            self.layers.render(States.renderer)
+        else:
+            self.dirty_rects = self.layers.compose(screen)
 
 
 class Menu(States):
     def __init__(self):
         States.__init__(self)
+        self.fps = stconfig.STATE_FPS['menu']
+        self.logo, self.rect_logo = sthelper.load_image('logo.png', True)
+        self.nick_image, self.rect_nick_image = sthelper.load_image(
+            'nick.png', True)
+        self.eugene_image, self.rect_eugene_image = sthelper.load_image(
+            'eugene.png', True)
         sthelper.play_music('game-music.mp3', 'stop')
         sthelper.play_music('lullaby.wav', 'stop')
         if States.music_on == True:
@@ -187,178 +268,174 @@ class Menu(States):
         self.draw(screen)
         super(Menu, self).update(screen)
 
-    def draw(self, screen):
+    def draw_background(self, screen):
         # fill a surface with a background color
-        background = pg.Surface(screen.get_size())
-        background = background.convert()
+        background = super(Menu, self).draw_background(screen)
         background.fill(stconfig.ST_PINK)
 
         # add logo image
-        logo, rect_logo = sthelper.load_image('logo.png', True)
-        background.blit(logo, (int(screen.get_width()/2) -
-                        int(logo.get_width()/2), int(logo.get_height()/2)))
+        background.blit(self.logo, (int(screen.get_width()/2) -
+                        int(self.logo.get_width()/2), int(self.logo.get_height()/2)))
 
         # add Nick image
-        nick_image, rect_nick_image = sthelper.load_image('nick.png', True)
-        background.blit(nick_image, (int(screen.get_width(
-        )/2) - (int(stconfig.MENUBUTTON_WIDTH/2) + 110), 2*logo.get_height() + 2*stconfig.MENUBUTTON_HEIGHT))
+        background.blit(self.nick_image, (int(screen.get_width(
+        )/2) - (int(stconfig.MENUBUTTON_WIDTH/2) + 110), 2*self.logo.get_height() + 2*stconfig.MENUBUTTON_HEIGHT))
 
         # add Eugene image
-        eugene_image, rect_eugene_image = sthelper.load_image(
-            'eugene.png', True)
-        background.blit(eugene_image, (int(screen.get_width()/2) + (int(stconfig.MENUBUTTON_WIDTH/2) +
-                        110) - eugene_image.get_width(), 2*logo.get_height() + 2*stconfig.MENUBUTTON_HEIGHT))
-
-        # add menu buttons
-        if States.game_on == True:
-            menu_buttons = {
-                "continue": ["Continue game", stconfig.ST_LIGHTGRAY, stconfig.ST_BLACK],
-                "game": ["New game", stconfig.ST_LIGHTGRAY, stconfig.ST_BLACK],
-                "help": ["Help", stconfig.ST_LIGHTGRAY, stconfig.ST_BLACK],
-                "credits": ["Credits", stconfig.ST_LIGHTGRAY, stconfig.ST_BLACK],
-                "exit": ["Exit game", stconfig.ST_LIGHTGRAY, stconfig.ST_BLACK]
-            }
-        else:
-            menu_buttons = {
-                "game": ["New game", stconfig.ST_LIGHTGRAY, stconfig.ST_BLACK],
-                "help": ["Help", stconfig.ST_LIGHTGRAY, stconfig.ST_BLACK],
-                "credits": ["Credits", stconfig.ST_LIGHTGRAY, stconfig.ST_BLACK],
-                "exit": ["Exit game", stconfig.ST_LIGHTGRAY, stconfig.ST_BLACK]
-            }
-        if len(self.menuButtons) != len(menu_buttons):
-            self.menuButtons = []
-        for i, (button_id, button) in enumerate(menu_buttons.items()):
-            y_offset = 2*logo.get_height() + (i+1)*(stconfig.MENUBUTTON_HEIGHT +
-                                                    stconfig.MENUBUTTON_SPACE)
-            menuButton = pygbutton.PygButton(((int(background.get_width()/2)) - int(stconfig.MENUBUTTON_WIDTH/2), y_offset,
-                                             stconfig.MENUBUTTON_WIDTH, stconfig.MENUBUTTON_HEIGHT), button[0], button_id, bgcolor=button[1], fgcolor=button[2])
-            menuButton.draw(background)
-            if len(self.menuButtons) < len(menu_buttons):
-                self.menuButtons.append(menuButton)
+        background.blit(self.eugene_image, (int(screen.get_width()/2) + (int(stconfig.MENUBUTTON_WIDTH/2) +
+                        110) - self.eugene_image.get_width(), 2*self.logo.get_height() + 2*stconfig.MENUBUTTON_HEIGHT))
 
         if pg.font:
             # add footer
-            font = pg.font.Font(None, 16)
-            footer = font.render('Sleeping Troubles v.' +
-                                 stconfig.ST_VERSION+' - '+stconfig.ST_YEAR+'', 1, stconfig.ST_BLACK40)
+            footer = sthelper.render_text('Sleeping Troubles v.' +
+                                          stconfig.ST_VERSION+' - '+stconfig.ST_YEAR+'', 16, stconfig.ST_BLACK40)
             footerpos = footer.get_rect(centerx=int(
                 background.get_width()/2), y=screen.get_height() - 30)
             background.blit(footer, (footerpos.x, footerpos.y))
 
-        super(Menu, self).draw(screen, background)
+        return background
 
+    def create_buttons(self, screen):
+        super(Menu, self).create_buttons(screen)
 
-class Board(object):
-    def __init__(self):
-        x = (stconfig.ST_SCREEN_WIDTH - stconfig.TOOLBAR_WIDTH -
-             stconfig.SQUARES_SPACE)/9 - stconfig.SQUARES_SPACE
-        x = float("{0:.2f}".format(x))
-        y = (stconfig.ST_SCREEN_HEIGHT - stconfig.TOPBAR_HEIGHT -
-             stconfig.SQUARES_SPACE)/8 - stconfig.SQUARES_SPACE
-        y = float("{0:.2f}".format(y))
-        self.square_width = x
-        self.square_height = y
-
-        # icons
-        self.icon_home, self.rect_icon_home = sthelper.load_image(
-            'home.png', True)
-        self.icon_hourglass, self.rect_icon_hourglass = sthelper.load_image(
-            'hourglass.png', True)
-        self.icon_telephone, self.rect_icon_telephone = sthelper.load_image(
-            'telephone.png', True)
-        self.icon_hourglass_white, self.rect_icon_hourglass_white = sthelper.load_image(
-            'hourglass-white.png', True)
-        self.icon_dreamcrystal, self.rect_icon_dreamcrystal = sthelper.load_image(
-            'dream-crystal.png', True)
-        self.icon_exclamation, self.rect_icon_exclamation = sthelper.load_image(
-            'exclamation.png', True)
-        self.icon_end, self.rect_icon_end = sthelper.load_image(
-            'sleeping.png', True)
-
-        # sounds
-        self.sound_normal = sthelper.load_sound('button-click.wav')
-        self.sound_lose_points = sthelper.load_sound('lose-points.wav')
-        self.sound_telephone = sthelper.load_sound('telephone.wav')
-        self.sound_gain_points = sthelper.load_sound('gain-points.wav')
-        self.sound_gain_points.set_volume(0.5)
-        self.sound_dream_crystal = sthelper.load_sound('dream-crystal.wav')
-        self.sound_kitchen = sthelper.load_sound('kitchen.wav')
-        self.sound_bathroom = sthelper.load_sound('bathroom.wav')
-        self.sound_weird_noises = sthelper.load_sound('weird-noises.wav')
-        self.sound_forgot_pill = sthelper.load_sound('forgot-pill.wav')
-        self.sound_points_reduced = sthelper.load_sound('points-reduced.wav')
-
-        self.squares = {
-            1: {"type": 'start',        "bcolor": stconfig.ST_ORANGE,      "coords": [1*stconfig.SQUARES_SPACE,          1*stconfig.SQUARES_SPACE],          "text": '',                  "fcolor": stconfig.ST_DARKORANGE, "icon": self.icon_home, "sound": self.sound_normal},
-            2: {"type": 'normal',       "bcolor": stconfig.ST_LIGHTERGRAY, "coords": [2*stconfig.SQUARES_SPACE + 1*x,    1*stconfig.SQUARES_SPACE],          "text": '',                  "fcolor": stconfig.ST_GRAY120, "icon": None, "sound": self.sound_normal},
-            3: {"type": 'tpoints:-2',   "bcolor": stconfig.ST_RED,         "coords": [3*stconfig.SQUARES_SPACE + 2*x,    1*stconfig.SQUARES_SPACE],          "text": '-2',                "fcolor": stconfig.ST_BLACK, "icon": self.icon_hourglass, "sound": self.sound_lose_points},
-            4: {"type": 'normal',       "bcolor": stconfig.ST_LIGHTERGRAY, "coords": [4*stconfig.SQUARES_SPACE + 3*x,    1*stconfig.SQUARES_SPACE],          "text": '',                  "fcolor": stconfig.ST_GRAY120, "icon": None, "sound": self.sound_normal},
-            5: {"type": 'normal',       "bcolor": stconfig.ST_LIGHTERGRAY, "coords": [5*stconfig.SQUARES_SPACE + 4*x,    1*stconfig.SQUARES_SPACE],          "text": '',                  "fcolor": stconfig.ST_GRAY120, "icon": None, "sound": self.sound_normal},
-            6: {"type": 'telephone',    "bcolor": stconfig.ST_YELLOW,      "coords": [6*stconfig.SQUARES_SPACE + 5*x,    1*stconfig.SQUARES_SPACE],          "text": '',                  "fcolor": stconfig.ST_GRAY120, "icon": self.icon_telephone, "sound": self.sound_telephone},
-            7: {"type": 'tpoints:2',    "bcolor": stconfig.ST_GREEN,       "coords": [7*stconfig.SQUARES_SPACE + 6*x,    1*stconfig.SQUARES_SPACE],          "text": '+2',                "fcolor": stconfig.ST_WHITE, "icon": self.icon_hourglass_white, "sound": self.sound_gain_points},
-            8: {"type": 'normal',       "bcolor": stconfig.ST_LIGHTERGRAY, "coords": [8*stconfig.SQUARES_SPACE + 7*x,    1*stconfig.SQUARES_SPACE],          "text": '',                  "fcolor": stconfig.ST_GRAY120, "icon": None, "sound": self.sound_normal},
-            9: {"type": 'dcrystals:1',  "bcolor": stconfig.ST_BLUE,        "coords": [9*stconfig.SQUARES_SPACE + 8*x,    1*stconfig.SQUARES_SPACE],          "text": '',                  "fcolor": stconfig.ST_GRAY120, "icon": self.icon_dreamcrystal, "sound": self.sound_dream_crystal},
-            10: {"type": 'normal',      "bcolor": stconfig.ST_LIGHTERGRAY, "coords": [9*stconfig.SQUARES_SPACE + 8*x,    2*stconfig.SQUARES_SPACE + y],      "text": '',                  "fcolor": stconfig.ST_GRAY120, "icon": None, "sound": self.sound_normal},
-            11: {"type": 'tpoints:-4',  "bcolor": stconfig.ST_RED,         "coords": [9*stconfig.SQUARES_SPACE + 8*x,    3*stconfig.SQUARES_SPACE + 2*y],    "text": '-4',                "fcolor": stconfig.ST_BLACK, "icon": self.icon_hourglass, "sound": self.sound_lose_points},
-            12: {"type": 'normal',      "bcolor": stconfig.ST_LIGHTERGRAY, "coords": [9*stconfig.SQUARES_SPACE + 8*x,    4*stconfig.SQUARES_SPACE + 3*y],    "text": '',                  "fcolor": stconfig.ST_GRAY120, "icon": None, "sound": self.sound_normal},
-            13: {"type": 'normal',      "bcolor": stconfig.ST_LIGHTERGRAY, "coords": [9*stconfig.SQUARES_SPACE + 8*x,    5*stconfig.SQUARES_SPACE + 4*y],    "text": '',                  "fcolor": stconfig.ST_GRAY120, "icon": None, "sound": self.sound_normal},
-            14: {"type": 'telephone',   "bcolor": stconfig.ST_YELLOW,      "coords": [9*stconfig.SQUARES_SPACE + 8*x,    6*stconfig.SQUARES_SPACE + 5*y],    "text": '',                  "fcolor": stconfig.ST_GRAY120, "icon": self.icon_telephone, "sound": self.sound_telephone},
-            15: {"type": 'tpoints:-2',  "bcolor": stconfig.ST_RED,         "coords": [9*stconfig.SQUARES_SPACE + 8*x,    7*stconfig.SQUARES_SPACE + 6*y],    "text": '-2',                "fcolor": stconfig.ST_BLACK, "icon": self.icon_hourglass, "sound": self.sound_lose_points},
-            16: {"type": 'kitchen',     "bcolor": stconfig.ST_ORANGE,      "coords": [9*stconfig.SQUARES_SPACE + 8*x,    8*stconfig.SQUARES_SPACE + 7*y],    "text": 'KITCHEN',           "fcolor": stconfig.ST_DARKORANGE, "icon": None, "sound": self.sound_kitchen},
-            17: {"type": 'normal',      "bcolor": stconfig.ST_LIGHTERGRAY, "coords": [8*stconfig.SQUARES_SPACE + 7*x,    8*stconfig.SQUARES_SPACE + 7*y],    "text": '',                  "fcolor": stconfig.ST_GRAY120, "icon": None, "sound": self.sound_normal},
-            18: {"type": 'normal',      "bcolor": stconfig.ST_LIGHTERGRAY, "coords": [7*stconfig.SQUARES_SPACE + 6*x,    8*stconfig.SQUARES_SPACE + 7*y],    "text": '',                  "fcolor": stconfig.ST_GRAY120, "icon": None, "sound": self.sound_normal},
-            19: {"type": 'dcrystals:1', "bcolor": stconfig.ST_BLUE,        "coords": [6*stconfig.SQUARES_SPACE + 5*x,    8*stconfig.SQUARES_SPACE + 7*y],    "text": '',                  "fcolor": stconfig.ST_GRAY120, "icon": self.icon_dreamcrystal, "sound": self.sound_dream_crystal},
-            20: {"type": 'normal',      "bcolor": stconfig.ST_LIGHTERGRAY, "coords": [5*stconfig.SQUARES_SPACE + 4*x,    8*stconfig.SQUARES_SPACE + 7*y],    "text": '',                  "fcolor": stconfig.ST_GRAY120, "icon": None, "sound": self.sound_normal},
-            21: {"type": 'tpoints:1',   "bcolor": stconfig.ST_GREEN,       "coords": [4*stconfig.SQUARES_SPACE + 3*x,    8*stconfig.SQUARES_SPACE + 7*y],    "text": '+1',                "fcolor": stconfig.ST_WHITE, "icon": self.icon_hourglass_white, "sound": self.sound_gain_points},
-            22: {"type": 'back:-7',     "bcolor": stconfig.ST_BLACK,       "coords": [3*stconfig.SQUARES_SPACE + 2*x,    8*stconfig.SQUARES_SPACE + 7*y],    "text": '7 squares back',    "fcolor": stconfig.ST_WHITE, "icon": self.icon_exclamation, "sound": self.sound_forgot_pill},
-            23: {"type": 'normal',      "bcolor": stconfig.ST_LIGHTERGRAY, "coords": [2*stconfig.SQUARES_SPACE + 1*x,    8*stconfig.SQUARES_SPACE + 7*y],    "text": '',                  "fcolor": stconfig.ST_GRAY120, "icon": None, "sound": self.sound_normal},
-            24: {"type": 'bathroom',    "bcolor": stconfig.ST_ORANGE,      "coords": [1*stconfig.SQUARES_SPACE,          8*stconfig.SQUARES_SPACE + 7*y],    "text": 'BATHROOM',          "fcolor": stconfig.ST_DARKORANGE, "icon": None, "sound": self.sound_bathroom},
-            25: {"type": 'tpoints:-2',  "bcolor": stconfig.ST_RED,         "coords": [1*stconfig.SQUARES_SPACE,          7*stconfig.SQUARES_SPACE + 6*y],    "text": '-2',                "fcolor": stconfig.ST_BLACK, "icon": self.icon_hourglass, "sound": self.sound_lose_points},
-            26: {"type": 'normal',      "bcolor": stconfig.ST_LIGHTERGRAY, "coords": [1*stconfig.SQUARES_SPACE,          6*stconfig.SQUARES_SPACE + 5*y],    "text": '',                  "fcolor": stconfig.ST_GRAY120, "icon": None, "sound": self.sound_normal},
-            27: {"type": 'telephone',   "bcolor": stconfig.ST_YELLOW,      "coords": [1*stconfig.SQUARES_SPACE,          5*stconfig.SQUARES_SPACE + 4*y],    "text": '',                  "fcolor": stconfig.ST_GRAY120, "icon": self.icon_telephone, "sound": self.sound_telephone},
-            28: {"type": 'normal',      "bcolor": stconfig.ST_LIGHTERGRAY, "coords": [1*stconfig.SQUARES_SPACE,          4*stconfig.SQUARES_SPACE + 3*y],    "text": '',                  "fcolor": stconfig.ST_GRAY120, "icon": None, "sound": self.sound_normal},
-            29: {"type": 'back:-6',     "bcolor": stconfig.ST_BLACK,       "coords": [1*stconfig.SQUARES_SPACE,          3*stconfig.SQUARES_SPACE + 2*y],    "text": '6 squares back',    "fcolor": stconfig.ST_WHITE, "icon": self.icon_exclamation, "sound": self.sound_weird_noises},
-            30: {"type": 'tpoints:1',   "bcolor": stconfig.ST_GREEN,       "coords": [2*stconfig.SQUARES_SPACE + 1*x,    3*stconfig.SQUARES_SPACE + 2*y],    "text": '+1',                "fcolor": stconfig.ST_WHITE, "icon": self.icon_hourglass_white, "sound": self.sound_gain_points},
-            31: {"type": 'normal',      "bcolor": stconfig.ST_LIGHTERGRAY, "coords": [3*stconfig.SQUARES_SPACE + 2*x,    3*stconfig.SQUARES_SPACE + 2*y],    "text": '',                  "fcolor": stconfig.ST_GRAY120, "icon": None, "sound": self.sound_normal},
-            32: {"type": 'dcrystals:1', "bcolor": stconfig.ST_BLUE,        "coords": [4*stconfig.SQUARES_SPACE + 3*x,    3*stconfig.SQUARES_SPACE + 2*y],    "text": '',                  "fcolor": stconfig.ST_GRAY120, "icon": self.icon_dreamcrystal, "sound": self.sound_dream_crystal},
-            33: {"type": 'normal',      "bcolor": stconfig.ST_LIGHTERGRAY, "coords": [5*stconfig.SQUARES_SPACE + 4*x,    3*stconfig.SQUARES_SPACE + 2*y],    "text": '',                  "fcolor": stconfig.ST_GRAY120, "icon": None, "sound": self.sound_normal},
-            34: {"type": 'tpoints:1',   "bcolor": stconfig.ST_GREEN,       "coords": [6*stconfig.SQUARES_SPACE + 5*x,    3*stconfig.SQUARES_SPACE + 2*y],    "text": '+1',                "fcolor": stconfig.ST_WHITE, "icon": self.icon_hourglass_white, "sound": self.sound_gain_points},
-            35: {"type": 'risk',        "bcolor": stconfig.ST_RED,         "coords": [7*stconfig.SQUARES_SPACE + 6*x,    3*stconfig.SQUARES_SPACE + 2*y],    "text": '',                  "fcolor": stconfig.ST_WHITE, "icon": self.icon_hourglass_white, "sound": self.sound_points_reduced},
-            36: {"type": 'normal',      "bcolor": stconfig.ST_LIGHTERGRAY, "coords": [7*stconfig.SQUARES_SPACE + 6*x,    4*stconfig.SQUARES_SPACE + 3*y],    "text": '',                  "fcolor": stconfig.ST_GRAY120, "icon": None, "sound": self.sound_normal},
-            37: {"type": 'tpoints:-2',  "bcolor": stconfig.ST_RED,         "coords": [7*stconfig.SQUARES_SPACE + 6*x,    5*stconfig.SQUARES_SPACE + 4*y],    "text": '-2',                "fcolor": stconfig.ST_BLACK, "icon": self.icon_hourglass, "sound": self.sound_lose_points},
-            38: {"type": 'normal',      "bcolor": stconfig.ST_LIGHTERGRAY, "coords": [7*stconfig.SQUARES_SPACE + 6*x,    6*stconfig.SQUARES_SPACE + 5*y],    "text": '',                  "fcolor": stconfig.ST_GRAY120, "icon": None, "sound": self.sound_normal},
-            39: {"type": 'normal',      "bcolor": stconfig.ST_LIGHTERGRAY, "coords": [6*stconfig.SQUARES_SPACE + 5*x,    6*stconfig.SQUARES_SPACE + 5*y],    "text": '',                  "fcolor": stconfig.ST_GRAY120, "icon": None, "sound": self.sound_normal},
-            40: {"type": 'tpoints:-4',  "bcolor": stconfig.ST_RED,         "coords": [5*stconfig.SQUARES_SPACE + 4*x,    6*stconfig.SQUARES_SPACE + 5*y],    "text": '-4',                "fcolor": stconfig.ST_BLACK, "icon": self.icon_hourglass, "sound": self.sound_lose_points},
-            41: {"type": 'end',         "bcolor": stconfig.ST_GREEN,       "coords": [4*stconfig.SQUARES_SPACE + 3*x,    6*stconfig.SQUARES_SPACE + 5*y],    "text": 'END',               "fcolor": stconfig.ST_WHITE, "icon": self.icon_end, "sound": None},
+        # menu buttons while a game is on and while it is not
+        menu_buttons = {
+            "continue": ["Continue game", stconfig.ST_LIGHTGRAY, stconfig.ST_BLACK],
+            "game": ["New game", stconfig.ST_LIGHTGRAY, stconfig.ST_BLACK],
+            "help": ["Help", stconfig.ST_LIGHTGRAY, stconfig.ST_BLACK],
+            "credits": ["Credits", stconfig.ST_LIGHTGRAY, stconfig.ST_BLACK],
+            "exit": ["Exit game", stconfig.ST_LIGHTGRAY, stconfig.ST_BLACK]
         }
+        self.gameOnButtons = []
+        self.gameOffButtons = []
+        for buttons in (self.gameOnButtons, self.gameOffButtons):
+            for button_id, button in menu_buttons.items():
+                if button_id == 'continue' and buttons is self.gameOffButtons:
+                    continue
+                y_offset = 2*self.logo.get_height() + (len(buttons)+1)*(stconfig.MENUBUTTON_HEIGHT +
+                                                                        stconfig.MENUBUTTON_SPACE)
+                menuButton = pygbutton.PygButton(((int(screen.get_width()/2)) - int(stconfig.MENUBUTTON_WIDTH/2), y_offset,
+                                                 stconfig.MENUBUTTON_WIDTH, stconfig.MENUBUTTON_HEIGHT), button[0], button_id, bgcolor=button[1], fgcolor=button[2])
+                buttons.append(menuButton)
 
-    def get_squares_count(self):
-        return self.squares_count
+    def draw(self, screen):
+        self.prepare_buttons(screen)
+
+        # add menu buttons
+        if States.game_on == True:
+            self.menuButtons = self.gameOnButtons
+        else:
+            self.menuButtons = self.gameOffButtons
+        for menuButton in self.menuButtons:
+            menuButton.draw(self.layers['hud'])
 
-    def get_squares(self):
-        return self.squares
+        super(Menu, self).draw(screen)
 
-    def get_square_width(self):
-        return self.square_width
 
-    def get_square_height(self):
-        return self.square_height
+class Board(object):
+    def __init__(self, layout):
+        """
+        layout: stboard.BoardLayout, the squares are kept as its arrays by
+        position, with the icons and sounds loaded once
+        """
+        # pre-rendered board, see get_surface()
+        self.surface = None
+        self.surface_screen_size = None
+
+        self.board_layout = layout
+        self.squares_count = len(layout)
+        self.icons = [sthelper.load_image(name, True)[0]
+                      for name in layout.icons]
+        self.sounds = [sthelper.load_sound(name, volume)
+                       for name, volume in layout.sounds]
+
+    def get_surface(self, screen_size):
+        """
+        Returns the board pre-rendered on a single surface.
+        The surface is built once and rebuilt only when the screen size changes.
+        """
+        if self.surface is None or self.surface_screen_size != screen_size:
+            self.surface = self.render(screen_size)
+            self.surface_screen_size = screen_size
+        return self.surface
 
-    def get_square_coords(self, position):
-        squares = self.get_squares()
-        coords = squares[position]['coords']
-        return coords
+    def render(self, screen_size):
+        """
+        Draws all squares on a new surface covering the board area,
+        i.e. the screen minus the topbar and the right toolbar.
+        Square rects come from the layout of the screen size, the icons
+        and texts are scaled with the squares.
+        """
+        layout = stlayout.get_layout(screen_size)
+        board = pg.Surface(layout.board.size)
+        board = board.convert()
+        board.fill(stconfig.ST_WHITE)
+
+        squares = self.board_layout
+        for position in range(1, self.squares_count + 1):
+            rect = layout.get_square_rect(squares.grids[position])
+            text = squares.texts[position]
+            text_color = squares.colors[squares.text_color_indices[position]]
+            icon_index = squares.icon_indices[position]
+            square = pg.Surface(rect.size)
+            square = square.convert()
+            square.fill(squares.colors[squares.color_indices[position]])
+            # draw border
+            pg.draw.rect(square, stconfig.ST_GRAY120,
+                         (0, 0, rect.width, rect.height), 1)
+
+            if pg.font and text != '' and icon_index < 0:
+                description = sthelper.render_text(
+                    text, layout.scale_size(22), text_color)
+                square.blit(description, (int(square.get_width()/2) - int(description.get_width(
+                )/2), int(square.get_height()/2) - int(description.get_height()/2)))
+
+            if icon_index >= 0:
+                icon = sthelper.assets.scale_image(
+                    self.icons[icon_index], layout.scale)
+                if text == '':
+                    y_offset = square.get_height()/2 - icon.get_height()/2
+                else:
+                    y_offset = layout.scale_size(10)
+                    if pg.font:
+                        description = sthelper.render_text(
+                            text, layout.scale_size(18), text_color)
+                        square.blit(
+                            description, (int(square.get_width()/2) - int(description.get_width()/2), layout.scale_size(55)))
+                square.blit(icon, (int(square.get_width(
+                )/2) - int(icon.get_width()/2), int(y_offset)))
+
+            board.blit(square, rect)
+
+        return board
+
+    def get_squares_count(self):
+        return self.squares_count
+
+    def get_square_grid(self, position):
+        return self.board_layout.grids[position]
 
     def get_square_sound(self, position):
-        squares = self.get_squares()
-        sound = squares[position]['sound']
-        return sound
+        index = self.board_layout.sound_indices[position]
+        if index < 0:
+            return None
+        return self.sounds[index]
+
 
+class Player(pg.sprite.DirtySprite):
+    """
+    Player token.
+    It walks from square to square through the points given to move_along().
+    """
 
-class Player(pg.sprite.Sprite):
     def __init__(self):
+        super(Player, self).__init__()
         self.position = 1
         self.image, self.rect_image = sthelper.load_image('player.png', True)
+        self.base_image = self.image
+        self.rect = self.image.get_rect()
+        self.path = []
+        self.path_time = 0.0
 
     def get_player_position(self):
         return self.position
@@ -370,12 +447,93 @@ class Player(pg.sprite.Sprite):
     def get_player_image(self):
         return self.image
 
+    def set_scale(self, scale):
+        """
+        Scales the token with the board squares.
+        """
+        image = sthelper.assets.scale_image(self.base_image, scale)
+        if image is not self.image:
+            self.image = image
+            self.rect.size = image.get_size()
+            self.dirty = 1
+
+    def place(self, pos):
+        """
+        Puts the token at pos (top left) at once.
+        """
+        self.path = []
+        self.set_pos(pos)
+
+    def set_pos(self, pos):
+        pos = (int(pos[0]), int(pos[1]))
+        if self.rect.topleft != pos:
+            self.rect.topleft = pos
+            self.dirty = 1
+
+    def move_along(self, points):
+        """
+        Starts moving the token through points (top left positions), taking
+        stconfig.PLAYER_SQUARE_TIME seconds from one point to the next.
+        """
+        self.path = [self.rect.topleft] + list(points)
+        self.path_time = 0.0
+
+    def is_moving(self):
+        return len(self.path) > 1
+
+    def update(self, dt):
+        if not self.is_moving():
+            return
+        self.path_time += dt
+        steps = self.path_time / stconfig.PLAYER_SQUARE_TIME
+        i = int(steps)
+        if i >= len(self.path) - 1:
+            # arrived
+            self.set_pos(self.path[-1])
+            self.path = []
+            return
+        t = steps - i
+        (x0, y0), (x1, y1) = self.path[i], self.path[i + 1]
+        self.set_pos((x0 + (x1 - x0) * t, y0 + (y1 - y0) * t))
+
+
+class Dice(pg.sprite.DirtySprite):
+    """
+    Dice shown in the toolbar.
+    """
+
+    def __init__(self, image):
+        super(Dice, self).__init__()
+        self.image = image
+        self.rect = image.get_rect()
+
+    def set_image(self, image, center):
+        """
+        Shows image centered at center, marking the sprite dirty only if
+        something changed.
+        """
+        pos = (int(center[0]) - int(image.get_width()/2),
+               int(center[1]) - int(image.get_height()/2))
+        if image is not self.image or self.rect.topleft != pos:
+            self.image = image
+            self.rect = image.get_rect(topleft=pos)
+            self.dirty = 1
+
 
 class Game(States):
     def __init__(self):
         States.__init__(self)
-        self.end = False
-        self.won_game = None
+        self.fps = stconfig.STATE_FPS['game']
+
+        # board layout, the default one if the chosen layout can't be loaded
+        try:
+            self.board_layout = stboard.load_board(stconfig.BOARD)
+        except (OSError, ValueError) as message:
+            print("Couldn't load board:", message)
+            self.board_layout = stboard.load_board(stboard.DEFAULT_BOARD)
+
+        # rules, position and inventory of the game
+        self.rules = strules.GameState(self.board_layout.board)
 
         # message
         self.message = 'Roll the dice!'
@@ -392,24 +550,26 @@ class Game(States):
         ]
         self.current_dice_roll = 0
         self.current_dice_image = self.dice_images[self.current_dice_roll][0]
+        # rotated dice faces shown while rolling
+        self.dice_roll_frames = [sthelper.build_rotation_frames(
+            image, stconfig.DICE_ROLL_ANGLE_STEP, stconfig.DICE_ROLL_SCALES) for (image, rect) in self.dice_images]
+        # faces shown while rolling don't affect the dice rolls
+        self.dice_roll_random = random.Random()
+        self.dice_roll_frame = None
+        self.dice_roll_face = 0
         self.rollDiceButtons = []
         self.dice_locked = False
-        self.sound_roll_dice = sthelper.load_sound('roll-dice.wav')
+        self.dice = Dice(self.current_dice_image)
+        self.sound_roll_dice = sthelper.load_sound('roll-dice.wav', 0.5)
         self.sound_roll_dice_length = sthelper.get_sound_duration(
             'roll-dice.wav')
         self.sound_roll_dice_timer = None
-        self.sound_roll_dice.set_volume(0.5)
 
         # inventory
         self.image_tpoint, self.rect_image_tpoint = sthelper.load_image(
             'hourglass.png', True)
         self.image_dcrystal, self.rect_image_dcrystal = sthelper.load_image(
             'dream-crystal.png', True)
-        self.tpoints = stconfig.STARTING_TPOINTS
-        self.dcrystals = stconfig.STARTING_DCRYSTALS
-
-        # position
-        self.position_type = None
 
         # images
         self.image_goodnight, self.rect_image_goodnight = sthelper.load_image(
@@ -419,24 +579,37 @@ class Game(States):
         self.image_eugene, self.rect_image_eugene = sthelper.load_image(
             'eugene.png', True)
 
-        # sounds
-        self.sound_dream_crystal = sthelper.load_sound('dream-crystal.wav')
-
-        # telephone
-        self.telephone_call = False
-        self.telephoneButtons = []
-
-        # kitchen
-        self.kitchen_stop = False
-        self.kitchenButtons = []
-
-        # move back squares
-        self.move_back = False
-        self.moveBackButtons = []
-
-        # risk
-        self.take_risk = False
-        self.takeRiskButtons = []
+        # screen positions, updated when the window is resized
+        self.layout = stlayout.get_layout(
+            (stconfig.ST_SCREEN_WIDTH, stconfig.ST_SCREEN_HEIGHT))
+
+        # player and dice sprites, drawn over the board
+        self.player = None
+        self.player_moving = False
+        self.sprites = pg.sprite.LayeredDirty()
+        self.sprites.add(self.dice, layer=0)
+        self.layers['sprites'].set_group(self.sprites)
+
+        # popup surfaces, without their buttons, the least recently used
+        # ones are dropped, e.g. the popups of old window sizes
+        self.popups = OrderedDict()
+
+        # popup buttons of the pending choice
+        self.choiceButtons = []
+
+        # optional advisor, the best option of the open popup and its overlay
+        self.advisor = None
+        self.advice = None
+        if stconfig.ADVISOR:
+            # a missing numpy, a bad solver cache or a board the solver
+            # rejects only turn the advisor off
+            try:
+                import stsolver
+                self.advisor = stsolver.solve_optimal(
+                    self.board_layout.board)
+            except (ImportError, OSError, ValueError) as message:
+                print("Couldn't load advisor:", message)
+                self.advisor = None
 
     def get_event(self, event, screen):
         for menuButton in self.menuButtons:
@@ -459,7 +632,7 @@ class Game(States):
                 if States.sound_on == True:
                     sthelper.play_sound(self.sound_button_hover)
             if 'click' in dice_events:
-                if self.dice_locked == False:
+                if self.dice_locked == False and self.rules.can_roll():
                     if States.sound_on == True:
                         sthelper.play_sound(self.sound_roll_dice)
                     self.roll_dice()
@@ -469,68 +642,20 @@ class Game(States):
                 self.done = True
                 self.target = 'pause'
                 # copy existing screen to States.screen_copy
-                screen_rect = pg.Rect(
-                    0, 0, screen.get_width(), screen.get_height())
-                screen_copy = screen.subsurface(screen_rect)
-                screen_copy = screen_copy.convert()
+                screen_copy = pg.Surface(screen.get_size()).convert()
+                self.layers.draw_last_frame(screen_copy)
                 States.screen_copy = screen_copy
 
-        for kitchenButton in self.kitchenButtons:
-            button_events = kitchenButton.handleEvent(event)
-            if 'click' in button_events:
-                if kitchenButton._propGetId() == 'forward':
-                    self.update_player_position(4)
-                    if States.sound_on == True:
-                        sthelper.play_sound(self.sound_button_click)
-                if kitchenButton._propGetId() == 'tpoints':
-                    self.tpoints += 2
-                    if States.sound_on == True:
-                        sthelper.play_sound(self.sound_button_click)
-                self.kitchen_stop = False
-                self.dice_locked = False
-                self.kitchenButtons = []
-            super(Game, self).get_button_events(button_events)
-
-        for moveBackButton in self.moveBackButtons:
-            button_events = moveBackButton.handleEvent(event)
-            if 'click' in button_events:
-                button_id = moveBackButton._propGetId().rsplit(':', 1)
-                if button_id[0] == 'back':
-                    self.update_player_position(int(button_id[1]))
-                if button_id[0] == 'dcrystals':
-                    if self.dcrystals > 0:
-                        self.dcrystals -= 1
-                    if States.sound_on == True:
-                        sthelper.play_sound(self.sound_dream_crystal)
-                self.move_back = False
-                self.dice_locked = False
-                self.moveBackButtons = []
-            super(Game, self).get_button_events(button_events)
-
-        for takeRiskButton in self.takeRiskButtons:
-            button_events = takeRiskButton.handleEvent(event)
-            if 'click' in button_events:
-                if takeRiskButton._propGetId() == 'bathroom':
-                    self.update_player_position(-11)
-                if takeRiskButton._propGetId() == 'risk':
-                    if States.sound_on == True:
-                        sthelper.play_sound(self.sound_dream_crystal, 'stop')
-                        sthelper.play_sound(self.sound_button_click)
-                self.take_risk = False
-                self.dice_locked = False
-                self.takeRiskButtons = []
-            super(Game, self).get_button_events(button_events)
-
-        for telephoneButton in self.telephoneButtons:
-            button_events = telephoneButton.handleEvent(event)
+        for choiceButton in self.choiceButtons:
+            button_events = choiceButton.handleEvent(event)
             if 'click' in button_events:
-                if telephoneButton._propGetId() == 'back':
-                    self.update_player_position(-4)
-                if telephoneButton._propGetId() == 'tpoints':
-                    self.tpoints -= 2
-                self.telephone_call = False
-                self.dice_locked = False
-                self.telephoneButtons = []
+                option = choiceButton._propGetId()
+                effect = self.rules.get_effect()[0]
+                self.choose(option)
+                if States.sound_on == True and option in effect.option_sounds:
+                    sthelper.play_sound(
+                        sthelper.load_sound(*effect.option_sounds[option]))
+                self.choiceButtons = []
             super(Game, self).get_button_events(button_events)
 
         super(Game, self).get_sound_button_events(event)
@@ -542,26 +667,22 @@ class Game(States):
         States.current_state = 'game'
 
         if States.game_on == False:
-            self.end = False
-            self.tpoints = stconfig.STARTING_TPOINTS
-            self.dcrystals = stconfig.STARTING_DCRYSTALS
+            self.rules = strules.GameState(self.board_layout.board)
+            self.advice = None
+            self.choiceButtons = []
 
             # create a bew board
-            self.board = Board()
-            self.squares = self.board.get_squares()
-            self.square_width = self.board.get_square_width()
-            self.square_height = self.board.get_square_height()
+            self.board = Board(self.board_layout)
 
             # create a new player
+            if self.player is not None:
+                self.sprites.remove(self.player)
             self.player = Player()
+            self.player_moving = False
+            self.sprites.add(self.player, layer=1)
             self.player_image = self.player.get_player_image()
-            self.current_position = self.player.get_player_position()
-            self.current_position_coords = self.board.get_square_coords(
-                self.current_position)
-            self.next_position = self.current_position
-            self.current_position_coords = self.board.get_square_coords(
-                self.current_position)
-            self.next_position_coords = self.current_position_coords
+            self.player.set_scale(self.layout.scale)
+            self.player.place(self.get_player_pos(self.rules.position))
 
             # reset dice
             self.dice_locked = False
@@ -573,7 +694,7 @@ class Game(States):
             # reset message
             self.message = 'Roll the dice.'
 
-        if self.end == True:
+        if self.rules.end == True:
             sthelper.play_music('menu-music.wav', 'stop')
             sthelper.play_music('game-music.mp3', 'stop')
             States.game_over = True
@@ -592,171 +713,339 @@ class Game(States):
         self.sound_roll_dice_timer = 0
         self.current_dice_roll = random.randint(1, 6)
 
+    def get_player_pos(self, position):
+        """
+        Returns: top left screen position of the player token on a square
+        """
+        rect = self.layout.get_square_rect(
+            self.board.get_square_grid(position))
+        image = self.player.image
+        return (self.layout.board.x + rect.x + int(rect.width/2) - int(image.get_width()/2),
+                self.layout.board.y + rect.y + int(rect.height/2) - int(image.get_height()/2))
+
     def update_player_position(self, dice_roll):
-        self.next_position = self.player.set_player_position(
-            self.current_position + dice_roll)
-        if self.next_position >= len(self.squares):
-            self.end = True
-            self.next_position = len(self.squares)
-        self.current_position_coords = self.board.get_square_coords(
-            self.current_position)
-        self.next_position_coords = self.board.get_square_coords(
-            self.next_position)
-        self.current_position = self.next_position
-        self.square_sound = self.board.get_square_sound(self.next_position)
+        start = self.rules.position
+        self.rules.roll(dice_roll, land=False)
+        self.walk_player(start)
+
+    def choose(self, option):
+        """
+        Makes the choice of a popup, the player walks if it has to move.
+        option: button id, one of strules.CHOICES
+        """
+        start = self.rules.position
+        self.advice = None
+        if self.rules.choose(option, land=False):
+            self.walk_player(start)
+        self.dice_locked = False
+
+    def walk_player(self, start):
+        """
+        Walks the player from square start to the square the rules moved
+        it to. The square applies when the player arrives, see land_player().
+        """
+        end = self.player.set_player_position(self.rules.position)
+
+        # walk through the squares in between
+        if end > start:
+            path = range(start + 1, end + 1)
+        else:
+            path = range(start - 1, end - 1, -1)
+        self.player.move_along([self.get_player_pos(position)
+                               for position in path])
+        self.player_moving = True
 
         # unlock dice
         self.sound_roll_dice_timer = None
         self.dice_locked = False
 
+    def land_player(self):
+        """
+        Applies the square the player arrived at.
+        """
+        self.player_moving = False
+        self.rules.land()
+        self.square_sound = self.board.get_square_sound(self.rules.position)
+
         # play square sound
         if self.square_sound:
             if States.sound_on == True:
                 sthelper.play_sound(self.square_sound)
 
-        # get position feedback
-        self.get_position_feedback()
+        # update message, the dice stays locked until a choice is made
+        self.update_message()
+        if self.rules.choice is not None:
+            self.dice_locked = True
+            if self.advisor is not None:
+                self.advice = self.get_advice()
 
-        # decide if game is won or lost
-        if self.end == True:
+        if self.rules.end == True:
             sthelper.play_music('menu-music.wav', 'stop')
             sthelper.play_music('game-music.mp3', 'stop')
             if States.music_on == True:
                 sthelper.play_music('lullaby.wav')
-            if self.tpoints > 0:
-                self.won_game = True
-            else:
-                self.won_game = False
 
-    def get_position_feedback(self):
-        self.position_type = self.squares[self.current_position]['type'].rsplit(
-            ':', 1)
+    def update_message(self):
+        message = self.rules.get_message()
+        if message is not None:
+            self.message = message
 
-        # update message
-        self.update_message()
+    def get_advice(self):
+        """
+        Looks up the best option of the pending choice, done once when the
+        popup opens.
+        Returns: tuple of the best option and the overlay drawn around its
+        button
+        """
+        option, win = self.advisor.get_advice(
+            self.rules.position, self.rules.tpoints, self.rules.dcrystals)
+        label = sthelper.render_text(
+            'Advised: %d%% to win' % round(win*100), 16, stconfig.ST_BLACK)
+        label_width = label.get_width() + 16
+        button_width, button_height = self.layout.popup_buttons[0].size
+        width = max(button_width + 12, label_width)
+        overlay = pg.Surface(
+            (width, button_height + 14 + label.get_height() + 6), pg.SRCALPHA)
+        pg.draw.rect(overlay, stconfig.ST_GREEN, (int(width/2) - int(button_width/2) - 6, 0,
+                                                  button_width + 12, button_height + 12), 4)
+        overlay.fill(stconfig.ST_GREEN, (int(width/2) - int(label_width/2), button_height + 14,
+                                         label_width, label.get_height() + 6))
+        overlay.blit(label, (int(width/2) - int(label.get_width()/2),
+                             button_height + 17))
+        return option, overlay
+
+    def draw_advice(self, buttons):
+        """
+        Draws the advisor overlay around the button of the best option.
+        """
+        if self.advice is None:
+            return
+        option, overlay = self.advice
+        for button in buttons:
+            if button._propGetId() == option:
+                self.layers['modal'].blit(overlay, (button.rect.centerx - int(overlay.get_width()/2),
+                                                    button.rect.top - 6))
+
+    def set_roll_dice_button(self, caption, bid, bgcolor):
+        """
+        Changes the dice roll button, it is rendered again only if its
+        caption or color actually change.
+        """
+        self.rollDiceButton._propSetId(bid)
+        self.rollDiceButton.caption = caption
+        self.rollDiceButton.bgcolor = bgcolor
 
-        # update inventory
-        self.update_inventory()
+    def get_popup(self, name, *params):
+        """
+        Returns the static part of a popup, rendered once per popup size and
+        reused while the popup is open and every time it opens again.
+        name: 'choice' or 'end'
+        params: the parts of the popup that vary, see render_popup
+        Returns: shared popup surface
+        """
+        key = (name, self.layout.popup.size) + params
+        popup = self.popups.get(key)
+        if popup is None:
+            popup = self.render_popup(name, *params)
+            self.popups[key] = popup
+            while len(self.popups) > stconfig.POPUP_CACHE_SIZE:
+                self.popups.popitem(last=False)
+        else:
+            self.popups.move_to_end(key)
+        return popup
 
-    def update_message(self):
-        if self.position_type[0] == 'normal':
-            self.message = 'Roll the dice again.'
-        elif self.position_type[0] == 'tpoints':
-            if int(self.position_type[1]) > 0:
-                self.message = 'Yes! You gain ' + \
-                    self.position_type[1] + \
-                    ' Time Points. Roll the dice again.'
+    def render_popup(self, name, *params):
+        """
+        Renders the frame, texts and images of a popup at the size of the
+        layout, its buttons are drawn separately.
+        name: 'choice' for the popup of a pending choice, 'end' for the
+        end of the game
+        params: for 'choice', frame_color and panel_color (RGB) and texts,
+        a tuple of (text, font size, color, top relative to the popup
+        center), all from the square effect, see strules.SquareEffect.
+        For 'end', whether the game was won.
+        Returns: popup surface
+        """
+        layout = self.layout
+        # texts and images, with their top relative to the popup center
+        texts = []
+        images = []
+        if name == 'choice':
+            frame_color, panel_color, choice_texts = params
+            for (text, size, color, y) in choice_texts:
+                texts.append((sthelper.render_text(
+                    text, layout.scale_size(size), color), layout.scale_size(y)))
+        elif name == 'end':
+            won_game, = params
+            if won_game == True:
+                frame_color, panel_color = stconfig.ST_GREEN, stconfig.ST_WHITE
+                image = sthelper.assets.scale_image(
+                    self.image_goodnight, layout.scale)
+                images.append((image, -int(image.get_height()/2)))
             else:
-                self.message = 'Hannibal starts barking and you lose ' + \
-                    self.position_type[1][1] + \
-                    ' Time Points. Roll the dice again.'
-        elif self.position_type[0] == 'dcrystals':
-            self.message = 'You gain a Dream Crystal. Roll the dice again.'
-        elif self.position_type[0] == 'bathroom':
-            self.message = 'You stop at the bathroom and your Time Points are restored to 8. Roll the dice again.'
-        elif self.position_type[0] == 'telephone':
-            self.message = 'Eugene calls you and has a new task for you. You must either move 4 squares back or lose 2 Time Points.'
-        elif self.position_type[0] == 'kitchen':
-            self.message = 'You stop at the kitchen. You can move 4 squares forward or gain 2 Time Points.'
-        elif self.position_type[0] == 'back':
-            self.message = 'You have to move back ' + \
-                str(abs(int(self.position_type[1]))) + \
-                ' squares unless you have a Dream Crystal to use.'
-        elif self.position_type[0] == 'risk':
-            self.message = 'Your Time Points are reduced to 1. Will you risk to continue or go back to the bathroom to restore your Time Points?'
-
-    def update_inventory(self):
-        if self.position_type[0] == 'tpoints':
-            self.tpoints += int(self.position_type[1])
-        elif self.position_type[0] == 'dcrystals':
-            self.dcrystals += int(self.position_type[1])
-        elif self.position_type[0] == 'bathroom':
-            self.tpoints = 8
-        elif self.position_type[0] == 'telephone':
-            self.telephone_call = True
-            self.dice_locked = True
-        elif self.position_type[0] == 'kitchen':
-            self.kitchen_stop = True
-            self.dice_locked = True
-        elif self.position_type[0] == 'back':
-            self.move_back = True
-            self.dice_locked = True
-        elif self.position_type[0] == 'risk':
-            self.tpoints = 1
-            self.take_risk = True
-            self.dice_locked = True
-
-        if self.tpoints <= 0:
-            self.tpoints = 0
-            self.end = True
+                frame_color, panel_color = stconfig.ST_RED, stconfig.ST_WHITE
+                images.append((sthelper.assets.scale_image(
+                    self.image_hannibal, layout.scale), layout.scale_size(30)))
+                texts.append((sthelper.render_text(
+                    'GAME OVER', layout.scale_size(44), stconfig.ST_RED), layout.scale_size(-100)))
+                texts.append((sthelper.render_text(
+                    'You lost all your Time Points.', layout.scale_size(24), stconfig.ST_RED), layout.scale_size(-50)))
+                texts.append((sthelper.render_text(
+                    'Eugene and Hannibal kept you up all night.', layout.scale_size(24), stconfig.ST_RED), layout.scale_size(-22)))
+
+        width, height = layout.popup.size
+        padding = layout.popup_padding
+        popup = pg.Surface((width, height))
+        popup = popup.convert()
+        popup.fill(frame_color)
+        pg.draw.rect(popup, stconfig.ST_BLACK,
+                     (0, 0, width - 1, height - 1), 2)
+        popup.fill(panel_color, (padding, padding,
+                   width - 2*padding, height - 2*padding))
+        for (surface, y) in images + texts:
+            popup.blit(surface, (int(width/2 - surface.get_width()/2),
+                                 int(height/2) + y))
+        return popup
 
     def update(self, screen, dt):
         self.draw(screen, dt)
         super(Game, self).update(screen)
 
-    def draw(self, screen, dt):
+    def get_frame_rates(self):
+        frame_rates = super(Game, self).get_frame_rates()
+        # the dice is rolling
+        if self.dice_locked == True and self.sound_roll_dice_timer != None:
+            frame_rates['dice'] = stconfig.DICE_ROLL_FRAME_RATE
+        # the player is walking
+        if self.player_moving == True:
+            frame_rates['player'] = stconfig.PLAYER_FPS
+        return frame_rates
+
+    def draw_background(self, screen):
+        layout = stlayout.get_layout(screen.get_size())
+
         # fill a surface with a background color
-        background = pg.Surface(screen.get_size())
-        background = background.convert()
+        background = super(Game, self).draw_background(screen)
         background.fill(stconfig.ST_WHITE)
-        self.background = background
 
         # draw topbar box
-        topbar = pg.Surface(
-            (screen.get_width()-stconfig.TOOLBAR_WIDTH, stconfig.TOPBAR_HEIGHT))
-        topbar = topbar.convert()
-        topbar.fill(stconfig.ST_PINK)
-        background.blit(topbar, (0, 0))
+        background.fill(stconfig.ST_PINK, layout.topbar)
 
-        # message box text
+        # message box title
         if pg.font:
-            font = pg.font.Font(None, 18)
-            message_box_title = font.render(
-                'Message: ', 1, stconfig.ST_BLACK100)
-            background.blit(message_box_title, (20, int(
-                stconfig.TOPBAR_HEIGHT/2) - int(message_box_title.get_height()/2) + 2))
-
-            if self.message:
-                font = pg.font.Font(None, 24)
-                self.message_text = font.render(
-                    self.message, 1, stconfig.ST_DARKORANGE)
-                background.blit(self.message_text, (100, int(
-                    stconfig.TOPBAR_HEIGHT/2) - int(message_box_title.get_height()/2)))
+            message_box_title = sthelper.render_text(
+                'Message: ', layout.message_title_size, stconfig.ST_BLACK100)
+            background.blit(message_box_title, (layout.message_title_x, layout.topbar_centery -
+                            int(message_box_title.get_height()/2) + 2))
 
         # draw right toolbar box
-        toolbar = pg.Surface((stconfig.TOOLBAR_WIDTH, screen.get_height()))
-        toolbar = toolbar.convert()
-        toolbar.fill(stconfig.ST_LIGHTERGRAY)
-        background.blit(
-            toolbar, (screen.get_width()-stconfig.TOOLBAR_WIDTH, 0))
+        background.fill(stconfig.ST_LIGHTERGRAY, layout.toolbar)
 
         # draw music controls background
-        musicbox = pg.Surface((stconfig.TOOLBAR_WIDTH, stconfig.TOPBAR_HEIGHT))
-        musicbox = musicbox.convert()
-        musicbox.fill(stconfig.ST_GRAY217)
-        background.blit(
-            musicbox, (screen.get_width()-stconfig.TOOLBAR_WIDTH, 0))
+        background.fill(stconfig.ST_GRAY217, layout.musicbox)
+
+        # draw dice background
+        background.fill(stconfig.ST_GRAY217, layout.dicebox)
+
+        # draw inventory
+        if pg.font:
+            # Title
+            inventorytitle = sthelper.render_text(
+                'INVENTORY', 22, stconfig.ST_BLACK60)
+            background.blit(inventorytitle, (layout.toolbar_centerx -
+                            int(inventorytitle.get_width()/2), layout.inventory_title_y))
+
+            # Time points
+            background.fill(stconfig.ST_GRAY217, layout.tpoints_box)
+
+            tpointstitle = sthelper.render_text(
+                'Time Points', 18, stconfig.ST_BLACK100)
+            background.blit(tpointstitle, (layout.tpoints_centerx -
+                            int(tpointstitle.get_width()/2), layout.inventory_label_y))
+            background.blit(self.image_tpoint, (layout.tpoints_centerx -
+                            int(self.image_tpoint.get_width()/2), layout.inventory_icon_y))
+
+            # Dream crystals
+            background.fill(stconfig.ST_GRAY217, layout.dcrystals_box)
+
+            dcrystalstitle = sthelper.render_text(
+                'Dream Crystals', 18, stconfig.ST_BLACK100)
+            background.blit(dcrystalstitle, (layout.dcrystals_centerx -
+                            int(dcrystalstitle.get_width()/2), layout.inventory_label_y))
+            background.blit(self.image_dcrystal, (layout.dcrystals_centerx -
+                            int(self.image_dcrystal.get_width()/2), layout.inventory_icon_y))
+
+        # add footer
+        if pg.font:
+            footer = sthelper.render_text('Sleeping Troubles v.' +
+                                          stconfig.ST_VERSION+' - '+stconfig.ST_YEAR+'', 16, stconfig.ST_BLACK40)
+            background.blit(footer, (layout.toolbar_centerx -
+                            int(footer.get_width()/2), layout.footer_y))
+
+        return background
+
+    def draw_layers(self, screen):
+        super(Game, self).draw_layers(screen)
+        self.layers['board'].set_surface(self.board.get_surface(
+            screen.get_size()), self.layout.board.topleft)
+
+    def create_buttons(self, screen):
+        super(Game, self).create_buttons(screen)
+        self.set_layout(stlayout.get_layout(screen.get_size()))
 
         # add menu buttons in right toolbar
+        self.menuButtons = []
         menu_buttons = {
             "menu": "Main menu"
         }
         for i, (button_id, button_text) in enumerate(menu_buttons.items()):
-            y_offset = (stconfig.TOPBAR_HEIGHT+25) + \
-                i*(stconfig.TOOLBAR_MENUBUTTON_HEIGHT+10)
-            menuButton = pygbutton.PygButton((screen.get_width() - stconfig.TOOLBAR_WIDTH/2 - stconfig.TOOLBAR_MENUBUTTON_WIDTH/2, y_offset,
-                                             stconfig.TOOLBAR_MENUBUTTON_WIDTH, stconfig.TOOLBAR_MENUBUTTON_HEIGHT), button_text, button_id, bgcolor=stconfig.ST_LIGHTGRAY)
-            menuButton.draw(background)
-            if len(self.menuButtons) < len(menu_buttons):
-                self.menuButtons.append(menuButton)
+            menuButton = pygbutton.PygButton(self.layout.get_menu_button(i), button_text, button_id,
+                                             bgcolor=stconfig.ST_LIGHTGRAY)
+            self.menuButtons.append(menuButton)
 
-        # draw dice background
-        dicebox = pg.Surface(
-            (stconfig.TOOLBAR_WIDTH - 2*10, stconfig.DICEBOX_HEIGHT))
-        dicebox = dicebox.convert()
-        dicebox.fill(stconfig.ST_GRAY217)
-        background.blit(dicebox, (screen.get_width()-(stconfig.TOOLBAR_WIDTH-10),
-                        stconfig.TOPBAR_HEIGHT + 2*25 + stconfig.TOOLBAR_MENUBUTTON_HEIGHT))
+        # add dice roll button, its caption changes with the dice state
+        self.rollDiceButton = pygbutton.PygButton(self.layout.roll_button, "ROLL DICE", 'roll-dice',
+                                                  bgcolor=stconfig.ST_ORANGE, font=sthelper.get_font(24))
+
+        # popup buttons are created again at the new screen center and size
+        self.choiceButtons = []
+        if self.advice is not None:
+            self.advice = self.get_advice()
+
+    def set_layout(self, layout):
+        """
+        Moves the player to the squares of a new layout.
+        A walking player is put on its destination square at once.
+        """
+        if layout is self.layout:
+            return
+        self.layout = layout
+        if self.player is not None:
+            self.player.set_scale(layout.scale)
+            self.player.place(self.get_player_pos(self.rules.position))
+
+    def draw(self, screen, dt):
+        self.prepare_buttons(screen)
+
+        # move player, the square applies when the player arrives
+        if self.player_moving == True:
+            self.player.update(dt)
+            if not self.player.is_moving():
+                self.land_player()
+
+        # message box text
+        if pg.font:
+            if self.message:
+                message_box_title = sthelper.render_text(
+                    'Message: ', self.layout.message_title_size, stconfig.ST_BLACK100)
+                self.message_text = sthelper.render_text(
+                    self.message, self.layout.message_size, stconfig.ST_DARKORANGE)
+                self.layers['hud'].blit(self.message_text, (self.layout.message_x, self.layout.topbar_centery -
+                                        int(message_box_title.get_height()/2)))
+
+        # draw menu buttons
+        for menuButton in self.menuButtons:
+            menuButton.draw(self.layers['hud'])
 
         # wait for dice roll to finish
         if self.dice_locked == True:
@@ -765,373 +1054,86 @@ class Game(States):
                 if self.sound_roll_dice_timer > self.sound_roll_dice_length:
                     # update current position
                     self.update_player_position(self.current_dice_roll)
-            if self.kitchen_stop == True or self.move_back == True or self.take_risk == True or self.telephone_call == True:
+            if self.rules.choice is not None:
                 self.current_dice_image = self.dice_images[self.current_dice_roll][0]
             else:
-                # blit random dice image
-                random_dice_image = random.randint(1, 6)
-                self.current_dice_image = self.dice_images[random_dice_image][0]
-                current_image = self.current_dice_image
-                self.current_dice_image = pg.transform.rotate(
-                    current_image, 45)
+                # blit random dice face, a new one on each animation frame
+                frame = int((self.sound_roll_dice_timer or 0) *
+                            stconfig.DICE_ROLL_FRAME_RATE)
+                if frame != self.dice_roll_frame:
+                    self.dice_roll_frame = frame
+                    self.dice_roll_face = self.dice_roll_random.randint(1, 6)
+                frames = self.dice_roll_frames[self.dice_roll_face]
+                self.current_dice_image = frames[frame % len(frames)]
         else:
             # blit current dice roll
             self.current_dice_image = self.dice_images[self.current_dice_roll][0]
 
-        # draw dice image
-        background.blit(self.current_dice_image, (screen.get_width() - int(stconfig.TOOLBAR_WIDTH/2) - int(
-            self.current_dice_image.get_width()/2), 230 - int(self.current_dice_image.get_height()/2)))
+        # show dice image
+        self.dice.set_image(self.current_dice_image, self.layout.dice_center)
 
         # draw dice roll button
-        if self.end == False:
-            if self.dice_locked == False:
-                rollDiceButton = pygbutton.PygButton((screen.get_width() - stconfig.TOOLBAR_WIDTH/2 - stconfig.ROLLBUTTON_WIDTH/2, 280, stconfig.ROLLBUTTON_WIDTH,
-                                                     stconfig.ROLLBUTTON_HEIGHT), "ROLL DICE", 'roll-dice', bgcolor=stconfig.ST_ORANGE, font=pg.font.Font(None, 24))
-                rollDiceButton.draw(background)
-                if len(self.rollDiceButtons) < 1:
-                    self.rollDiceButtons.append(rollDiceButton)
+        if self.rules.end == False:
+            if self.dice_locked == False and self.player_moving == False:
+                self.set_roll_dice_button(
+                    "ROLL DICE", 'roll-dice', stconfig.ST_ORANGE)
+                self.rollDiceButtons = [self.rollDiceButton]
             else:
-                rollDiceButton = pygbutton.PygButton((screen.get_width() - stconfig.TOOLBAR_WIDTH/2 - stconfig.ROLLBUTTON_WIDTH/2, 280, stconfig.ROLLBUTTON_WIDTH,
-                                                     stconfig.ROLLBUTTON_HEIGHT), "ROLLING...", 'rolling-dice', bgcolor=stconfig.ST_LIGHTGRAY, font=pg.font.Font(None, 24))
-                rollDiceButton.draw(background)
+                self.set_roll_dice_button(
+                    "ROLLING...", 'rolling-dice', stconfig.ST_LIGHTGRAY)
                 self.rollDiceButtons = []
         else:
-            rollDiceButton = pygbutton.PygButton((screen.get_width() - stconfig.TOOLBAR_WIDTH/2 - stconfig.ROLLBUTTON_WIDTH/2, 280, stconfig.ROLLBUTTON_WIDTH,
-                                                 stconfig.ROLLBUTTON_HEIGHT), "GAME OVER", 'game-over', bgcolor=stconfig.ST_LIGHTGRAY, font=pg.font.Font(None, 24))
-            rollDiceButton.draw(background)
+            self.set_roll_dice_button(
+                "GAME OVER", 'game-over', stconfig.ST_LIGHTGRAY)
             self.rollDiceButtons = []
+        self.rollDiceButton.draw(self.layers['hud'])
 
-        # draw inventory
-        if pg.font:
-            # Title
-            font = pg.font.Font(None, 22)
-            inventorytitle = font.render('INVENTORY', 1, stconfig.ST_BLACK60)
-            inventorytitlepos = inventorytitle.get_rect(x=background.get_width(
-            ) - int(stconfig.TOOLBAR_WIDTH/2) - int(inventorytitle.get_width()/2), y=410)
-            background.blit(
-                inventorytitle, (inventorytitlepos.x, inventorytitlepos.y))
-
-            # Time points
-            tpointsbox = pg.Surface((int(stconfig.TOOLBAR_WIDTH/2) - 15, 170))
-            tpointsbox = tpointsbox.convert()
-            tpointsbox.fill(stconfig.ST_GRAY217)
-            background.blit(
-                tpointsbox, (screen.get_width() - (stconfig.TOOLBAR_WIDTH - 10), 440))
-
-            font = pg.font.Font(None, 18)
-            tpointstitle = font.render('Time Points', 1, stconfig.ST_BLACK100)
-            tpointstitlepos = tpointstitle.get_rect(x=background.get_width(
-            ) - int(stconfig.TOOLBAR_WIDTH/2) - int(stconfig.TOOLBAR_WIDTH/4) - int(tpointstitle.get_width()/2), y=455)
-            background.blit(
-                tpointstitle, (tpointstitlepos.x, tpointstitlepos.y))
-            background.blit(self.image_tpoint, (background.get_width(
-            ) - int(stconfig.TOOLBAR_WIDTH/2) - int(stconfig.TOOLBAR_WIDTH/4) - int(self.image_tpoint.get_width()/2), 490))
-
-            font = pg.font.Font(None, 54)
-            tpointscount = font.render(
-                str(self.tpoints), 1, stconfig.ST_BLACK60)
-            tpointscountpos = tpointscount.get_rect(x=background.get_width(
-            ) - int(stconfig.TOOLBAR_WIDTH/2) - int(stconfig.TOOLBAR_WIDTH/4) - int(tpointscount.get_width()/2), y=560)
-            background.blit(
-                tpointscount, (tpointscountpos.x, tpointscountpos.y))
-
-            # Dream crystals
-            dcrystalsbox = pg.Surface(
-                (int(stconfig.TOOLBAR_WIDTH/2) - 15, 170))
-            dcrystalsbox = dcrystalsbox.convert()
-            dcrystalsbox.fill(stconfig.ST_GRAY217)
-            background.blit(dcrystalsbox, (screen.get_width() -
-                            (int(stconfig.TOOLBAR_WIDTH/2) - 5), 440))
-
-            font = pg.font.Font(None, 18)
-            dcrystalstitle = font.render(
-                'Dream Crystals', 1, stconfig.ST_BLACK100)
-            dcrystalstitlepos = dcrystalstitle.get_rect(x=background.get_width(
-            ) - int(stconfig.TOOLBAR_WIDTH/2) + int(stconfig.TOOLBAR_WIDTH/4) - int(dcrystalstitle.get_width()/2), y=455)
-            background.blit(
-                dcrystalstitle, (dcrystalstitlepos.x, dcrystalstitlepos.y))
-            background.blit(self.image_dcrystal, (background.get_width(
-            ) - int(stconfig.TOOLBAR_WIDTH/2) + int(stconfig.TOOLBAR_WIDTH/4) - int(self.image_dcrystal.get_width()/2), 490))
-
-            font = pg.font.Font(None, 54)
-            dcrystalscount = font.render(
-                str(self.dcrystals), 1, stconfig.ST_BLACK60)
-            dcrystalscountpos = dcrystalscount.get_rect(x=background.get_width(
-            ) - int(stconfig.TOOLBAR_WIDTH/2) + int(stconfig.TOOLBAR_WIDTH/4) - int(dcrystalscount.get_width()/2), y=560)
-            background.blit(
-                dcrystalscount, (dcrystalscountpos.x, dcrystalscountpos.y))
-
-        # add footer
+        # draw inventory counters
         if pg.font:
-            font = pg.font.Font(None, 16)
-            footer = font.render('Sleeping Troubles v.' +
-                                 stconfig.ST_VERSION+' - '+stconfig.ST_YEAR+'', 1, stconfig.ST_BLACK40)
-            footerpos = footer.get_rect(x=background.get_width(
-            ) - int(stconfig.TOOLBAR_WIDTH/2) - int(footer.get_width()/2), y=screen.get_height() - 30)
-            background.blit(footer, (footerpos.x, footerpos.y))
-
-        # draw board
-        for key in self.squares:
-            if self.squares[key]['coords'] and self.squares[key]['coords'] != []:
-                square = pg.Surface(
-                    (int(self.square_width), int(self.square_height)))
-                square = square.convert()
-                square.fill(self.squares[key]['bcolor'])
-                # draw border
-                pg.draw.rect(square, stconfig.ST_GRAY120, (0, 0, int(
-                    self.square_width), int(self.square_height)), 1)
-
-                if pg.font and self.squares[key]['text'] != '' and not self.squares[key]['icon']:
-                    font = pg.font.Font(None, 22)
-                    description = font.render(
-                        self.squares[key]['text'], 1, self.squares[key]['fcolor'])
-                    square.blit(description, (int(square.get_width()/2) - int(description.get_width(
-                    )/2), int(square.get_height()/2) - int(description.get_height()/2)))
-
-                if self.squares[key]['icon']:
-                    if self.squares[key]['text'] == '':
-                        y_offset = square.get_height()/2 - \
-                            self.squares[key]['icon'].get_height()/2
-                    else:
-                        y_offset = 10
-                        if pg.font:
-                            font = pg.font.Font(None, 18)
-                            text = font.render(
-                                self.squares[key]['text'], 1, self.squares[key]['fcolor'])
-                            square.blit(
-                                text, (int(square.get_width()/2) - int(text.get_width()/2), 55))
-                    square.blit(self.squares[key]['icon'], (int(square.get_width(
-                    )/2) - int(self.squares[key]['icon'].get_width()/2), int(y_offset)))
-
-                background.blit(square, (int(self.squares[key]['coords'][0]), int(
-                    stconfig.TOPBAR_HEIGHT) + int(self.squares[key]['coords'][1])))
-
-        # draw player
-        background.blit(self.player_image, (int(self.next_position_coords[0]) + int(self.square_width/2) - int(self.player_image.get_width(
-        )/2), stconfig.TOPBAR_HEIGHT + int(self.next_position_coords[1]) + int(self.square_height/2) - int(self.player_image.get_height()/2)))
-
-        # draw telephone popup
-        if self.telephone_call == True:
-            telephone_popup_bg = pg.Surface(
-                (stconfig.POPUP_WIDTH, stconfig.POPUP_HEIGHT))
-            telephone_popup_bg = telephone_popup_bg.convert()
-            telephone_popup_bg.fill(stconfig.ST_YELLOW)
-            pg.draw.rect(telephone_popup_bg, stconfig.ST_BLACK,
-                         (0, 0, stconfig.POPUP_WIDTH - 1, stconfig.POPUP_HEIGHT - 1), 2)
-            background.blit(telephone_popup_bg, (int(screen.get_width()/2) - int(telephone_popup_bg.get_width()/2),
-                            int(screen.get_height()/2) - int(telephone_popup_bg.get_height()/2)))
-            telephone_popup = pg.Surface(
-                (stconfig.POPUP_WIDTH - 2*stconfig.POPUP_PADDING, stconfig.POPUP_HEIGHT - 2*stconfig.POPUP_PADDING)).convert()
-            telephone_popup.fill(stconfig.ST_WHITE)
-            background.blit(telephone_popup, (int(screen.get_width()/2) - int(telephone_popup.get_width()/2),
-                            int(screen.get_height()/2) - int(telephone_popup.get_height()/2)))
-            font = pg.font.Font(None, 38)
-            telephone_title = font.render(
-                'YOU HAVE A TELEPHONE CALL', 1, stconfig.ST_PURPLE)
-            background.blit(telephone_title, (screen.get_width(
-            )/2 - telephone_title.get_width()/2, screen.get_height()/2 - 100))
-            font = pg.font.Font(None, 24)
-            telephone_text = font.render(
-                'Eugene calls you and has a new task for you.', 1, stconfig.ST_PURPLE)
-            background.blit(telephone_text, (screen.get_width(
-            )/2 - telephone_text.get_width()/2, screen.get_height()/2 - 50))
-
-            telephone_buttons = {
-                "back": "Move 4 squares back",
-                "tpoints": "Lose 2 Time Points"
-            }
-            for i, (button_id, button_text) in enumerate(telephone_buttons.items()):
-                x_offset = screen.get_width()/2 - telephone_popup.get_width() / \
-                    2 + 30 + i*stconfig.POPUP_BUTTON_WIDTH + i*30
-                telephoneButton = pygbutton.PygButton((x_offset, screen.get_height(
-                )/2, stconfig.POPUP_BUTTON_WIDTH, stconfig.POPUP_BUTTON_HEIGHT), button_text, button_id, bgcolor=stconfig.ST_PURPLE, fgcolor=stconfig.ST_YELLOW)
-                telephoneButton.draw(background)
-                if len(self.telephoneButtons) < len(telephone_buttons):
-                    self.telephoneButtons.append(telephoneButton)
-
-        # draw kitchen popup
-        if self.kitchen_stop == True:
-            kitchen_popup_bg = pg.Surface(
-                (stconfig.POPUP_WIDTH, stconfig.POPUP_HEIGHT))
-            kitchen_popup_bg = kitchen_popup_bg.convert()
-            kitchen_popup_bg.fill(stconfig.ST_ORANGE)
-            pg.draw.rect(kitchen_popup_bg, stconfig.ST_BLACK,
-                         (0, 0, stconfig.POPUP_WIDTH - 1, stconfig.POPUP_HEIGHT - 1), 2)
-            background.blit(kitchen_popup_bg, (screen.get_width(
-            )/2 - kitchen_popup_bg.get_width()/2, screen.get_height()/2 - kitchen_popup_bg.get_height()/2))
-            kitchen_popup = pg.Surface(
-                (stconfig.POPUP_WIDTH - 2*stconfig.POPUP_PADDING, stconfig.POPUP_HEIGHT - 2*stconfig.POPUP_PADDING)).convert()
-            kitchen_popup.fill(stconfig.ST_WHITE)
-            background.blit(kitchen_popup, (screen.get_width(
-            )/2 - kitchen_popup.get_width()/2, screen.get_height()/2 - kitchen_popup.get_height()/2))
-            font = pg.font.Font(None, 44)
-            kitchen_title = font.render(
-                'KITCHEN STOP', 1, stconfig.ST_DARKORANGE)
-            background.blit(kitchen_title, (screen.get_width(
-            )/2 - kitchen_title.get_width()/2, screen.get_height()/2 - 100))
-            font = pg.font.Font(None, 24)
-            kitchen_text = font.render(
-                'Select a Bonus', 1, stconfig.ST_DARKORANGE)
-            background.blit(kitchen_text, (screen.get_width(
-            )/2 - kitchen_text.get_width()/2, screen.get_height()/2 - 50))
-
-            kitchen_buttons = {
-                "forward": "Move 4 squares forward",
-                "tpoints": "Gain 2 Time Points"
-            }
-            for i, (button_id, button_text) in enumerate(kitchen_buttons.items()):
-                x_offset = screen.get_width()/2 - kitchen_popup.get_width() / \
-                    2 + 30 + i*stconfig.POPUP_BUTTON_WIDTH + i*30
-                kitchenButton = pygbutton.PygButton((x_offset, screen.get_height(
-                )/2, stconfig.POPUP_BUTTON_WIDTH, stconfig.POPUP_BUTTON_HEIGHT), button_text, button_id, bgcolor=stconfig.ST_ORANGE)
-                kitchenButton.draw(background)
-                if len(self.kitchenButtons) < len(kitchen_buttons):
-                    self.kitchenButtons.append(kitchenButton)
-
-        # draw move-back popup
-        if self.move_back == True:
-            move_back_popup_bg = pg.Surface(
-                (stconfig.POPUP_WIDTH, stconfig.POPUP_HEIGHT))
-            move_back_popup_bg = move_back_popup_bg.convert()
-            move_back_popup_bg.fill(stconfig.ST_RED)
-            pg.draw.rect(move_back_popup_bg, stconfig.ST_BLACK,
-                         (0, 0, stconfig.POPUP_WIDTH - 1, stconfig.POPUP_HEIGHT - 1), 2)
-            background.blit(move_back_popup_bg, (screen.get_width(
-            )/2 - move_back_popup_bg.get_width()/2, screen.get_height()/2 - move_back_popup_bg.get_height()/2))
-            move_back_popup = pg.Surface(
-                (stconfig.POPUP_WIDTH - 2*stconfig.POPUP_PADDING, stconfig.POPUP_HEIGHT - 2*stconfig.POPUP_PADDING)).convert()
-            move_back_popup.fill(stconfig.ST_BLACK)
-            background.blit(move_back_popup, (screen.get_width(
-            )/2 - move_back_popup.get_width()/2, screen.get_height()/2 - move_back_popup.get_height()/2))
-            font = pg.font.Font(None, 30)
-            if self.position_type[1] == '-6':
-                move_back_title = font.render(
-                    'WEIRD NOISES COMING FROM THE ATTIC', 1, stconfig.ST_DARKORANGE)
-            elif self.position_type[1] == '-7':
-                move_back_title = font.render(
-                    'YOU FORGOT TO TAKE YOUR VALERIAN PILL', 1, stconfig.ST_DARKORANGE)
-            background.blit(move_back_title, (screen.get_width(
-            )/2 - move_back_title.get_width()/2, screen.get_height()/2 - 100))
-            font = pg.font.Font(None, 22)
-
-            if self.dcrystals > 0:
-                move_back_text = font.render(
-                    'If you have a Dream Crystal you can avoid going back', 1, stconfig.ST_WHITE)
-
-                move_back_buttons = {
-                    "back:"+self.position_type[1]: "Move " + str(abs(int(self.position_type[1]))) + " squares back",
-                    "dcrystals": "Use a Dream Crystal"
-                }
-            else:
-                move_back_text = font.render(
-                    "You don't have a Dream Crystal. You must go back", 1, stconfig.ST_WHITE)
-
-                move_back_buttons = {
-                    "back:"+self.position_type[1]: "Move " + str(abs(int(self.position_type[1]))) + " squares back"
-                }
-
-            background.blit(move_back_text, (screen.get_width(
-            )/2 - move_back_text.get_width()/2, screen.get_height()/2 - 50))
-
-            for i, (button_id, button_text) in enumerate(move_back_buttons.items()):
-                x_offset = screen.get_width()/2 - move_back_popup.get_width() / \
-                    2 + 30 + i*stconfig.POPUP_BUTTON_WIDTH + i*30
-                moveBackButton = pygbutton.PygButton((x_offset, screen.get_height(
-                )/2, stconfig.POPUP_BUTTON_WIDTH, stconfig.POPUP_BUTTON_HEIGHT), button_text, button_id, bgcolor=stconfig.ST_LIGHTGRAY, fgcolor=stconfig.ST_BLACK)
-                moveBackButton.draw(background)
-                if len(self.moveBackButtons) < len(move_back_buttons):
-                    self.moveBackButtons.append(moveBackButton)
-
-        # draw risk popup
-        if self.take_risk == True:
-            take_risk_popup_bg = pg.Surface(
-                (stconfig.POPUP_WIDTH, stconfig.POPUP_HEIGHT))
-            take_risk_popup_bg = take_risk_popup_bg.convert()
-            take_risk_popup_bg.fill(stconfig.ST_YELLOW)
-            pg.draw.rect(take_risk_popup_bg, stconfig.ST_BLACK,
-                         (0, 0, stconfig.POPUP_WIDTH - 1, stconfig.POPUP_HEIGHT - 1), 2)
-            background.blit(take_risk_popup_bg, (screen.get_width(
-            )/2 - take_risk_popup_bg.get_width()/2, screen.get_height()/2 - take_risk_popup_bg.get_height()/2))
-            take_risk_popup = pg.Surface(
-                (stconfig.POPUP_WIDTH - 2*stconfig.POPUP_PADDING, stconfig.POPUP_HEIGHT - 2*stconfig.POPUP_PADDING)).convert()
-            take_risk_popup.fill(stconfig.ST_RED)
-            background.blit(take_risk_popup, (screen.get_width(
-            )/2 - take_risk_popup.get_width()/2, screen.get_height()/2 - take_risk_popup.get_height()/2))
-            font = pg.font.Font(None, 32)
-            take_risk_title = font.render(
-                'YOUR TIME POINTS ARE REDUCED TO 1', 1, stconfig.ST_YELLOW)
-            background.blit(take_risk_title, (screen.get_width(
-            )/2 - take_risk_title.get_width()/2, screen.get_height()/2 - 100))
-            font = pg.font.Font(None, 24)
-            take_risk_text = font.render(
-                'Will you risk to continue or go back?', 1, stconfig.ST_YELLOW)
-            background.blit(take_risk_text, (screen.get_width(
-            )/2 - take_risk_text.get_width()/2, screen.get_height()/2 - 50))
-
-            take_risk_buttons = {
-                "bathroom": "Go back to the Bathroom",
-                            "risk": "Take the risk"
-            }
-            for i, (button_id, button_text) in enumerate(take_risk_buttons.items()):
-                x_offset = screen.get_width()/2 - take_risk_popup.get_width() / \
-                    2 + 30 + i*stconfig.POPUP_BUTTON_WIDTH + i*30
-                takeRiskButton = pygbutton.PygButton((x_offset, screen.get_height(
-                )/2, stconfig.POPUP_BUTTON_WIDTH, stconfig.POPUP_BUTTON_HEIGHT), button_text, button_id, bgcolor=stconfig.ST_BLACK, fgcolor=stconfig.ST_YELLOW)
-                takeRiskButton.draw(background)
-                if len(self.takeRiskButtons) < len(take_risk_buttons):
-                    self.takeRiskButtons.append(takeRiskButton)
+            tpointscount = sthelper.render_text(
+                str(self.rules.tpoints), 54, stconfig.ST_BLACK60)
+            self.layers['hud'].blit(tpointscount, (self.layout.tpoints_centerx -
+                                    int(tpointscount.get_width()/2), self.layout.inventory_count_y))
+
+            dcrystalscount = sthelper.render_text(
+                str(self.rules.dcrystals), 54, stconfig.ST_BLACK60)
+            self.layers['hud'].blit(dcrystalscount, (self.layout.dcrystals_centerx -
+                                    int(dcrystalscount.get_width()/2), self.layout.inventory_count_y))
+
+        # popups are drawn at the center of the screen
+        popup_pos = self.layout.popup.topleft
+        popup_buttons = self.layout.popup_buttons
+
+        # draw the popup of the pending choice, as its square effect shows it
+        if self.rules.choice is not None:
+            effect, value = self.rules.get_effect()
+            self.layers['modal'].blit(self.get_popup('choice', effect.frame_color, effect.panel_color,
+                                                     effect.get_popup_texts(self.rules, value)), popup_pos)
+
+            # buttons are created once when the popup opens
+            if not self.choiceButtons:
+                font = sthelper.get_font(self.layout.scale_size(
+                    pygbutton.PYGBUTTON_FONT_SIZE), pygbutton.PYGBUTTON_FONT_FACE)
+                for i, option in enumerate(self.rules.get_choices()):
+                    choiceButton = pygbutton.PygButton(popup_buttons[i], effect.get_button_caption(option, value), option,
+                                                       bgcolor=effect.button_color, fgcolor=effect.button_text_color, font=font)
+                    self.choiceButtons.append(choiceButton)
+            for choiceButton in self.choiceButtons:
+                choiceButton.draw(self.layers['modal'])
+            self.draw_advice(self.choiceButtons)
 
         # draw end popup
-        if self.end == True:
-            end_popup_bg = pg.Surface(
-                (stconfig.POPUP_WIDTH, stconfig.POPUP_HEIGHT))
-            end_popup_bg = end_popup_bg.convert()
-            if self.won_game == True:
-                end_popup_bg.fill(stconfig.ST_GREEN)
-                pg.draw.rect(end_popup_bg, stconfig.ST_BLACK,
-                             (0, 0, stconfig.POPUP_WIDTH - 1, stconfig.POPUP_HEIGHT - 1), 2)
-                background.blit(end_popup_bg, (screen.get_width(
-                )/2 - end_popup_bg.get_width()/2, screen.get_height()/2 - end_popup_bg.get_height()/2))
-                end_popup = pg.Surface(
-                    (stconfig.POPUP_WIDTH - 2*stconfig.POPUP_PADDING, stconfig.POPUP_HEIGHT - 2*stconfig.POPUP_PADDING)).convert()
-                end_popup.fill(stconfig.ST_WHITE)
-                background.blit(end_popup, (screen.get_width(
-                )/2 - end_popup.get_width()/2, screen.get_height()/2 - end_popup.get_height()/2))
-                background.blit(self.image_goodnight, (screen.get_width(
-                )/2 - self.image_goodnight.get_width()/2, screen.get_height()/2 - self.image_goodnight.get_height()/2))
-            elif self.won_game == False:
-                end_popup_bg.fill(stconfig.ST_RED)
-                pg.draw.rect(end_popup_bg, stconfig.ST_BLACK,
-                             (0, 0, stconfig.POPUP_WIDTH - 1, stconfig.POPUP_HEIGHT - 1), 2)
-                background.blit(end_popup_bg, (screen.get_width(
-                )/2 - end_popup_bg.get_width()/2, screen.get_height()/2 - end_popup_bg.get_height()/2))
-                end_popup = pg.Surface(
-                    (stconfig.POPUP_WIDTH - 2*stconfig.POPUP_PADDING, stconfig.POPUP_HEIGHT - 2*stconfig.POPUP_PADDING)).convert()
-                end_popup.fill(stconfig.ST_WHITE)
-                background.blit(end_popup, (screen.get_width(
-                )/2 - end_popup.get_width()/2, screen.get_height()/2 - end_popup.get_height()/2))
-                background.blit(self.image_hannibal, (screen.get_width(
-                )/2 - self.image_hannibal.get_width()/2, screen.get_height()/2 + 30))
-                font = pg.font.Font(None, 44)
-                end_title = font.render('GAME OVER', 1, stconfig.ST_RED)
-                background.blit(end_title, (screen.get_width(
-                )/2 - end_title.get_width()/2, screen.get_height()/2 - 100))
-                font = pg.font.Font(None, 24)
-                end_text = font.render(
-                    'You lost all your Time Points.', 1, stconfig.ST_RED)
-                end_text_2 = font.render(
-                    'Eugene and Hannibal kept you up all night.', 1, stconfig.ST_RED)
-                background.blit(end_text, (screen.get_width(
-                )/2 - end_text.get_width()/2, screen.get_height()/2 - 50))
-                background.blit(end_text_2, (screen.get_width(
-                )/2 - end_text_2.get_width()/2, screen.get_height()/2 - 22))
-
-        super(Game, self).draw(screen, background)
+        if self.rules.end == True:
+            self.layers['modal'].blit(self.get_popup(
+                'end', self.rules.won), popup_pos)
+
+        super(Game, self).draw(screen)
 
 
 class Pause(States):
     def __init__(self):
         States.__init__(self)
+        self.fps = stconfig.STATE_FPS['pause']
 
     def get_event(self, event, screen):
         if event.type == pg.KEYDOWN:
@@ -1151,33 +1153,40 @@ class Pause(States):
     def update(self, screen, dt):
         self.draw(screen)
 
-    def draw(self, screen):
+    def draw_background(self, screen):
         # draw a transparent surface over the current screen
-        current_screen = States.screen_copy
+        background = super(Pause, self).draw_background(screen)
         mask = pg.Surface(screen.get_size())
         mask.fill(stconfig.ST_GRAY120)
         mask.set_alpha(220)
-        screen.blit(current_screen, (0, 0))
-        screen.blit(mask, (0, 0))
+        background.blit(States.screen_copy, (0, 0))
+        background.blit(mask, (0, 0))
 
         if pg.font:
-            font = pg.font.Font(None, 36)
-            pausetext = font.render('GAME IS PAUSED', 1, stconfig.ST_WHITE)
+            pausetext = sthelper.render_text(
+                'GAME IS PAUSED', 36, stconfig.ST_WHITE)
             pausetextpos = pausetext.get_rect(centerx=screen.get_width(
             )/2, y=screen.get_height()/2 - 2 * pausetext.get_height())
-            screen.blit(pausetext, (pausetextpos.x, pausetextpos.y))
+            background.blit(pausetext, (pausetextpos.x, pausetextpos.y))
 
-            font = pg.font.Font(None, 26)
-            pausesubtext = font.render(
-                "Press 'Esc' key to resume game", 1, stconfig.ST_WHITE)
+            pausesubtext = sthelper.render_text(
+                "Press 'Esc' key to resume game", 26, stconfig.ST_WHITE)
             pausesubtextpos = pausesubtext.get_rect(
                 centerx=screen.get_width()/2, y=screen.get_height()/2)
-            screen.blit(pausesubtext, (pausesubtextpos.x, pausesubtextpos.y))
+            background.blit(
+                pausesubtext, (pausesubtextpos.x, pausesubtextpos.y))
+
+        return background
+
+    def draw(self, screen):
+        # the paused screen is static, it is only drawn on full redraws
+        self.present(screen)
 
 
 class Help(States):
     def __init__(self):
         States.__init__(self)
+        self.fps = stconfig.STATE_FPS['help']
         self.hannibal_image, self.rect_hannibal_image = sthelper.load_image(
             'hannibal.png', True)
 
@@ -1205,56 +1214,31 @@ class Help(States):
 
         super(Help, self).update(screen)
 
-    def draw(self, screen):
+    def draw_background(self, screen):
+        layout = stlayout.get_layout(screen.get_size())
+
         # fill a surface with a background color
-        background = pg.Surface(screen.get_size())
-        background = background.convert()
+        background = super(Help, self).draw_background(screen)
         background.fill(stconfig.ST_WHITE)
 
         # draw topbar box
-        topbar = pg.Surface(
-            (screen.get_width()-stconfig.TOOLBAR_WIDTH, stconfig.TOPBAR_HEIGHT))
-        topbar = topbar.convert()
-        topbar.fill(stconfig.ST_PINK)
-        background.blit(topbar, (0, 0))
+        background.fill(stconfig.ST_PINK, layout.topbar)
 
         # draw right toolbar box
-        toolbar = pg.Surface((stconfig.TOOLBAR_WIDTH, screen.get_height()))
-        toolbar = toolbar.convert()
-        toolbar.fill(stconfig.ST_LIGHTERGRAY)
-        background.blit(
-            toolbar, (screen.get_width()-stconfig.TOOLBAR_WIDTH, 0))
+        background.fill(stconfig.ST_LIGHTERGRAY, layout.toolbar)
 
         # draw music controls background
-        musicbox = pg.Surface((stconfig.TOOLBAR_WIDTH, stconfig.TOPBAR_HEIGHT))
-        musicbox = musicbox.convert()
-        musicbox.fill(stconfig.ST_GRAY217)
-        background.blit(
-            musicbox, (screen.get_width()-stconfig.TOOLBAR_WIDTH, 0))
-
-        # add menu buttons
-        menu_buttons = {
-            "menu": "Main menu",
-        }
-        for i, (button_id, button_text) in enumerate(menu_buttons.items()):
-            y_offset = (stconfig.TOPBAR_HEIGHT+25) + \
-                i*(stconfig.TOOLBAR_MENUBUTTON_HEIGHT+10)
-            menuButton = pygbutton.PygButton((screen.get_width() - stconfig.TOOLBAR_WIDTH/2 - stconfig.TOOLBAR_MENUBUTTON_WIDTH/2, y_offset,
-                                             stconfig.TOOLBAR_MENUBUTTON_WIDTH, stconfig.TOOLBAR_MENUBUTTON_HEIGHT), button_text, button_id, bgcolor=stconfig.ST_LIGHTGRAY)
-            menuButton.draw(background)
-            if len(self.menuButtons) < len(menu_buttons):
-                self.menuButtons.append(menuButton)
+        background.fill(stconfig.ST_GRAY217, layout.musicbox)
 
         # draw Hannibal image
-        background.blit(self.hannibal_image, (screen.get_width(
-        ) - stconfig.TOOLBAR_WIDTH/2 - self.hannibal_image.get_width()/2, screen.get_height() - 180))
+        background.blit(self.hannibal_image, (layout.toolbar_centerx -
+                        self.hannibal_image.get_width()/2, layout.toolbar_image_y))
 
         if pg.font:
             # add title
-            font = pg.font.Font(None, 36)
-            title = font.render("Help", 1, stconfig.ST_BLACK)
+            title = sthelper.render_text("Help", 36, stconfig.ST_BLACK)
             background.blit(
-                title, (50, stconfig.TOPBAR_HEIGHT/2 - title.get_height()/2))
+                title, (50, layout.topbar_centery - title.get_height()/2))
 
             # add help text
             help_list = [
@@ -1266,11 +1250,9 @@ class Help(States):
                 ""
             ]
             for i, line in enumerate(help_list):
-                font = pg.font.Font(None, 24)
-                y_offset = 110 + i*37
-                text = font.render(line, 1, stconfig.ST_BLACK)
-                textpos = text.get_rect(x=50, y=y_offset)
-                background.blit(text, (textpos.x, textpos.y))
+                text = sthelper.render_text(
+                    line, layout.page_text_size, stconfig.ST_BLACK)
+                background.blit(text, (layout.page_x, layout.get_page_line(i)))
 
             # draw color squares
             color_squares = {
@@ -1282,31 +1264,52 @@ class Help(States):
                 "kitchen": ["Kitchen stop", stconfig.ST_ORANGE, "Nick moves 4 Squares forward or gains 2 Time Points.", stconfig.ST_BLACK],
                 "bathroom": ["Bathroom stop", stconfig.ST_ORANGE, "Nick's Time Points are restored to 8.", stconfig.ST_BLACK]
             }
+            font = sthelper.get_font(
+                layout.page_button_font_size, pygbutton.PYGBUTTON_FONT_FACE)
             for i, square in enumerate(color_squares):
-                colorSquare = pygbutton.PygButton(
-                    (50, 330+i*42, 140, 32), color_squares[square][0], bgcolor=color_squares[square][1], fgcolor=color_squares[square][3])
+                colorSquare = pygbutton.PygButton(layout.get_page_square(i), color_squares[square][0],
+                                                  bgcolor=color_squares[square][1], fgcolor=color_squares[square][3], font=font)
                 colorSquare.draw(background)
-                font = pg.font.Font(None, 24)
-                y_offset = 339+i*42
-                text = font.render(
-                    color_squares[square][2], 1, stconfig.ST_BLACK)
-                textpos = text.get_rect(x=200, y=y_offset)
-                background.blit(text, (textpos.x, textpos.y))
+                text = sthelper.render_text(
+                    color_squares[square][2], layout.page_text_size, stconfig.ST_BLACK)
+                background.blit(text, layout.get_page_square_text(i))
 
             # add footer
-            font = pg.font.Font(None, 16)
-            footer = font.render('Sleeping Troubles v.' +
-                                 stconfig.ST_VERSION+' - '+stconfig.ST_YEAR+'', 1, stconfig.ST_BLACK40)
-            footerpos = footer.get_rect(x=background.get_width(
-            ) - stconfig.TOOLBAR_WIDTH/2 - footer.get_width()/2, y=screen.get_height() - 30)
-            background.blit(footer, (footerpos.x, footerpos.y))
+            footer = sthelper.render_text('Sleeping Troubles v.' +
+                                          stconfig.ST_VERSION+' - '+stconfig.ST_YEAR+'', 16, stconfig.ST_BLACK40)
+            background.blit(footer, (layout.toolbar_centerx -
+                            footer.get_width()/2, layout.footer_y))
 
-        super(Help, self).draw(screen, background)
+        return background
+
+    def create_buttons(self, screen):
+        super(Help, self).create_buttons(screen)
+
+        # add menu buttons
+        self.menuButtons = []
+        menu_buttons = {
+            "menu": "Main menu",
+        }
+        layout = stlayout.get_layout(screen.get_size())
+        for i, (button_id, button_text) in enumerate(menu_buttons.items()):
+            menuButton = pygbutton.PygButton(layout.get_menu_button(i), button_text, button_id,
+                                             bgcolor=stconfig.ST_LIGHTGRAY)
+            self.menuButtons.append(menuButton)
+
+    def draw(self, screen):
+        self.prepare_buttons(screen)
+
+        # draw menu buttons
+        for menuButton in self.menuButtons:
+            menuButton.draw(self.layers['hud'])
+
+        super(Help, self).draw(screen)
 
 
 class Credits(States):
     def __init__(self):
         States.__init__(self)
+        self.fps = stconfig.STATE_FPS['credits']
         self.rascal_image, self.rect_rascal_image = sthelper.load_image(
             'rascal.png', True)
 
@@ -1334,56 +1337,31 @@ class Credits(States):
 
         super(Credits, self).update(screen)
 
-    def draw(self, screen):
+    def draw_background(self, screen):
+        layout = stlayout.get_layout(screen.get_size())
+
         # fill a surface with a background color
-        background = pg.Surface(screen.get_size())
-        background = background.convert()
+        background = super(Credits, self).draw_background(screen)
         background.fill(stconfig.ST_WHITE)
 
         # draw topbar box
-        topbar = pg.Surface(
-            (screen.get_width()-stconfig.TOOLBAR_WIDTH, stconfig.TOPBAR_HEIGHT))
-        topbar = topbar.convert()
-        topbar.fill(stconfig.ST_PINK)
-        background.blit(topbar, (0, 0))
+        background.fill(stconfig.ST_PINK, layout.topbar)
 
         # draw right toolbar box
-        toolbar = pg.Surface((stconfig.TOOLBAR_WIDTH, screen.get_height()))
-        toolbar = toolbar.convert()
-        toolbar.fill(stconfig.ST_LIGHTERGRAY)
-        background.blit(
-            toolbar, (screen.get_width()-stconfig.TOOLBAR_WIDTH, 0))
+        background.fill(stconfig.ST_LIGHTERGRAY, layout.toolbar)
 
         # draw music controls background
-        musicbox = pg.Surface((stconfig.TOOLBAR_WIDTH, stconfig.TOPBAR_HEIGHT))
-        musicbox = musicbox.convert()
-        musicbox.fill(stconfig.ST_GRAY217)
-        background.blit(
-            musicbox, (screen.get_width()-stconfig.TOOLBAR_WIDTH, 0))
+        background.fill(stconfig.ST_GRAY217, layout.musicbox)
 
         # draw Rascal image
-        background.blit(self.rascal_image, (screen.get_width(
-        ) - stconfig.TOOLBAR_WIDTH/2 - self.rascal_image.get_width()/2, screen.get_height() - 180))
-
-        # add menu buttons
-        menu_buttons = {
-            "menu": "Main menu",
-        }
-        for i, (button_id, button_text) in enumerate(menu_buttons.items()):
-            y_offset = (stconfig.TOPBAR_HEIGHT+25) + \
-                i*(stconfig.TOOLBAR_MENUBUTTON_HEIGHT+10)
-            menuButton = pygbutton.PygButton((screen.get_width() - stconfig.TOOLBAR_WIDTH/2 - stconfig.TOOLBAR_MENUBUTTON_WIDTH/2, y_offset,
-                                             stconfig.TOOLBAR_MENUBUTTON_WIDTH, stconfig.TOOLBAR_MENUBUTTON_HEIGHT), button_text, button_id, bgcolor=stconfig.ST_LIGHTGRAY)
-            menuButton.draw(background)
-            if len(self.menuButtons) < len(menu_buttons):
-                self.menuButtons.append(menuButton)
+        background.blit(self.rascal_image, (layout.toolbar_centerx -
+                        self.rascal_image.get_width()/2, layout.toolbar_image_y))
 
         if pg.font:
             # add title
-            font = pg.font.Font(None, 36)
-            title = font.render("Credits", 1, stconfig.ST_BLACK)
+            title = sthelper.render_text("Credits", 36, stconfig.ST_BLACK)
             background.blit(
-                title, (50, stconfig.TOPBAR_HEIGHT/2 - title.get_height()/2))
+                title, (50, layout.topbar_centery - title.get_height()/2))
 
             # add text
             credits_list = [
@@ -1394,21 +1372,123 @@ class Credits(States):
                 "Released under the terms of the GNU General Public License"
             ]
             for i, line in enumerate(credits_list):
-                font = pg.font.Font(None, 24)
-                y_offset = 110 + i*37
-                text = font.render(line, 1, stconfig.ST_BLACK)
-                textpos = text.get_rect(x=50, y=y_offset)
-                background.blit(text, (textpos.x, textpos.y))
+                text = sthelper.render_text(
+                    line, layout.page_text_size, stconfig.ST_BLACK)
+                background.blit(text, (layout.page_x, layout.get_page_line(i)))
 
             # add footer
-            font = pg.font.Font(None, 16)
-            footer = font.render('Sleeping Troubles v.' +
-                                 stconfig.ST_VERSION+' - '+stconfig.ST_YEAR+'', 1, stconfig.ST_BLACK40)
-            footerpos = footer.get_rect(x=background.get_width(
-            ) - stconfig.TOOLBAR_WIDTH/2 - footer.get_width()/2, y=screen.get_height() - 30)
-            background.blit(footer, (footerpos.x, footerpos.y))
+            footer = sthelper.render_text('Sleeping Troubles v.' +
+                                          stconfig.ST_VERSION+' - '+stconfig.ST_YEAR+'', 16, stconfig.ST_BLACK40)
+            background.blit(footer, (layout.toolbar_centerx -
+                            footer.get_width()/2, layout.footer_y))
+
+        return background
+
+    def create_buttons(self, screen):
+        super(Credits, self).create_buttons(screen)
+
+        # add menu buttons
+        self.menuButtons = []
+        menu_buttons = {
+            "menu": "Main menu",
+        }
+        layout = stlayout.get_layout(screen.get_size())
+        for i, (button_id, button_text) in enumerate(menu_buttons.items()):
+            menuButton = pygbutton.PygButton(layout.get_menu_button(i), button_text, button_id,
+                                             bgcolor=stconfig.ST_LIGHTGRAY)
+            self.menuButtons.append(menuButton)
+
+    def draw(self, screen):
+        self.prepare_buttons(screen)
+
+        # draw menu buttons
+        for menuButton in self.menuButtons:
+            menuButton.draw(self.layers['hud'])
+
+        super(Credits, self).draw(screen)
+
+
+class FrameScheduler(object):
+    """
+    Paces the frames of the main loop.
+    The frame rate is the highest one requested by the current state and its
+    animations, capped to max_fps. At 0 no frames are drawn until an event
+    arrives.
+    Contains:
+        - achieved frames count
+        - missed frames count, frames that were due but not drawn in time
+    """
+
+    def __init__(self, max_fps):
+        self.max_fps = max_fps
+        self.fps = 0
+        self.frames = 0
+        self.missed = 0
+        self.next_time = None
+        self.last_time = None
+        self.frame_times = deque(maxlen=stconfig.FRAME_STATS_SIZE)
+
+    def set_frame_rates(self, frame_rates):
+        """
+        frame_rates: dict of requested frame rates
+        """
+        self.fps = min(max(list(frame_rates.values()) + [0]), self.max_fps)
+
+    def reset(self):
+        """
+        Restarts pacing, the time until the next frame is not counted as
+        frame time.
+        """
+        self.next_time = None
+        self.last_time = None
+
+    def wait_frame(self):
+        """
+        Sleeps until the next frame is due.
+        Returns: time since the previous frame in seconds
+        """
+        period = 1.0 / self.fps
+        now = time.perf_counter()
+        if self.next_time is None:
+            self.next_time = now
+        elif now > self.next_time + period:
+            # the loop fell behind, skip the frames that are late
+            self.missed += int((now - self.next_time) / period)
+            self.next_time = now
+        else:
+            # sleep most of the time, then spin to be on time
+            remaining = self.next_time - now - stconfig.FRAME_SPIN_TIME
+            if remaining > 0:
+                time.sleep(remaining)
+            while time.perf_counter() < self.next_time:
+                pass
+            now = time.perf_counter()
+        self.next_time += period
+
+        if self.last_time is None:
+            dt = 0.0
+        else:
+            dt = now - self.last_time
+            self.frame_times.append(dt)
+        self.last_time = now
+        self.frames += 1
+        return dt
 
-        super(Credits, self).draw(screen, background)
+    def get_stats(self):
+        """
+        Returns: dict of the target frame rate, the frame rate achieved over
+        the last frames, and achieved and missed frames counts
+        """
+        if self.frame_times:
+            achieved_fps = len(self.frame_times) / sum(self.frame_times)
+        else:
+            achieved_fps = 0.0
+        return {
+            'fps': self.fps,
+            'achieved_fps': achieved_fps,
+            'frames': self.frames,
+            'missed': self.missed
+        }
 
 
 class Control:
@@ -1430,10 +1510,99 @@ class Control:
         self.window_icon = sthelper.load_window_icon('window_icon.png', -1)
         pg.display.set_icon(self.window_icon)
         # create display surface
-        self.screen = pg.display.set_mode(self.size)
+        self.fullscreen = stconfig.FULLSCREEN
+        # size of the window while in fullscreen
+        self.windowed_size = self.size
+        self.screen = None
+        if stconfig.RENDERER == 'gpu':
+            self.screen = self.create_renderer()
+        if self.screen is None:
+            self.screen = self.set_mode(self.size)
+        # decode common assets up front, they need the display surface to be converted
+        sthelper.assets.preload(stconfig.PRELOAD_IMAGES,
+                                stconfig.PRELOAD_SOUNDS)
         # set window title
         pg.display.set_caption('Sleeping Troubles')
-        self.clock = pg.time.Clock()
+        self.scheduler = FrameScheduler(self.fps)
+        # window state
+        self.focused = True
+        self.minimized = False
+        self.in_background = False
+        # wake up when the music ends
+        if pg.mixer and pg.mixer.get_init():
+            pg.mixer.music.set_endevent(MUSIC_END)
+
+    def create_renderer(self):
+        """
+        Sets up drawing through the SDL2 render API.
+        The display module keeps a hidden window, its surface is needed to
+        convert images and is used as the screen surface, while the frames
+        are presented in a window of the renderer.
+        Returns: screen surface, None if the render API is not available
+        """
+        try:
+            from pygame._sdl2 import video
+            window = video.Window('Sleeping Troubles', size=self.size,
+                                  resizable=stconfig.RESIZABLE, fullscreen_desktop=self.fullscreen)
+            screen = pg.display.set_mode(window.size, pg.HIDDEN)
+            window.set_icon(self.window_icon)
+            States.renderer = sthelper.TextureRenderer(window)
+        except (ImportError, AttributeError, RuntimeError, pg.error) as message:
+            print("Couldn't create renderer, using software rendering:", message)
+            States.renderer = None
+            return None
+        return screen
+
+    def set_mode(self, size):
+        """
+        Creates the display surface, resizable or fullscreen as configured.
+        Returns: screen surface
+        """
+        if self.fullscreen:
+            return pg.display.set_mode((0, 0), pg.FULLSCREEN)
+        flags = 0
+        if stconfig.RESIZABLE:
+            flags |= pg.RESIZABLE
+        return pg.display.set_mode(size, flags)
+
+    def resize(self, size):
+        """
+        Lays out the screen again for a new window size, the window is made
+        larger if it is smaller than the minimum size.
+        """
+        min_size = (max(size[0], stconfig.MIN_SCREEN_WIDTH),
+                    max(size[1], stconfig.MIN_SCREEN_HEIGHT))
+        if States.renderer is not None:
+            if min_size != size:
+                States.renderer.window.size = min_size
+            # the hidden display surface is only used as the screen surface
+            self.screen = pg.display.set_mode(min_size, pg.HIDDEN)
+        elif min_size != size:
+            self.screen = self.set_mode(min_size)
+        else:
+            self.screen = pg.display.get_surface()
+        self.state.invalidate()
+
+    def toggle_fullscreen(self):
+        """
+        Switches between fullscreen and a window, the window gets back the
+        size it had before going fullscreen.
+        """
+        self.fullscreen = not self.fullscreen
+        if States.renderer is not None:
+            window = States.renderer.window
+            if self.fullscreen:
+                self.windowed_size = window.size
+                window.set_fullscreen(True)
+            else:
+                window.set_windowed()
+                window.size = self.windowed_size
+            self.resize(window.size)
+        else:
+            if self.fullscreen:
+                self.windowed_size = self.screen.get_size()
+            self.screen = self.set_mode(self.windowed_size)
+            self.state.invalidate()
 
     def setup_states(self, state_dict, start_state):
         self.state_dict = state_dict
@@ -1446,6 +1615,7 @@ class Control:
         self.state.cleanup()
         self.state = self.state_dict[self.state_name]  # set new state
         self.state.startup()
+        self.state.invalidate()  # new state redraws the whole screen
 
     def update(self, dt):
         if self.state.quit:
@@ -1454,23 +1624,103 @@ class Control:
             self.change_state()
         self.state.update(self.screen, dt)
 
+    def handle_event(self, event):
+        if event.type == pg.QUIT:
+            self.done = True
+        elif event.type == pg.WINDOWCLOSE and States.renderer is not None:
+            # the hidden display window keeps SDL from sending QUIT
+            self.done = True
+        elif event.type in (pg.WINDOWFOCUSLOST, pg.WINDOWFOCUSGAINED, pg.WINDOWMINIMIZED,
+                            pg.WINDOWRESTORED, pg.WINDOWHIDDEN, pg.WINDOWSHOWN):
+            self.handle_window_event(event)
+        elif event.type == pg.WINDOWSIZECHANGED:
+            self.resize((event.x, event.y))
+        elif event.type == pg.KEYDOWN and event.key == pg.K_F11:
+            self.toggle_fullscreen()
+        self.state.get_event(event, self.screen)
+
+    def handle_window_event(self, event):
+        if event.type == pg.WINDOWFOCUSLOST:
+            self.focused = False
+        elif event.type == pg.WINDOWFOCUSGAINED:
+            self.focused = True
+        elif event.type in (pg.WINDOWMINIMIZED, pg.WINDOWHIDDEN):
+            self.minimized = True
+        elif event.type in (pg.WINDOWRESTORED, pg.WINDOWSHOWN):
+            self.minimized = False
+
+        # limit the frame rate while in the background
+        if self.minimized:
+            self.scheduler.max_fps = min(self.fps, stconfig.MINIMIZED_FPS)
+        elif not self.focused:
+            self.scheduler.max_fps = min(self.fps, stconfig.BACKGROUND_FPS)
+        else:
+            self.scheduler.max_fps = self.fps
+
+        in_background = self.minimized or not self.focused
+        if in_background != self.in_background:
+            self.in_background = in_background
+            self.set_background_music(in_background)
+            if not in_background:
+                # the window contents may have been lost
+                self.state.invalidate()
+
+    def set_background_music(self, in_background):
+        """
+        Pauses or ducks the music while the window is in the background
+        and restores it when the window comes back, see stconfig.BACKGROUND_MUSIC.
+        """
+        if stconfig.BACKGROUND_MUSIC == 'pause':
+            if in_background:
+                sthelper.play_music(None, 'pause')
+            else:
+                sthelper.play_music(None, 'unpause')
+        elif stconfig.BACKGROUND_MUSIC == 'duck':
+            if in_background:
+                sthelper.play_music(
+                    None, 'volume', volume=stconfig.BACKGROUND_MUSIC_VOLUME)
+            else:
+                sthelper.play_music(
+                    None, 'volume', volume=stconfig.MUSIC_VOLUME)
+
     def event_loop(self):
         for event in pg.event.get():
-            if event.type == pg.QUIT:
-                self.done = True
-            self.state.get_event(event, self.screen)
+            self.handle_event(event)
+
+    def is_idle(self):
+        """
+        Returns: True if nothing will change on the screen until an event arrives
+        """
+        return not (self.state.redraw or self.state.done or self.state.quit) and self.scheduler.fps == 0
+
+    def wait_event(self):
+        """
+        Sleeps until an event arrives or stconfig.IDLE_TIMEOUT passes,
+        then handles the event.
+        """
+        event = pg.event.wait(stconfig.IDLE_TIMEOUT)
+        if event.type != pg.NOEVENT:
+            self.handle_event(event)
 
     def main_game_loop(self):
         while not self.done:
-            delta_time = self.clock.tick(
-                self.fps)/1000.0  # time between frames
+            self.scheduler.set_frame_rates(self.state.get_frame_rates())
+            if self.is_idle():
+                # nothing is animating, don't draw frames until something happens
+                self.wait_event()
+                self.scheduler.reset()
+                delta_time = 0.0
+            elif self.scheduler.fps == 0:
+                # a state change or a redraw is pending
+                delta_time = 0.0
+            else:
+                delta_time = self.scheduler.wait_frame()  # time between frames
             self.event_loop()
             self.update(delta_time)
-            dirty_rects = self.state.dirty_rects
-            if dirty_rects != []:
-                pg.display.update(dirty_rects)
-            else:
-                pg.display.update()
+            # update only the areas of the screen that were redrawn
+            if self.state.dirty_rects:
+                pg.display.update(self.state.dirty_rects)
+                self.state.dirty_rects = []
 
 
 def run_game():
@@ -1513,21 +1763,8 @@ if __name__ == '__main__':
     # center pygame window on screen
     os.environ['SDL_VIDEO_CENTERED'] = '1'
 
-    run_game()
+    # board layout, e.g. python st.py --board default
+    if len(sys.argv) > 2 and sys.argv[1] == '--board':
+        stconfig.BOARD = sys.argv[2]
 
-# Dirty Rects
-    """
-    - Blit a piece of the background over the sprite's current location, erasing it.
-        # Example 1
-        area_to_copy = original_surface.get_rect(x=0,y=0,width=100,height=100)
-        destination_area = (0,500, 1300, 100)
-        target_surface.blit(original_surface, destination_area, area_to_copy)
-        # Example 2
-        area_to_copy = original_surface.subsurface((1200,0,100,100)).convert()
-        destination_area = (0,300)
-        target_surface.blit(area_to_copy, destination_area)
-    - Append the sprite's current location rectangle ((top,left,width,height)) to a list called dirty_rects.
-    - Move the sprite and Draw it at it's new location.
-    - Append the sprite's new location ((top,left,width,height)) to the dirty_rects list.
-    - Call display.update(dirty_rects)
-    """
+    run_game()
@@ -0,0 +1,187 @@
+"""
+Sleeping Troubles v0.1.3
+
+Sleeping Troubles is a simple board game, developed with Python and Pygame, implementing a State machine.
+Sleeping Troubles requires Pygame to be installed. Pygame can be downloaded from http://pygame.org.
+Developed by Yannis Maragos. Concept and design by Evi Filakouri.
+
+Copyright (C) 2018 Yannis Maragos.
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License version 2 only,
+as published by the Free Software Foundation.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import pygame as pg
+import os
+import json
+import stconfig
+
+MANIFEST = 'atlas.json'
+VERSION = 1
+
+
+def pack_shelves(sizes, width, height, padding=0):
+    """
+    Packs rectangles into sheets, in rows (shelves) of decreasing height.
+    sizes: list of (width, height)
+    width, height: largest sheet size
+    padding: pixels left empty around each rectangle
+    Returns: tuple of list of (sheet, x, y) in the order of sizes,
+    list of (width, height) of the sheets
+    """
+    places = [None] * len(sizes)
+    sheets = []
+    x = y = shelf_height = 0
+    order = sorted(range(len(sizes)), key=lambda i: (
+        sizes[i][1], sizes[i][0]), reverse=True)
+    for i in order:
+        w, h = sizes[i][0] + 2*padding, sizes[i][1] + 2*padding
+        if w > width or h > height:
+            raise ValueError('image larger than the atlas sheet: %dx%d' %
+                             tuple(sizes[i]))
+        if not sheets or x + w > width:
+            # next shelf
+            x, y, shelf_height = 0, y + shelf_height, 0
+        if not sheets or y + h > height:
+            # next sheet
+            sheets.append([0, 0])
+            x = y = shelf_height = 0
+        places[i] = (len(sheets) - 1, x + padding, y + padding)
+        x += w
+        shelf_height = max(shelf_height, h)
+        sheet = sheets[-1]
+        sheet[0] = max(sheet[0], x)
+        sheet[1] = max(sheet[1], y + shelf_height)
+    return places, [tuple(sheet) for sheet in sheets]
+
+
+def pack(sizes, max_size, padding=0):
+    """
+    Packs rectangles into as few and as small sheets as the shelves allow,
+    trying sheet widths up to max_size.
+    Returns: same as pack_shelves()
+    """
+    best = None
+    widest = max(w for w, h in sizes) + 2*padding
+    for width in range(widest, max_size + 1, 16) or [max_size]:
+        places, sheets = pack_shelves(sizes, width, max_size, padding)
+        area = sum(w*h for w, h in sheets)
+        if best is None or (len(sheets), area) < best[0]:
+            best = ((len(sheets), area), places, sheets)
+    return best[1], best[2]
+
+
+def get_sources(names, data_dir):
+    """
+    Returns: dict of [size, modification time] of the image files, to find
+    out if the atlas is out of date
+    """
+    sources = {}
+    for name in names:
+        stat = os.stat(os.path.join(data_dir, name))
+        sources[name] = [stat.st_size, stat.st_mtime_ns]
+    return sources
+
+
+def build(names, data_dir, atlas_dir):
+    """
+    Packs the images into sheets saved in atlas_dir, along with a manifest
+    of the image positions.
+    The sheets are saved as uncompressed RGBA pixels, so that loading them
+    costs little more than reading the files.
+    names: image file names in data_dir
+    Returns: manifest dict
+    """
+    images = [pg.image.load(os.path.join(data_dir, name)) for name in names]
+    places, sheet_sizes = pack([image.get_size() for image in images],
+                               stconfig.ATLAS_SIZE, stconfig.ATLAS_PADDING)
+    sheets = [pg.Surface(size, pg.SRCALPHA, 32) for size in sheet_sizes]
+    regions = {}
+    for name, image, (sheet, x, y) in zip(names, images, places):
+        # adding to the transparent sheet copies the pixels as they are,
+        # alpha blending would darken the edges
+        sheets[sheet].blit(image, (x, y), special_flags=pg.BLEND_RGBA_ADD)
+        regions[name] = [sheet, x, y, image.get_width(), image.get_height()]
+
+    if not os.path.isdir(atlas_dir):
+        os.makedirs(atlas_dir)
+    sheet_files = []
+    for i, sheet in enumerate(sheets):
+        sheet_name = 'atlas-%d.rgba' % i
+        with open(os.path.join(atlas_dir, sheet_name), 'wb') as f:
+            f.write(pg.image.tobytes(sheet, 'RGBA'))
+        sheet_files.append(
+            {'file': sheet_name, 'size': list(sheet.get_size())})
+    manifest = {
+        'version': VERSION,
+        'sources': get_sources(names, data_dir),
+        'sheets': sheet_files,
+        'images': regions
+    }
+    with open(os.path.join(atlas_dir, MANIFEST), 'w') as f:
+        json.dump(manifest, f, sort_keys=True)
+    return manifest
+
+
+def load_manifest(names, data_dir, atlas_dir):
+    """
+    Returns: manifest dict of the atlas in atlas_dir, None if it is missing
+    or out of date
+    """
+    try:
+        with open(os.path.join(atlas_dir, MANIFEST)) as f:
+            manifest = json.load(f)
+        if manifest.get('version') != VERSION:
+            return None
+        if manifest.get('sources') != get_sources(names, data_dir):
+            return None
+        for sheet in manifest['sheets']:
+            w, h = sheet['size']
+            if os.path.getsize(os.path.join(atlas_dir, sheet['file'])) != w*h*4:
+                return None
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+    return manifest
+
+
+def load_sheet(sheet, atlas_dir):
+    """
+    sheet: sheet entry of the manifest
+    Returns: sheet surface, not yet converted to the display format
+    """
+    with open(os.path.join(atlas_dir, sheet['file']), 'rb') as f:
+        pixels = f.read()
+    return pg.image.frombytes(pixels, tuple(sheet['size']), 'RGBA')
+
+
+def get_atlas(names, data_dir, atlas_dir):
+    """
+    Returns the manifest of the atlas of the images, building the atlas if
+    it is missing or out of date, e.g. on the first run.
+    Returns: manifest dict, None if the atlas can't be built
+    """
+    manifest = load_manifest(names, data_dir, atlas_dir)
+    if manifest is None:
+        try:
+            manifest = build(names, data_dir, atlas_dir)
+        except (OSError, ValueError, pg.error) as message:
+            print("Couldn't build texture atlas:", message)
+            return None
+    return manifest
+
+
+if __name__ == '__main__':
+    # build the atlas in advance, e.g. before packaging
+    import sthelper
+    manifest = build(stconfig.ATLAS_IMAGES,
+                     sthelper.data_dir, sthelper.atlas_dir)
+    print('Packed', len(manifest['images']), 'images in',
+          len(manifest['sheets']), 'sheet(s)')
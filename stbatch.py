@@ -0,0 +1,153 @@
+"""
+Sleeping Troubles v0.1.3
+
+Sleeping Troubles is a simple board game, developed with Python and Pygame, implementing a State machine.
+Sleeping Troubles requires Pygame to be installed. Pygame can be downloaded from http://pygame.org.
+Developed by Yannis Maragos. Concept and design by Evi Filakouri.
+
+Copyright (C) 2018 Yannis Maragos.
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License version 2 only,
+as published by the Free Software Foundation.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import argparse
+import importlib
+import multiprocessing
+import sys
+import time
+import numpy as np
+import stconfig
+import stboard
+import stsim
+
+
+def get_shard_games(games, shards):
+    """
+    Returns: list of the games of each shard, as even as possible
+    """
+    return [games//shards + (1 if shard < games % shards else 0) for shard in range(shards)]
+
+
+def get_shard_seeds(seed, shards):
+    """
+    Derives an independent random stream for each shard from the master
+    seed, the same seed and number of shards always give the same streams.
+    Returns: list of numpy SeedSequence
+    """
+    return np.random.SeedSequence(seed).spawn(shards)
+
+
+def get_policy(name, board):
+    """
+    Resolves a policy name in the worker processes.
+    name: 'default', 'optimal' (see stsolver.solve_optimal), options by
+    square kind as 'telephone=tpoints,risk=bathroom', or a policy of
+    another module as 'module:name'
+    board: board the policy plays on
+    Returns: policy of stsim.simulate()
+    """
+    if name == 'default':
+        return stsim.DEFAULT_POLICY
+    if name == 'optimal':
+        import stsolver
+        return stsolver.solve_optimal(board)
+    if ':' in name:
+        module, attribute = name.split(':', 1)
+        return getattr(importlib.import_module(module), attribute)
+    policy = dict(stsim.DEFAULT_POLICY)
+    for option in name.split(','):
+        kind, _, choice = option.partition('=')
+        if kind not in policy:
+            raise ValueError('not a square with a choice: %r' % (kind,))
+        policy[kind] = choice
+    return policy
+
+
+def run_shard(args):
+    """
+    Plays the games of one shard, in a worker process.
+    args: tuple of games, SeedSequence, policy name and board name
+    Returns: SimulationResult
+    """
+    games, seed_sequence, policy, board = args
+    board = stboard.load_board(board).board
+    return stsim.simulate(games, get_policy(policy, board), board=board,
+                          rng=np.random.default_rng(seed_sequence))
+
+
+def run(games, seed=None, shards=None, processes=None, policy='default',
+        board=stconfig.BOARD):
+    """
+    Plays games sharded across a pool of processes and merges the results.
+    The results depend only on games, seed, shards, policy and board, not
+    on the number of processes.
+    seed: master seed, a random one if None
+    shards: number of random streams, by default one per core
+    processes: size of the pool, by default one per shard up to the cores
+    board: name of a layout file of data/boards
+    Returns: tuple of the merged SimulationResult and the master seed
+    """
+    if seed is None:
+        seed = np.random.SeedSequence().entropy
+    if shards is None:
+        shards = multiprocessing.cpu_count()
+    if processes is None:
+        processes = min(shards, multiprocessing.cpu_count())
+    # fail early on a bad board or policy
+    get_policy(policy, stboard.load_board(board).board)
+    tasks = list(zip(get_shard_games(games, shards), get_shard_seeds(seed, shards),
+                     [policy]*shards, [board]*shards))
+
+    if processes > 1:
+        pool = multiprocessing.Pool(processes)
+        try:
+            results = pool.map(run_shard, tasks, chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        results = [run_shard(task) for task in tasks]
+
+    # merged in shard order
+    result = results[0]
+    for other in results[1:]:
+        result.merge(other)
+    return result, seed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Simulate Sleeping Troubles games on all cores.')
+    parser.add_argument('games', type=lambda value: int(float(value)), nargs='?', default=10000000,
+                        help='number of games (default 1e7)')
+    parser.add_argument('--seed', type=int,
+                        help='master seed, results repeat for the same seed and shards')
+    parser.add_argument('--shards', type=int,
+                        help='number of random streams (default one per core)')
+    parser.add_argument('--processes', type=int,
+                        help='worker processes (default one per shard, up to the cores)')
+    parser.add_argument('--policy', default='default',
+                        help="'default', 'optimal', options such as 'telephone=tpoints,risk=bathroom' or 'module:name'")
+    parser.add_argument('--board', default=stconfig.BOARD,
+                        help='layout file of data/boards (default %(default)s)')
+    args = parser.parse_args()
+
+    start = time.time()
+    try:
+        result, seed = run(args.games, args.seed, args.shards,
+                           args.processes, args.policy, args.board)
+    except (OSError, ValueError, ImportError, AttributeError) as message:
+        print("Couldn't run simulation:", message)
+        sys.exit(1)
+    print(result.get_report())
+    print('Seed:         %d' % seed)
+    print('Time:         %.2f s' % (time.time() - start))
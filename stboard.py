@@ -0,0 +1,298 @@
+"""
+Sleeping Troubles v0.1.3
+
+Sleeping Troubles is a simple board game, developed with Python and Pygame, implementing a State machine.
+Sleeping Troubles requires Pygame to be installed. Pygame can be downloaded from http://pygame.org.
+Developed by Yannis Maragos. Concept and design by Evi Filakouri.
+
+Copyright (C) 2018 Yannis Maragos.
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License version 2 only,
+as published by the Free Software Foundation.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import os
+import sys
+import json
+import marshal
+import hashlib
+from array import array
+import stconfig
+import strules
+
+if getattr(sys, 'frozen', False):
+    main_dir = os.path.split(os.path.abspath(sys.executable))[0]
+else:
+    main_dir = os.path.split(os.path.abspath(__file__))[0]
+data_dir = os.path.join(main_dir, 'data')
+boards_dir = os.path.join(data_dir, 'boards')
+cache_dir = os.path.join(main_dir, 'cache')
+
+VERSION = 2
+DEFAULT_BOARD = 'default'
+GRID_SIZE = (9, 8)  # columns and rows of the board squares
+
+
+class BoardLayout(object):
+    """
+    Board compiled from a layout file of data/boards, see load_board().
+    The squares are stored as arrays by position, index 0 is not used.
+    board: list of (kind, value) as used by strules. The risk square's
+    value is the move back to the bathroom.
+    grids, texts: grid cell and text of each square
+    colors: RGB tuples of the squares, indexed by color_indices and
+    text_color_indices
+    icons: image file names, indexed by icon_indices (-1 for no icon)
+    sounds: (file name, volume) of the sounds, indexed by sound_indices
+    (-1 for no sound)
+    key: hash of the file contents
+    """
+    __slots__ = ('name', 'key', 'title', 'board', 'grids', 'texts',
+                 'colors', 'color_indices', 'text_color_indices', 'icons', 'icon_indices',
+                 'sounds', 'sound_indices')
+
+    def __init__(self, name, key, compiled):
+        self.name = name
+        self.key = key
+        self.title = compiled['title']
+        self.board = [None] + [tuple(square)
+                               for square in compiled['board']]
+        self.grids = [None] + compiled['grids']
+        self.texts = [None] + compiled['texts']
+        self.colors = compiled['colors']
+        self.color_indices = array('b', [-1] + compiled['color_indices'])
+        self.text_color_indices = array(
+            'b', [-1] + compiled['text_color_indices'])
+        self.icons = compiled['icons']
+        self.icon_indices = array('b', [-1] + compiled['icon_indices'])
+        self.sounds = compiled['sounds']
+        self.sound_indices = array('b', [-1] + compiled['sound_indices'])
+
+    def __len__(self):
+        return len(self.board) - 1
+
+
+def get_board_names():
+    """
+    Returns: sorted names of the layout files in data/boards
+    """
+    try:
+        files = os.listdir(boards_dir)
+    except OSError:
+        return []
+    return sorted(os.path.splitext(name)[0] for name in files if name.endswith('.json'))
+
+
+def get_color(value, where):
+    """
+    value: name of a stconfig color without ST_, e.g. 'lightergray', or
+    an [r, g, b] list
+    Returns: RGB tuple
+    """
+    if isinstance(value, str):
+        color = getattr(stconfig, 'ST_' + value.upper(), None)
+        if isinstance(color, tuple):
+            return color
+    elif isinstance(value, list) and len(value) == 3 and \
+            all(isinstance(c, int) and 0 <= c <= 255 for c in value):
+        return tuple(value)
+    raise ValueError('%s: not a color: %r' % (where, value))
+
+
+def get_data_file(value, where):
+    """
+    Returns: file name of data/, None if value is None
+    """
+    if value is None:
+        return None
+    if not isinstance(value, str) or not os.path.isfile(os.path.join(data_dir, value)):
+        raise ValueError('%s: no such file in data: %r' % (where, value))
+    return value
+
+
+def parse_square(kind, where):
+    """
+    kind: square type, e.g. 'normal' or 'back:-7', one of the kinds of
+    strules.EFFECTS
+    Returns: list of kind and value, value is None for kinds without a number
+    """
+    if not isinstance(kind, str):
+        raise ValueError('%s: not a square type: %r' % (where, kind))
+    parts = kind.rsplit(':', 1)
+    effect = strules.EFFECTS.get(parts[0])
+    if effect is None or effect.has_value != (len(parts) == 2):
+        raise ValueError('%s: not a square type: %r' % (where, kind))
+    if len(parts) == 1:
+        return [parts[0], None]
+    try:
+        return [parts[0], int(parts[1])]
+    except ValueError:
+        raise ValueError('%s: not a square type: %r' % (where, kind))
+
+
+def compile_layout(layout, name):
+    """
+    Validates a layout and compiles it to plain data, see BoardLayout.
+    layout: dict of a layout file
+    Returns: dict of title, board and squares
+    Raises: ValueError with the first problem found
+    """
+    if not isinstance(layout, dict) or not isinstance(layout.get('squares'), list):
+        raise ValueError('board %s: no list of squares' % name)
+    board = []
+    squares = []
+    grids = set()
+    for position, square in enumerate(layout['squares'], 1):
+        where = 'board %s, square %d' % (name, position)
+        if not isinstance(square, dict):
+            raise ValueError('%s: not an object' % where)
+        unknown = set(square) - set(('type', 'grid', 'text', 'color', 'text_color',
+                                     'icon', 'sound', 'volume'))
+        if unknown:
+            raise ValueError('%s: unknown keys %s' %
+                             (where, ', '.join(sorted(unknown))))
+        board.append(parse_square(square.get('type'), where))
+
+        # squares fill the grid one next to the other
+        grid = square.get('grid')
+        if not (isinstance(grid, list) and len(grid) == 2 and
+                all(isinstance(g, int) and 0 <= g < size for g, size in zip(grid, GRID_SIZE))):
+            raise ValueError('%s: not a grid cell: %r' % (where, grid))
+        grid = tuple(grid)
+        if grid in grids:
+            raise ValueError('%s: grid cell %r is taken' % (where, grid))
+        if squares and abs(grid[0] - squares[-1]['grid'][0]) + abs(grid[1] - squares[-1]['grid'][1]) != 1:
+            raise ValueError('%s: not next to the previous square' % where)
+        grids.add(grid)
+
+        text = square.get('text', '')
+        if not isinstance(text, str):
+            raise ValueError('%s: not a text: %r' % (where, text))
+        volume = square.get('volume')
+        if volume is not None and not (isinstance(volume, (int, float)) and 0 <= volume <= 1):
+            raise ValueError('%s: not a volume: %r' % (where, volume))
+        squares.append({
+            'grid': grid,
+            'text': text,
+            'color': get_color(square.get('color', 'lightergray'), where),
+            'text_color': get_color(square.get('text_color', 'gray120'), where),
+            'icon': get_data_file(square.get('icon'), where),
+            'sound': get_data_file(square.get('sound'), where),
+            'volume': volume
+        })
+
+    kinds = [kind for kind, value in board]
+    if len(board) < 2 or kinds[0] != 'start' or kinds[-1] != 'end' or \
+            kinds.count('start') != 1 or kinds.count('end') != 1:
+        raise ValueError(
+            'board %s: squares must go from a start to an end square' % name)
+
+    # risk squares send the player back to the previous bathroom
+    for position, square in enumerate(board):
+        if square[0] == 'risk':
+            bathrooms = [p for p in range(position) if kinds[p] == 'bathroom']
+            if not bathrooms:
+                raise ValueError('board %s, square %d: no bathroom before the risk square' %
+                                 (name, position + 1))
+            square[1] = bathrooms[-1] - position
+
+    title = layout.get('name', name)
+    if not isinstance(title, str):
+        raise ValueError('board %s: not a name: %r' % (name, title))
+
+    # appearance as arrays, with the colors, icons and sounds stored once
+    def get_index(palette, item):
+        if item is None:
+            return -1
+        if item not in palette:
+            palette.append(item)
+        return palette.index(item)
+    colors, icons, sounds = [], [], []
+    return {
+        'title': title,
+        'board': [tuple(square) for square in board],
+        'grids': [square['grid'] for square in squares],
+        'texts': [square['text'] for square in squares],
+        'colors': colors,
+        'color_indices': [get_index(colors, square['color']) for square in squares],
+        'text_color_indices': [get_index(colors, square['text_color']) for square in squares],
+        'icons': icons,
+        'icon_indices': [get_index(icons, square['icon']) for square in squares],
+        'sounds': sounds,
+        'sound_indices': [get_index(sounds, (square['sound'], square['volume']) if square['sound'] else None)
+                          for square in squares]
+    }
+
+
+boards = {}
+
+
+def load_board(name=DEFAULT_BOARD, cache=True):
+    """
+    Loads a layout file of data/boards. The compiled layout is kept by the
+    hash of the file contents, in memory and in cache_dir, so a file is
+    parsed and validated again only after it changes.
+    name: file name without .json
+    cache: use and update the caches
+    Returns: BoardLayout
+    Raises: OSError if the file can't be read, ValueError if it isn't valid
+    """
+    with open(os.path.join(boards_dir, name + '.json'), 'rb') as f:
+        contents = f.read()
+    key = hashlib.sha256(b'%d:%s:' % (
+        VERSION, name.encode('utf-8')) + contents).hexdigest()
+    if cache:
+        board = boards.get(key)
+        if board is not None:
+            return board
+
+    path = os.path.join(cache_dir, 'board-%s.bin' % key)
+    compiled = None
+    if cache:
+        try:
+            with open(path, 'rb') as f:
+                compiled = marshal.loads(f.read())
+        except (OSError, EOFError, ValueError, TypeError):
+            compiled = None
+        # the board may have been compiled with effects registered by another program
+        if compiled is not None and not all(square[0] in strules.EFFECTS for square in compiled['board']):
+            compiled = None
+
+    if compiled is None:
+        try:
+            layout = json.loads(contents.decode('utf-8'))
+        except ValueError as message:
+            raise ValueError('board %s: %s' % (name, message))
+        compiled = compile_layout(layout, name)
+        if cache:
+            try:
+                if not os.path.isdir(cache_dir):
+                    os.makedirs(cache_dir)
+                with open(path, 'wb') as f:
+                    marshal.dump(compiled, f)
+            except OSError as message:
+                print("Couldn't save compiled board:", message)
+
+    board = BoardLayout(name, key, compiled)
+    if cache:
+        boards[key] = board
+    return board
+
+
+if __name__ == '__main__':
+    # usage: python stboard.py [board names], checks the layouts
+    for name in sys.argv[1:] or get_board_names():
+        try:
+            board = load_board(name, cache=False)
+        except (OSError, ValueError) as message:
+            print("Couldn't load board:", message)
+            continue
+        print('%s: %s, %d squares' % (name, board.title, len(board)))
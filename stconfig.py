@@ -21,12 +21,79 @@ along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
 
 ST_VERSION = '0.1.3'
-ST_FPS = 20
+ST_FPS = 60  # highest frame rate
+IDLE_TIMEOUT = 1000  # longest sleep in ms while nothing is animating
 ST_YEAR = '2023'
 
+# Rendering backend, 'software' draws to the display surface, 'gpu' uses the
+# SDL2 render API and falls back to 'software' if it is not available
+RENDERER = 'software'
+
+# Caches
+TEXT_CACHE_SIZE = 4 * 1024 * 1024  # bytes of rendered text surfaces
+# caches of the window sizes, the least recently used entries are dropped
+# while the window is resized
+SCALED_IMAGE_CACHE_SIZE = 4 * 1024 * 1024  # bytes of scaled images
+FONT_CACHE_SIZE = 32  # font objects
+LAYOUT_CACHE_SIZE = 8  # layouts, see stlayout
+POPUP_CACHE_SIZE = 16  # rendered popups
+
+# Frame rates the states need while nothing is animating,
+# 0 draws frames only in response to events
+STATE_FPS = {
+    'menu': 0,
+    'help': 0,
+    'credits': 0,
+    'game': 0,
+    'pause': 0
+}
+# Window in the background (unfocused) or minimized
+BACKGROUND_FPS = 1  # highest frame rate while unfocused, 0 stops rendering
+MINIMIZED_FPS = 0  # highest frame rate while minimized
+BACKGROUND_MUSIC = 'duck'  # 'pause', 'duck' (lower the volume) or None
+BACKGROUND_MUSIC_VOLUME = 0.1  # music volume while ducked
+FRAME_SPIN_TIME = 0.002  # seconds spent spinning before a frame for accuracy
+FRAME_STATS_SIZE = 60  # frames the achieved frame rate is measured over
+
+# Player movement
+PLAYER_SQUARE_TIME = 0.12  # seconds the player takes to walk one square
+PLAYER_FPS = 60  # frame rate while the player is walking
+
+# Screen layers, from bottom to top
+LAYERS = ['chrome', 'board', 'hud', 'sprites', 'modal']
+
+# Dice roll animation, its frames are rendered once at startup
+DICE_ROLL_FRAME_RATE = 20  # animation frames per second
+DICE_ROLL_ANGLE_STEP = 30  # degrees the dice turns on each frame
+DICE_ROLL_SCALES = (1.0,)  # dice size on consecutive frames, e.g. (1.0, 1.1)
+
+# Assets decoded at startup
+PRELOAD_IMAGES = [
+    'logo.png', 'nick.png', 'eugene.png', 'hannibal.png', 'rascal.png',
+    'goodnight.png', 'player.png', 'home.png', 'hourglass.png',
+    'hourglass-white.png', 'telephone.png', 'dream-crystal.png',
+    'exclamation.png', 'sleeping.png', 'dice_question.png', 'dice_1.png',
+    'dice_2.png', 'dice_3.png', 'dice_4.png', 'dice_5.png', 'dice_6.png',
+    'music-on.png', 'music-off.png', 'sound-on.png', 'sound-off.png'
+]
+PRELOAD_SOUNDS = [
+    'button-hover.wav', 'button-click.wav', 'roll-dice.wav',
+    'lose-points.wav', 'telephone.wav', 'gain-points.wav',
+    'dream-crystal.wav', 'kitchen.wav', 'bathroom.wav', 'weird-noises.wav',
+    'forgot-pill.wav', 'points-reduced.wav'
+]
+
+# Texture atlas, the images are packed into sheets on the first run (or by
+# running statlas.py) and loaded from the sheets instead of separate files
+ATLAS = True
+ATLAS_IMAGES = PRELOAD_IMAGES
+ATLAS_SIZE = 1024  # largest sheet width and height
+ATLAS_PADDING = 1  # empty pixels around each image
+
 # Audio
 SOUND_ON = True
 MUSIC_ON = True
+MUSIC_VOLUME = 0.4
 
 MIXER_FREQUENCY = 44100
 MIXER_SIZE = -16
@@ -36,6 +103,10 @@ MIXER_BUFFER = 4096
 # Dimensions and sizes
 ST_SCREEN_WIDTH = 1300
 ST_SCREEN_HEIGHT = 740
+MIN_SCREEN_WIDTH = 900  # the window can't be resized smaller
+MIN_SCREEN_HEIGHT = 680
+RESIZABLE = True
+FULLSCREEN = False  # toggled with F11
 
 TOPBAR_HEIGHT = 70
 TOOLBAR_WIDTH = 260
@@ -55,8 +126,11 @@ POPUP_BUTTON_WIDTH = 195
 POPUP_BUTTON_HEIGHT = 40
 
 # Game
+BOARD = 'default'  # layout file of data/boards, also set by st.py --board
 STARTING_TPOINTS = 8
 STARTING_DCRYSTALS = 1
+# show the best option of each choice, see stsolver.solve_optimal()
+ADVISOR = False
 
 # Colors
 ST_PINK = (255, 230, 230)
@@ -24,6 +24,10 @@ import pygame as pg
 from pygame.locals import *
 import os
 import sys
+import weakref
+from collections import OrderedDict
+import stconfig
+import statlas
 
 if getattr(sys, 'frozen', False):
     # frozen
@@ -32,6 +36,7 @@ else:
     # unfrozen
     main_dir = os.path.split(os.path.abspath(__file__))[0]
 data_dir = os.path.join(main_dir, 'data')
+atlas_dir = os.path.join(main_dir, 'cache')
 
 
 def load_window_icon(name, colorkey=None):
@@ -51,48 +56,176 @@ def load_window_icon(name, colorkey=None):
     return icon
 
 
+class AssetManager(object):
+    """
+    Cache of the images and sounds located in 'data' folder.
+    Each file is decoded (and converted to the display format) only once,
+    all callers get shared handles, so they must not be drawn on or have
+    their volume changed. Sounds that need a different volume are requested
+    with the volume argument instead.
+    Transparent images packed in the texture atlas are subsurfaces of its
+    sheets.
+    """
+
+    def __init__(self):
+        self.images = {}
+        self.scaled_images = OrderedDict()
+        self.sounds = {}
+        self.atlas_regions = {}
+        self.image_bytes = 0
+        self.scaled_bytes = 0
+        self.sound_bytes = 0
+
+    def load_atlas(self, names):
+        """
+        Loads the sheets of the texture atlas of the images, building it
+        first if needed.
+        Returns: True if the atlas was loaded
+        """
+        manifest = statlas.get_atlas(names, data_dir, atlas_dir)
+        if manifest is None:
+            return False
+        sheets = []
+        for sheet in manifest['sheets']:
+            try:
+                sheet = statlas.load_sheet(sheet, atlas_dir)
+            except (OSError, ValueError) as message:
+                print("Couldn't load texture atlas:", message)
+                return False
+            sheet = sheet.convert_alpha()
+            sheets.append(sheet)
+            self.image_bytes += sheet.get_pitch() * sheet.get_height()
+        for name, (sheet, x, y, w, h) in manifest['images'].items():
+            self.atlas_regions[name] = (sheets[sheet], pg.Rect(x, y, w, h))
+        return True
+
+    def get_image(self, name, transparent=False, colorkey=None):
+        key = (name, transparent, colorkey)
+        image = self.images.get(key)
+        if image is None and transparent == True and colorkey is None and name in self.atlas_regions:
+            sheet, rect = self.atlas_regions[name]
+            image = sheet.subsurface(rect)
+            self.images[key] = image
+        if image is None:
+            fullname = os.path.join(data_dir, name)
+            try:
+                image = pg.image.load(fullname)
+            except pg.error as message:
+                print("Couldn't load image:", name)
+                raise SystemExit(message)
+            if transparent == True:
+                image = image.convert_alpha()
+            else:
+                image = image.convert()
+            if colorkey is not None:
+                if colorkey == -1:
+                    colorkey = image.get_at((0, 0))
+                image.set_colorkey(colorkey, pg.RLEACCEL)
+            self.images[key] = image
+            self.image_bytes += image.get_pitch() * image.get_height()
+        return image
+
+    def get_sound(self, name, volume=None):
+        key = (name, volume)
+        sound = self.sounds.get(key)
+        if sound is None:
+            if volume is None:
+                fullname = os.path.join(data_dir, name)
+                try:
+                    sound = pg.mixer.Sound(fullname)
+                except pg.error as message:
+                    print("Couldn't load sound:", name)
+                    raise SystemExit(message)
+            else:
+                # copy the already decoded samples instead of reading the file again
+                sound = pg.mixer.Sound(buffer=self.get_sound(name).get_raw())
+                sound.set_volume(volume)
+            self.sounds[key] = sound
+            frequency, size, channels = pg.mixer.get_init()
+            self.sound_bytes += int(sound.get_length() * frequency) * \
+                channels * (abs(size) // 8)
+        return sound
+
+    def scale_image(self, image, scale):
+        """
+        Returns image smoothly scaled by scale, scaled only once per image
+        and scale. The same image is returned for scale 1.
+        Scaled images are dropped in least recently used order once they
+        take more than stconfig.SCALED_IMAGE_CACHE_SIZE bytes, e.g. the
+        images of old window sizes.
+        """
+        if scale == 1:
+            return image
+        key = (image, scale)
+        scaled = self.scaled_images.get(key)
+        if scaled is not None:
+            self.scaled_images.move_to_end(key)
+            return scaled
+
+        size = (max(1, int(image.get_width()*scale)),
+                max(1, int(image.get_height()*scale)))
+        scaled = pg.transform.smoothscale(image, size)
+        self.scaled_images[key] = scaled
+        self.scaled_bytes += scaled.get_pitch() * scaled.get_height()
+        # always keep the newest one
+        while self.scaled_bytes > stconfig.SCALED_IMAGE_CACHE_SIZE and len(self.scaled_images) > 1:
+            old_key, old_scaled = self.scaled_images.popitem(last=False)
+            self.scaled_bytes -= old_scaled.get_pitch() * old_scaled.get_height()
+        return scaled
+
+    def preload(self, images=(), sounds=()):
+        """
+        Decodes the given images (as transparent) and sounds in advance.
+        """
+        if stconfig.ATLAS and not self.atlas_regions:
+            self.load_atlas(stconfig.ATLAS_IMAGES)
+        for name in images:
+            self.get_image(name, True)
+        if pg.mixer and pg.mixer.get_init():
+            for name in sounds:
+                self.get_sound(name)
+
+    def get_memory_usage(self):
+        """
+        Returns: dict of bytes used by cached images, scaled images, sounds
+        and in total
+        """
+        return {
+            'images': self.image_bytes,
+            'scaled_images': self.scaled_bytes,
+            'sounds': self.sound_bytes,
+            'total': self.image_bytes + self.scaled_bytes + self.sound_bytes
+        }
+
+
+assets = AssetManager()
+
+
 def load_image(name, transparent=False, colorkey=None):
     """
     Platform independent function that loads an image file located in 'data' folder.
+    The image is decoded once and shared by all callers.
     name: file name
     colorkey: RGB value (tuple)
     Returns: tuple of image object, image rect
     """
-
-    fullname = os.path.join(data_dir, name)
-    try:
-        image = pg.image.load(fullname)
-    except pg.error as message:
-        print("Couldn't load image:", name)
-        raise SystemExit(message)
-    if transparent == True:
-        image = image.convert_alpha()
-    else:
-        image = image.convert()
-    if colorkey is not None:
-        if colorkey == -1:
-            colorkey = image.get_at((0, 0))
-        image.set_colorkey(colorkey, pg.RLEACCEL)
+    image = assets.get_image(name, transparent, colorkey)
     return image, image.get_rect()
 
 
-def load_sound(name):
+def load_sound(name, volume=None):
     """
     Platform independent function that loads a sound file located in 'data' folder.
+    The sound is decoded once and shared by all callers.
     name: file name
+    volume: playback volume (0.0 - 1.0), None for full volume
     Returns: sound object
     """
     class NoneSound:
         def play(self): pass
     if not pg.mixer:
         return NoneSound()
-    fullname = os.path.join(data_dir, name)
-    try:
-        sound = pg.mixer.Sound(fullname)
-    except pg.error as message:
-        print("Couldn't load sound:", name)
-        raise SystemExit(message)
-    return sound
+    return assets.get_sound(name, volume)
 
 
 def play_sound(sound, action='play'):
@@ -116,22 +249,46 @@ def play_sound(sound, action='play'):
     return
 
 
-def play_music(name, action='play', repeat=-1):
+# music volume and pause state, kept when another track is loaded
+music_volume = stconfig.MUSIC_VOLUME
+music_paused = False
+
+
+def play_music(name, action='play', repeat=-1, volume=None):
     """
     Platform independent function that plays a musical track located in 'data' folder.
-    name: file name
+    name: file name, not needed for the 'pause', 'unpause' and 'volume' actions
+    action: 'play', 'stop', 'pause', 'unpause' or 'volume'
+    volume: new volume (0.0 - 1.0) for the 'volume' action
     Returns: None
     """
+    global music_volume, music_paused
+
     class NoneSound:
         def play(self): pass
     if not pg.mixer:
         return NoneSound()
-    fullname = os.path.join(data_dir, name)
     try:
+        # these act on the loaded track
+        if action == 'pause':
+            music_paused = True
+            pg.mixer.music.pause()
+            return
+        elif action == 'unpause':
+            music_paused = False
+            pg.mixer.music.unpause()
+            return
+        elif action == 'volume':
+            music_volume = volume
+            pg.mixer.music.set_volume(volume)
+            return
+        fullname = os.path.join(data_dir, name)
         pg.mixer.music.load(fullname)
-        pg.mixer.music.set_volume(0.4)
+        pg.mixer.music.set_volume(music_volume)
         if action == 'play':
             pg.mixer.music.play(repeat)
+            if music_paused:
+                pg.mixer.music.pause()
         elif action == 'stop':
             pg.mixer.music.stop()
     except pg.error as message:
@@ -140,6 +297,26 @@ def play_music(name, action='play', repeat=-1):
     return
 
 
+def build_rotation_frames(image, angle_step, scales=(1.0,)):
+    """
+    Renders an image turning a full circle, so that animating it only takes
+    blitting the returned surfaces in order.
+    image: surface to rotate
+    angle_step: degrees between consecutive frames
+    scales: size factors applied to consecutive frames in turn
+    Returns: list of surfaces
+    """
+    frames = []
+    for i, angle in enumerate(range(0, 360, angle_step)):
+        frame = pg.transform.rotate(image, angle)
+        scale = scales[i % len(scales)]
+        if scale != 1.0:
+            frame = pg.transform.smoothscale(frame, (int(
+                frame.get_width() * scale), int(frame.get_height() * scale)))
+        frames.append(frame)
+    return frames
+
+
 def get_sound_duration(name):
     import wave
     import contextlib
@@ -150,3 +327,383 @@ def get_sound_duration(name):
         duration = frames / float(rate)
         duration = float("{0:.2f}".format(duration))
         return duration
+
+
+class DisplayList(object):
+    """
+    Records blits instead of drawing them.
+    A state draws the dynamic part of its screen to a display list, so that
+    the frame can be compared with the previous one and only the changed
+    areas redrawn. Items are (surface, rect) tuples in drawing order.
+    """
+
+    def __init__(self):
+        self.items = []
+
+    def blit(self, surface, dest):
+        width, height = surface.get_size()
+        self.items.append(
+            (surface, (int(dest[0]), int(dest[1]), width, height)))
+
+
+def merge_rects(rects, bounds):
+    """
+    Clips rects to bounds and merges the overlapping ones.
+    rects: list of rect style objects
+    bounds: clipping rect
+    Returns: list of non overlapping rects
+    """
+    merged = []
+    for rect in rects:
+        rect = bounds.clip(rect)
+        if rect.width == 0 or rect.height == 0:
+            continue
+        i = 0
+        while i < len(merged):
+            if rect.colliderect(merged[i]):
+                # the union may overlap rects that were already checked
+                rect = rect.union(merged.pop(i))
+                i = 0
+            else:
+                i += 1
+        merged.append(rect)
+    return merged
+
+
+class Layer(object):
+    """
+    One layer of the screen.
+    Static content is rendered once into the layer surface, dynamic content
+    is recorded again on every frame into the layer display list. Sprites of
+    the layer group are drawn over both, only their old and new rects are
+    redrawn when they move or change.
+    A layer is dirty when its static content changed or it must be redrawn
+    as a whole.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.surface = None
+        self.pos = (0, 0)
+        self.last_rect = None
+        self.dirty = True
+        self.frame = DisplayList()
+        self.last_frame = DisplayList()
+        self.group = None
+        self.sprite_rects = {}
+
+    def set_group(self, group):
+        """
+        group: sprite group drawn in the layer, e.g. pygame.sprite.LayeredDirty
+        """
+        self.group = group
+        self.dirty = True
+
+    def set_surface(self, surface, pos=(0, 0)):
+        """
+        Replaces the static content of the layer.
+        surface: rendered static content, None for none
+        pos: position of the surface on the screen
+        """
+        self.surface = surface
+        self.pos = pos
+        self.dirty = True
+
+    def blit(self, surface, dest):
+        self.frame.blit(surface, dest)
+
+    def invalidate(self):
+        self.dirty = True
+
+    def get_sprite_rects(self):
+        """
+        Returns: dict of the rects of the visible sprites
+        """
+        sprite_rects = {}
+        if self.group is not None:
+            for sprite in self.group:
+                if getattr(sprite, 'visible', 1):
+                    sprite_rects[sprite] = pg.Rect(sprite.rect)
+        return sprite_rects
+
+    def get_changed_rects(self):
+        """
+        Returns: list of the areas of the layer that changed since the last frame
+        """
+        sprite_rects = self.get_sprite_rects()
+        if self.dirty:
+            rects = [rect for surface, rect in self.frame.items]
+            rects.extend(rect for surface, rect in self.last_frame.items)
+            if self.surface is not None:
+                rects.append(self.surface.get_rect(topleft=self.pos))
+            if self.last_rect is not None:
+                rects.append(self.last_rect)
+            rects.extend(sprite_rects.values())
+            rects.extend(self.sprite_rects.values())
+            return rects
+        changed = set(self.frame.items).symmetric_difference(
+            self.last_frame.items)
+        rects = [rect for surface, rect in changed]
+
+        # moved, changed, shown or hidden sprites
+        for sprite, rect in sprite_rects.items():
+            last_rect = self.sprite_rects.get(sprite)
+            if getattr(sprite, 'dirty', 1) or last_rect != rect:
+                rects.append(rect)
+                if last_rect is not None:
+                    rects.append(last_rect)
+        for sprite, last_rect in self.sprite_rects.items():
+            if sprite not in sprite_rects:
+                rects.append(last_rect)
+        return rects
+
+    def get_blits(self, frame):
+        """
+        Returns: list of (surface, rect) of the whole layer, in drawing order
+        frame: display list to use, the current or the last frame
+        """
+        blits = []
+        if self.surface is not None:
+            blits.append(
+                (self.surface, self.surface.get_rect(topleft=self.pos)))
+        blits.extend(frame.items)
+        if self.group is not None:
+            for sprite in self.group.sprites():
+                if getattr(sprite, 'visible', 1):
+                    blits.append((sprite.image, sprite.rect))
+        return blits
+
+    def draw(self, screen, area):
+        """
+        Draws the part of the layer that overlaps area.
+        """
+        if self.surface is not None:
+            screen.blit(self.surface, self.pos)
+        for surface, rect in self.frame.items:
+            if area.colliderect(rect):
+                screen.blit(surface, rect)
+        if self.group is not None:
+            for sprite in self.group.sprites():
+                if getattr(sprite, 'visible', 1) and area.colliderect(sprite.rect):
+                    screen.blit(sprite.image, sprite.rect)
+
+    def end_frame(self):
+        if self.surface is not None:
+            self.last_rect = self.surface.get_rect(topleft=self.pos)
+        else:
+            self.last_rect = None
+        self.dirty = False
+        self.last_frame = self.frame
+        self.frame = DisplayList()
+        self.sprite_rects = self.get_sprite_rects()
+        if self.group is not None:
+            for sprite in self.group:
+                # a dirty value of 2 redraws the sprite on every frame
+                if getattr(sprite, 'dirty', 0) == 1:
+                    sprite.dirty = 0
+
+
+class Compositor(object):
+    """
+    Stack of named screen layers, drawn from bottom to top.
+    Each frame only the areas where a layer changed are composited again,
+    from all the layers that overlap them.
+    """
+
+    def __init__(self, names):
+        self.layers = OrderedDict()
+        for name in names:
+            self.layers[name] = Layer(name)
+
+    def __getitem__(self, name):
+        return self.layers[name]
+
+    def invalidate(self):
+        """
+        Marks all layers dirty, redrawing them as a whole on the next frame.
+        """
+        for layer in self.layers.values():
+            layer.invalidate()
+
+    def compose(self, screen):
+        """
+        Draws the changed areas of the layers to the screen.
+        Returns: list of the redrawn rects
+        """
+        rects = []
+        for layer in self.layers.values():
+            rects.extend(layer.get_changed_rects())
+        dirty_rects = merge_rects(rects, screen.get_rect())
+        for dirty_rect in dirty_rects:
+            screen.set_clip(dirty_rect)
+            for layer in self.layers.values():
+                layer.draw(screen, dirty_rect)
+        screen.set_clip(None)
+
+        for layer in self.layers.values():
+            layer.end_frame()
+        return dirty_rects
+
+    def render(self, renderer):
+        """
+        Draws the frame with a TextureRenderer, if anything changed.
+        Returns: True if a frame was presented
+        """
+        changed = False
+        for layer in self.layers.values():
+            if layer.get_changed_rects():
+                changed = True
+                break
+        if changed:
+            renderer.present(
+                [layer.get_blits(layer.frame) for layer in self.layers.values()])
+
+        for layer in self.layers.values():
+            layer.end_frame()
+        return changed
+
+    def draw_last_frame(self, surface):
+        """
+        Draws the last composited frame as a whole to surface, e.g. to take a
+        screenshot of it.
+        """
+        for layer in self.layers.values():
+            for image, rect in layer.get_blits(layer.last_frame):
+                surface.blit(image, rect)
+
+
+class TextureRenderer(object):
+    """
+    Draws frames with the SDL2 render API, which may be hardware accelerated.
+    Every surface is uploaded once as a texture and frames are composed from
+    texture copies, so drawn surfaces must not be drawn on afterwards, as
+    with all the shared surfaces of the caches.
+    """
+
+    def __init__(self, window):
+        from pygame._sdl2 import video
+        self.video = video
+        self.window = window
+        self.renderer = video.Renderer(window)
+        self.textures = weakref.WeakKeyDictionary()
+
+    def get_texture(self, surface):
+        texture = self.textures.get(surface)
+        if texture is None:
+            texture = self.video.Texture.from_surface(self.renderer, surface)
+            self.textures[surface] = texture
+        return texture
+
+    def draw(self, surface, rect):
+        """
+        Draws surface at rect. Subsurfaces, e.g. images of the texture
+        atlas, are drawn from the texture of their parent surface.
+        """
+        parent = surface.get_abs_parent()
+        if parent is surface:
+            self.get_texture(surface).draw(dstrect=rect)
+        else:
+            srcrect = pg.Rect(surface.get_abs_offset(), surface.get_size())
+            self.get_texture(parent).draw(srcrect=srcrect, dstrect=rect)
+
+    def present(self, layers):
+        """
+        layers: list of layers, each a list of (surface, rect) to draw
+        """
+        self.renderer.draw_color = (0, 0, 0, 255)
+        self.renderer.clear()
+        for blits in layers:
+            for surface, rect in blits:
+                self.draw(surface, rect)
+        self.renderer.present()
+
+
+fonts = OrderedDict()
+
+
+def get_font(size, face=None):
+    """
+    Returns a shared font object, loading each (face, size) only once.
+    Up to stconfig.FONT_CACHE_SIZE fonts are kept, the least recently used
+    ones are loaded again if needed, e.g. the sizes of old window sizes.
+    size: font size
+    face: font file name, None for the pygame default font
+    Returns: font object
+    """
+    key = (face, size)
+    font = fonts.get(key)
+    if font is None:
+        if not pg.font.get_init():
+            pg.font.init()
+        font = pg.font.Font(face, size)
+        fonts[key] = font
+        while len(fonts) > stconfig.FONT_CACHE_SIZE:
+            fonts.popitem(last=False)
+    else:
+        fonts.move_to_end(key)
+    return font
+
+
+class TextCache(object):
+    """
+    Bounded LRU cache of rendered text surfaces.
+    Surfaces are keyed by (text, font size, color, antialias) and evicted in
+    least recently used order once their total size exceeds max_bytes.
+    Returned surfaces are shared and must not be drawn on.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.surfaces = OrderedDict()
+
+    def render(self, text, size, color, antialias=True):
+        key = (text, size, tuple(color), bool(antialias))
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.surfaces.move_to_end(key)
+            self.hits += 1
+            return surface
+
+        self.misses += 1
+        surface = get_font(size).render(text, antialias, color)
+        self.surfaces[key] = surface
+        self.bytes += surface.get_pitch() * surface.get_height()
+
+        # evict least recently used surfaces, but always keep the newest one
+        while self.bytes > self.max_bytes and len(self.surfaces) > 1:
+            old_key, old_surface = self.surfaces.popitem(last=False)
+            self.bytes -= old_surface.get_pitch() * old_surface.get_height()
+        return surface
+
+    def clear(self):
+        self.surfaces.clear()
+        self.bytes = 0
+
+    def get_stats(self):
+        """
+        Returns: dict of hits, misses, cached surfaces count and bytes used
+        """
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'surfaces': len(self.surfaces),
+            'bytes': self.bytes,
+            'max_bytes': self.max_bytes
+        }
+
+
+text_cache = TextCache(stconfig.TEXT_CACHE_SIZE)
+
+
+def render_text(text, size, color, antialias=True):
+    """
+    Renders text with the default font, reusing previously rendered surfaces.
+    text: string to render
+    size: font size
+    color: RGB value (tuple)
+    Returns: shared text surface
+    """
+    return text_cache.render(text, size, color, antialias)
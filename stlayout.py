@@ -0,0 +1,184 @@
+"""
+Sleeping Troubles v0.1.3
+
+Sleeping Troubles is a simple board game, developed with Python and Pygame, implementing a State machine.
+Sleeping Troubles requires Pygame to be installed. Pygame can be downloaded from http://pygame.org.
+Developed by Yannis Maragos. Concept and design by Evi Filakouri.
+
+Copyright (C) 2018 Yannis Maragos.
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License version 2 only,
+as published by the Free Software Foundation.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from collections import OrderedDict
+import pygame as pg
+import stconfig
+
+
+class Layout(object):
+    """
+    Integer positions and sizes of the game screen for a window size.
+    The topbar and the right toolbar keep their size, the board takes the
+    rest of the window and its squares grow with it.
+    Rects of the board squares are relative to the board.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        w, h = size
+        toolbar_x = w - stconfig.TOOLBAR_WIDTH
+
+        # topbar and toolbar
+        self.topbar = pg.Rect(0, 0, toolbar_x, stconfig.TOPBAR_HEIGHT)
+        self.toolbar = pg.Rect(toolbar_x, 0, stconfig.TOOLBAR_WIDTH, h)
+        self.musicbox = pg.Rect(toolbar_x, 0, stconfig.TOOLBAR_WIDTH,
+                                stconfig.TOPBAR_HEIGHT)
+        self.topbar_centery = int(stconfig.TOPBAR_HEIGHT/2)
+        self.toolbar_centerx = w - int(stconfig.TOOLBAR_WIDTH/2)
+        self.menu_button = pg.Rect(w - stconfig.TOOLBAR_WIDTH/2 - stconfig.TOOLBAR_MENUBUTTON_WIDTH/2, stconfig.TOPBAR_HEIGHT + 25,
+                                   stconfig.TOOLBAR_MENUBUTTON_WIDTH, stconfig.TOOLBAR_MENUBUTTON_HEIGHT)
+        # character image at the bottom of the help and credits toolbar
+        self.toolbar_image_y = h - 180
+
+        # dice
+        self.dicebox = pg.Rect(toolbar_x + 10, self.menu_button.bottom + 25,
+                               stconfig.TOOLBAR_WIDTH - 2*10, stconfig.DICEBOX_HEIGHT)
+        self.dice_center = (self.toolbar_centerx, self.dicebox.top + 80)
+        self.roll_button = pg.Rect(w - stconfig.TOOLBAR_WIDTH/2 - stconfig.ROLLBUTTON_WIDTH/2, self.dicebox.top + 130,
+                                   stconfig.ROLLBUTTON_WIDTH, stconfig.ROLLBUTTON_HEIGHT)
+
+        # inventory, time points on the left and dream crystals on the right
+        self.inventory_title_y = self.dicebox.bottom + 40
+        self.tpoints_box = pg.Rect(toolbar_x + 10, self.inventory_title_y + 30,
+                                   int(stconfig.TOOLBAR_WIDTH/2) - 15, 170)
+        self.dcrystals_box = pg.Rect(w - (int(stconfig.TOOLBAR_WIDTH/2) - 5), self.tpoints_box.top,
+                                     int(stconfig.TOOLBAR_WIDTH/2) - 15, 170)
+        self.tpoints_centerx = self.toolbar_centerx - \
+            int(stconfig.TOOLBAR_WIDTH/4)
+        self.dcrystals_centerx = self.toolbar_centerx + \
+            int(stconfig.TOOLBAR_WIDTH/4)
+        self.inventory_label_y = self.tpoints_box.top + 15
+        self.inventory_icon_y = self.tpoints_box.top + 50
+        self.inventory_count_y = self.tpoints_box.top + 120
+        self.footer_y = h - 30
+
+        # board, a grid of 9 x 8 squares
+        self.board = pg.Rect(0, stconfig.TOPBAR_HEIGHT, toolbar_x,
+                             h - stconfig.TOPBAR_HEIGHT)
+        square_width = (self.board.width -
+                        stconfig.SQUARES_SPACE)/9 - stconfig.SQUARES_SPACE
+        square_height = (self.board.height -
+                         stconfig.SQUARES_SPACE)/8 - stconfig.SQUARES_SPACE
+        self.square_width = int(square_width)
+        self.square_height = int(square_height)
+        self.columns = [int((column + 1)*stconfig.SQUARES_SPACE + column*square_width)
+                        for column in range(9)]
+        self.rows = [int((row + 1)*stconfig.SQUARES_SPACE + row*square_height)
+                     for row in range(8)]
+        self.squares = {}
+        for column, x in enumerate(self.columns):
+            for row, y in enumerate(self.rows):
+                self.squares[(column, row)] = pg.Rect(
+                    x, y, self.square_width, self.square_height)
+
+        # scale of the board images, 1 at the default screen size
+        default_square_width = (stconfig.ST_SCREEN_WIDTH - stconfig.TOOLBAR_WIDTH -
+                                stconfig.SQUARES_SPACE)/9 - stconfig.SQUARES_SPACE
+        default_square_height = (stconfig.ST_SCREEN_HEIGHT - stconfig.TOPBAR_HEIGHT -
+                                 stconfig.SQUARES_SPACE)/8 - stconfig.SQUARES_SPACE
+        self.scale = min(square_width/default_square_width,
+                         square_height/default_square_height)
+
+        # topbar message, scaled as the board to fit next to the toolbar
+        self.message_title_x = self.scale_size(20)
+        self.message_title_size = self.scale_size(18)
+        self.message_x = self.scale_size(100)
+        self.message_size = self.scale_size(24)
+
+        # text of the help and credits pages, below the topbar and scaled as
+        # the board
+        self.page_x = self.scale_size(50)
+        self.page_text_size = self.scale_size(24)
+        self.page_button_font_size = self.scale_size(14)
+
+        # popups, centered on the screen and scaled as the board
+        popup_width = self.scale_size(stconfig.POPUP_WIDTH)
+        popup_height = self.scale_size(stconfig.POPUP_HEIGHT)
+        self.popup = pg.Rect(int(w/2) - int(popup_width/2), int(h/2) - int(popup_height/2),
+                             popup_width, popup_height)
+        self.popup_padding = self.scale_size(stconfig.POPUP_PADDING)
+        self.popup_buttons = [pg.Rect(self.popup.left + self.scale_size(stconfig.POPUP_PADDING + 30 + i*(stconfig.POPUP_BUTTON_WIDTH + 30)),
+                                      int(h/2), self.scale_size(stconfig.POPUP_BUTTON_WIDTH),
+                                      self.scale_size(stconfig.POPUP_BUTTON_HEIGHT)) for i in range(2)]
+
+    def get_square_rect(self, grid):
+        """
+        grid: (column, row) of the square
+        Returns: rect of the square relative to the board
+        """
+        return self.squares[tuple(grid)]
+
+    def get_menu_button(self, i):
+        """
+        i: index of the button in the toolbar menu
+        Returns: rect of the menu button
+        """
+        return self.menu_button.move(0, i*(stconfig.TOOLBAR_MENUBUTTON_HEIGHT + 10))
+
+    def get_page_line(self, i):
+        """
+        i: index of the text line of the help and credits pages
+        Returns: top of the line
+        """
+        return stconfig.TOPBAR_HEIGHT + self.scale_size(40 + i*37)
+
+    def get_page_square(self, i):
+        """
+        i: index of the colored square of the help page
+        Returns: rect of the square, its description starts at its right
+        """
+        return pg.Rect(self.page_x, stconfig.TOPBAR_HEIGHT + self.scale_size(260 + i*42),
+                       self.scale_size(140), self.scale_size(32))
+
+    def get_page_square_text(self, i):
+        """
+        Returns: position of the description of a colored square
+        """
+        return (self.scale_size(200), stconfig.TOPBAR_HEIGHT + self.scale_size(269 + i*42))
+
+    def scale_size(self, value):
+        """
+        Returns: value (pixels at the default screen size) scaled as the board
+        """
+        return int(value*self.scale)
+
+
+layouts = OrderedDict()
+
+
+def get_layout(size):
+    """
+    Returns the layout of a window size, computed only once per size.
+    The last stconfig.LAYOUT_CACHE_SIZE sizes are kept.
+    size: (width, height) of the window
+    Returns: layout object
+    """
+    size = tuple(size)
+    layout = layouts.get(size)
+    if layout is None:
+        layout = Layout(size)
+        layouts[size] = layout
+        while len(layouts) > stconfig.LAYOUT_CACHE_SIZE:
+            layouts.popitem(last=False)
+    else:
+        layouts.move_to_end(size)
+    return layout
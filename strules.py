@@ -0,0 +1,524 @@
+"""
+Sleeping Troubles v0.1.3
+
+Sleeping Troubles is a simple board game, developed with Python and Pygame, implementing a State machine.
+Sleeping Troubles requires Pygame to be installed. Pygame can be downloaded from http://pygame.org.
+Developed by Yannis Maragos. Concept and design by Evi Filakouri.
+
+Copyright (C) 2018 Yannis Maragos.
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License version 2 only,
+as published by the Free Software Foundation.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from array import array
+import stconfig
+
+# Square effects
+BATHROOM_TPOINTS = 8  # Time Points are restored to this at the bathroom
+RISK_TPOINTS = 1  # Time Points are reduced to this at the risk square
+TELEPHONE_BACK = -4
+TELEPHONE_TPOINTS = -2
+KITCHEN_FORWARD = 4
+KITCHEN_TPOINTS = 2
+
+
+class SquareEffect(object):
+    """
+    Rules of a square kind and what the game shows for it, one object per
+    kind, see register_effect(). The methods get the game state and the
+    value of the square, e.g. -2 for 'tpoints:-2'.
+    kind: square kind of the layout files
+    has_value: the kind is followed by a number
+    options: options of the choice the square asks for, in the order of
+    their buttons, the first one moves the player
+    buttons: dict of the button captions by option
+    frame_color, panel_color: colors of the choice popup
+    button_color, button_text_color: colors of its buttons
+    option_sounds: dict of the (sound file, volume) played by option
+    """
+    kind = None
+    has_value = False
+    options = ()
+    buttons = {}
+    frame_color = stconfig.ST_WHITE
+    panel_color = stconfig.ST_WHITE
+    button_color = stconfig.ST_LIGHTGRAY
+    button_text_color = stconfig.ST_BLACK
+    option_sounds = {}
+
+    def land(self, state, value):
+        """
+        Applies the square, a square with options sets state.choice.
+        """
+        pass
+
+    def choose(self, state, value, option, land):
+        """
+        Applies an option, see GameState.choose().
+        Returns: True if the player moves
+        """
+        return False
+
+    def get_options(self, state, value):
+        """
+        Returns: options the player has now
+        """
+        return self.options
+
+    def get_message(self, value):
+        """
+        Returns: message shown after landing, None keeps the last message
+        """
+        return None
+
+    def get_popup_texts(self, state, value):
+        """
+        Returns: tuple of (text, font size, color, top relative to the popup
+        center) of the choice popup
+        """
+        return ()
+
+    def get_button_caption(self, option, value):
+        return self.buttons[option]
+
+    def get_tables(self, value):
+        """
+        Describes land() and choose() for the vectorized simulator and
+        solver, an effect that changes the game state has to override it.
+        Returns: dict of the entries of the square in stsim.BoardTables,
+        missing ones keep their defaults
+        """
+        return {}
+
+
+class StartEffect(SquareEffect):
+    kind = 'start'
+
+
+class EndEffect(SquareEffect):
+    kind = 'end'
+
+
+class NormalEffect(SquareEffect):
+    kind = 'normal'
+
+    def get_message(self, value):
+        return 'Roll the dice again.'
+
+
+class TPointsEffect(SquareEffect):
+    kind = 'tpoints'
+    has_value = True
+
+    def land(self, state, value):
+        state.tpoints += value
+
+    def get_tables(self, value):
+        return {'tpoints_add': value}
+
+    def get_message(self, value):
+        if value > 0:
+            return 'Yes! You gain ' + str(value) + ' Time Points. Roll the dice again.'
+        return 'Hannibal starts barking and you lose ' + str(-value) + ' Time Points. Roll the dice again.'
+
+
+class DCrystalsEffect(SquareEffect):
+    kind = 'dcrystals'
+    has_value = True
+
+    def land(self, state, value):
+        state.dcrystals += value
+
+    def get_tables(self, value):
+        return {'dcrystals_add': value}
+
+    def get_message(self, value):
+        return 'You gain a Dream Crystal. Roll the dice again.'
+
+
+class BathroomEffect(SquareEffect):
+    kind = 'bathroom'
+
+    def land(self, state, value):
+        state.tpoints = BATHROOM_TPOINTS
+
+    def get_tables(self, value):
+        return {'tpoints_set': BATHROOM_TPOINTS}
+
+    def get_message(self, value):
+        return 'You stop at the bathroom and your Time Points are restored to ' + \
+            str(BATHROOM_TPOINTS) + '. Roll the dice again.'
+
+
+class TelephoneEffect(SquareEffect):
+    kind = 'telephone'
+    options = ('back', 'tpoints')
+    buttons = {
+        'back': 'Move 4 squares back',
+        'tpoints': 'Lose 2 Time Points'
+    }
+    frame_color = stconfig.ST_YELLOW
+    button_color = stconfig.ST_PURPLE
+    button_text_color = stconfig.ST_YELLOW
+
+    def land(self, state, value):
+        state.choice = self.kind
+
+    def choose(self, state, value, option, land):
+        if option == 'back':
+            state.move(TELEPHONE_BACK, land)
+            return True
+        # Time Points are checked only on the next landing
+        state.tpoints += TELEPHONE_TPOINTS
+        return False
+
+    def get_tables(self, value):
+        return {'move': TELEPHONE_BACK, 'stay_tpoints': TELEPHONE_TPOINTS}
+
+    def get_message(self, value):
+        return 'Eugene calls you and has a new task for you. You must either move 4 squares back or lose 2 Time Points.'
+
+    def get_popup_texts(self, state, value):
+        return (('YOU HAVE A TELEPHONE CALL', 38, stconfig.ST_PURPLE, -100),
+                ('Eugene calls you and has a new task for you.', 24, stconfig.ST_PURPLE, -50))
+
+
+class KitchenEffect(SquareEffect):
+    kind = 'kitchen'
+    options = ('forward', 'tpoints')
+    buttons = {
+        'forward': 'Move 4 squares forward',
+        'tpoints': 'Gain 2 Time Points'
+    }
+    frame_color = stconfig.ST_ORANGE
+    button_color = stconfig.ST_ORANGE
+    option_sounds = {
+        'forward': ('button-click.wav', 0.1),
+        'tpoints': ('button-click.wav', 0.1)
+    }
+
+    def land(self, state, value):
+        state.choice = self.kind
+
+    def choose(self, state, value, option, land):
+        if option == 'forward':
+            state.move(KITCHEN_FORWARD, land)
+            return True
+        state.tpoints += KITCHEN_TPOINTS
+        return False
+
+    def get_tables(self, value):
+        return {'move': KITCHEN_FORWARD, 'stay_tpoints': KITCHEN_TPOINTS}
+
+    def get_message(self, value):
+        return 'You stop at the kitchen. You can move 4 squares forward or gain 2 Time Points.'
+
+    def get_popup_texts(self, state, value):
+        return (('KITCHEN STOP', 44, stconfig.ST_DARKORANGE, -100),
+                ('Select a Bonus', 24, stconfig.ST_DARKORANGE, -50))
+
+
+class BackEffect(SquareEffect):
+    kind = 'back'
+    has_value = True
+    options = ('back', 'dcrystals')
+    buttons = {
+        'back': 'Move %d squares back',
+        'dcrystals': 'Use a Dream Crystal'
+    }
+    frame_color = stconfig.ST_RED
+    panel_color = stconfig.ST_BLACK
+    option_sounds = {
+        'dcrystals': ('dream-crystal.wav', None)
+    }
+    # popup titles by the distance of the square
+    titles = {
+        -6: 'WEIRD NOISES COMING FROM THE ATTIC',
+        -7: 'YOU FORGOT TO TAKE YOUR VALERIAN PILL'
+    }
+
+    def land(self, state, value):
+        state.choice = self.kind
+
+    def choose(self, state, value, option, land):
+        if option == 'back':
+            state.move(value, land)
+            return True
+        if state.dcrystals > 0:
+            state.dcrystals -= 1
+        return False
+
+    def get_tables(self, value):
+        return {'move': value, 'stay_dcrystals': -1, 'needs_dcrystal': True}
+
+    def get_options(self, state, value):
+        if state.dcrystals <= 0:
+            return self.options[:1]
+        return self.options
+
+    def get_message(self, value):
+        return 'You have to move back ' + str(abs(value)) + ' squares unless you have a Dream Crystal to use.'
+
+    def get_popup_texts(self, state, value):
+        texts = ()
+        if value in self.titles:
+            texts += ((self.titles[value], 30, stconfig.ST_DARKORANGE, -100),)
+        if state.dcrystals > 0:
+            texts += (('If you have a Dream Crystal you can avoid going back',
+                      22, stconfig.ST_WHITE, -50),)
+        else:
+            texts += (("You don't have a Dream Crystal. You must go back",
+                      22, stconfig.ST_WHITE, -50),)
+        return texts
+
+    def get_button_caption(self, option, value):
+        if option == 'back':
+            return self.buttons[option] % abs(value)
+        return self.buttons[option]
+
+
+class RiskEffect(SquareEffect):
+    """
+    The value of the square is the move back to the bathroom, see stboard.
+    """
+    kind = 'risk'
+    options = ('bathroom', 'risk')
+    buttons = {
+        'bathroom': 'Go back to the Bathroom',
+        'risk': 'Take the risk'
+    }
+    frame_color = stconfig.ST_YELLOW
+    panel_color = stconfig.ST_RED
+    button_color = stconfig.ST_BLACK
+    button_text_color = stconfig.ST_YELLOW
+    option_sounds = {
+        'risk': ('button-click.wav', 0.1)
+    }
+
+    def land(self, state, value):
+        state.tpoints = RISK_TPOINTS
+        state.choice = self.kind
+
+    def choose(self, state, value, option, land):
+        if option == 'bathroom':
+            state.move(value, land)
+            return True
+        return False
+
+    def get_tables(self, value):
+        return {'tpoints_set': RISK_TPOINTS, 'move': value}
+
+    def get_message(self, value):
+        return 'Your Time Points are reduced to 1. Will you risk to continue or go back to the bathroom to restore your Time Points?'
+
+    def get_popup_texts(self, state, value):
+        return (('YOUR TIME POINTS ARE REDUCED TO 1', 32, stconfig.ST_YELLOW, -100),
+                ('Will you risk to continue or go back?', 24, stconfig.ST_YELLOW, -50))
+
+
+# Effects by square kind
+EFFECTS = {}
+board_effects = {}  # resolved effects by board, see get_board_effects()
+
+# Options of the squares that need a choice, in the order of their buttons
+CHOICES = {}
+
+
+def register_effect(effect):
+    """
+    Adds the effect of a square kind, or replaces it. A new kind can be used
+    in the layout files once its effect is registered, see stboard.
+    effect: SquareEffect object
+    Returns: effect
+    """
+    EFFECTS[effect.kind] = effect
+    if effect.options:
+        CHOICES[effect.kind] = effect.options
+    else:
+        CHOICES.pop(effect.kind, None)
+    board_effects.clear()
+    return effect
+
+
+for effect in (StartEffect(), NormalEffect(), EndEffect(), TPointsEffect(), DCrystalsEffect(),
+               BathroomEffect(), TelephoneEffect(), KitchenEffect(), BackEffect(), RiskEffect()):
+    register_effect(effect)
+
+
+def get_board_effects(board):
+    """
+    Resolves the effects of a board once, later calls with the same board
+    share the list and the array.
+    board: list of (kind, value) by position, index 0 is not used
+    Returns: list of SquareEffect and array of the values by position,
+    values are 0 for the kinds without a number
+    """
+    resolved = board_effects.get(id(board))
+    if resolved is None or resolved[0] is not board:
+        resolved = (board, [None] + [EFFECTS[kind] for kind, value in board[1:]],
+                    array('h', [0] + [value or 0 for kind, value in board[1:]]))
+        board_effects[id(board)] = resolved
+    return resolved[1:]
+
+
+default_board = None
+
+
+def get_default_board():
+    """
+    Loads the default board of data/boards the first time it is needed.
+    Returns: list of (kind, value) of the squares by position, see stboard
+    """
+    global default_board
+    if default_board is None:
+        import stboard
+        default_board = stboard.load_board(stboard.DEFAULT_BOARD).board
+    return default_board
+
+
+class GameState(object):
+    """
+    State of a game and its rules, without any drawing or sound.
+    The player moves with roll() and choose(). Squares apply when the
+    player lands on them, at once or when land() is called, so that a view
+    can show the player walking first.
+    The effects of the squares are resolved once by get_board_effects(),
+    so that landing on a square is a single call of its effect.
+    """
+    __slots__ = ('board', 'effects', 'values', 'last', 'position', 'tpoints', 'dcrystals',
+                 'turns', 'choice', 'landing', 'end', 'won')
+
+    def __init__(self, board=None, tpoints=stconfig.STARTING_TPOINTS,
+                 dcrystals=stconfig.STARTING_DCRYSTALS):
+        """
+        board: list of (kind, value) by position, by default the default
+        board, see get_default_board()
+        """
+        if board is None:
+            board = get_default_board()
+        self.board = board
+        self.effects, self.values = get_board_effects(board)
+        self.last = len(board) - 1
+        self.position = 1
+        self.tpoints = tpoints
+        self.dcrystals = dcrystals
+        self.turns = 0
+        self.choice = None  # kind of the square waiting for a choice
+        self.landing = False  # the player moved but hasn't landed yet
+        self.end = False
+        self.won = None
+
+    def get_square(self, position=None):
+        """
+        Returns: (kind, value) of the square at position, by default where
+        the player is
+        """
+        if position is None:
+            position = self.position
+        return self.board[position]
+
+    def get_effect(self, position=None):
+        """
+        Returns: (SquareEffect, value) of the square at position, by default
+        where the player is
+        """
+        if position is None:
+            position = self.position
+        return self.effects[position], self.values[position]
+
+    def get_choices(self):
+        """
+        Returns: options of the pending choice, empty if there is none
+        """
+        if self.choice is None:
+            return ()
+        return self.effects[self.position].get_options(self, self.values[self.position])
+
+    def get_message(self):
+        """
+        Returns: message of the square the player is on, None if it has none
+        """
+        return self.effects[self.position].get_message(self.values[self.position])
+
+    def can_roll(self):
+        return not (self.end or self.landing or self.choice is not None)
+
+    def roll(self, dice, land=True):
+        """
+        Moves the player by a dice roll.
+        dice: rolled number
+        land: apply the square at once, otherwise call land()
+        """
+        if not self.can_roll():
+            raise ValueError("can't roll the dice now")
+        self.turns += 1
+        self.move(dice, land)
+
+    def choose(self, option, land=True):
+        """
+        Makes the pending choice.
+        option: one of get_choices(), e.g. a Dream Crystal can't be used
+        without one
+        land: apply the square at once if the player moves, otherwise call
+        land()
+        Returns: True if the player moves
+        """
+        if self.choice is None or option not in self.get_choices():
+            raise ValueError('not a choice: %r' % (option,))
+        self.choice = None
+        return self.effects[self.position].choose(self, self.values[self.position], option, land)
+
+    def move(self, steps, land=True):
+        """
+        Moves the player steps squares, up to the last square.
+        """
+        self.position = max(1, min(self.position + steps, self.last))
+        self.landing = True
+        if land:
+            self.land()
+
+    def land(self):
+        """
+        Applies the square the player moved to.
+        """
+        self.landing = False
+        if self.position == self.last:
+            self.end = True
+        self.effects[self.position].land(self, self.values[self.position])
+
+        if self.tpoints <= 0:
+            self.tpoints = 0
+            self.end = True
+        if self.end:
+            self.choice = None
+            self.won = self.tpoints > 0
+
+
+def play_game(roll_dice, policy, state=None, max_turns=None):
+    """
+    Plays a game to the end.
+    roll_dice: function returning a dice roll, e.g. lambda: rng.randint(1, 6)
+    policy: function of the game state returning the option of its pending
+    choice, see GameState.get_choices()
+    max_turns: stop after this many dice rolls
+    Returns: game state
+    """
+    if state is None:
+        state = GameState()
+    while not state.end:
+        if state.choice is not None:
+            state.choose(policy(state))
+        elif max_turns is not None and state.turns >= max_turns:
+            break
+        else:
+            state.roll(roll_dice())
+    return state
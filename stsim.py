@@ -0,0 +1,322 @@
+"""
+Sleeping Troubles v0.1.3
+
+Sleeping Troubles is a simple board game, developed with Python and Pygame, implementing a State machine.
+Sleeping Troubles requires Pygame to be installed. Pygame can be downloaded from http://pygame.org.
+Developed by Yannis Maragos. Concept and design by Evi Filakouri.
+
+Copyright (C) 2018 Yannis Maragos.
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License version 2 only,
+as published by the Free Software Foundation.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import sys
+import numpy as np
+import stconfig
+import strules
+
+# Choice of every square kind, used unless another policy is given
+DEFAULT_POLICY = {
+    'telephone': 'tpoints',
+    'kitchen': 'tpoints',
+    'back': 'dcrystals',
+    'risk': 'risk'
+}
+BATCH_SIZE = 1000000  # games simulated at once, limits the memory used
+MAX_TURNS = 1000  # games still going after this many dice rolls are left unfinished
+
+
+class BoardTables(object):
+    """
+    Square effects of a board as arrays indexed by position.
+    The first option of every choice moves the player (by move), the
+    second one changes the inventory (by stay_tpoints and stay_dcrystals).
+    """
+    TABLES = ('tpoints_add', 'tpoints_set', 'dcrystals_add', 'move', 'stay_tpoints',
+              'stay_dcrystals', 'needs_dcrystal')
+
+    def __init__(self, board=None):
+        if board is None:
+            board = strules.get_default_board()
+        size = len(board)
+        self.board = board
+        self.last = size - 1
+        self.tpoints_add = np.zeros(size, np.int16)
+        # -1 keeps the Time Points
+        self.tpoints_set = np.full(size, -1, np.int16)
+        self.dcrystals_add = np.zeros(size, np.int16)
+        self.choice = np.zeros(size, bool)
+        self.move = np.zeros(size, np.int16)
+        self.stay_tpoints = np.zeros(size, np.int16)
+        self.stay_dcrystals = np.zeros(size, np.int16)
+        self.needs_dcrystal = np.zeros(size, bool)
+        # every square kind describes its entries, see strules.SquareEffect
+        for position in range(1, size):
+            kind, value = board[position]
+            effect = strules.EFFECTS[kind]
+            for name, entry in effect.get_tables(value).items():
+                if name not in self.TABLES:
+                    raise ValueError('not a table of %s: %r' % (kind, name))
+                getattr(self, name)[position] = entry
+            self.choice[position] = bool(effect.options)
+
+    def tobytes(self):
+        """
+        Returns: the contents of the tables, to tell if the rules changed
+        """
+        return b''.join(getattr(self, name).tobytes() for name in self.TABLES)
+
+    def get_policy_table(self, policy):
+        """
+        policy: dict of the option chosen on each square kind
+        Returns: bool array by position, True where the player moves
+        """
+        table = np.zeros(len(self.board), bool)
+        for position in range(1, len(self.board)):
+            kind = self.board[position][0]
+            if kind in strules.CHOICES:
+                if policy[kind] not in strules.CHOICES[kind]:
+                    raise ValueError('not a choice of %s: %r' %
+                                     (kind, policy[kind]))
+                table[position] = policy[kind] == strules.CHOICES[kind][0]
+        return table
+
+
+class SimulationResult(object):
+    """
+    Totals of simulated games, results of several runs can be merged.
+    turns: games by number of dice rolls, for all, won and lost games
+    visits: landings by square
+    """
+
+    def __init__(self, squares):
+        self.games = 0
+        self.wins = 0
+        self.losses = 0
+        self.unfinished = 0
+        self.turns = np.zeros(1, np.int64)
+        self.win_turns = np.zeros(1, np.int64)
+        self.loss_turns = np.zeros(1, np.int64)
+        self.visits = np.zeros(squares, np.int64)
+
+    def add_games(self, turns, won):
+        """
+        Adds finished games.
+        turns: array of dice rolls of each game
+        won: bool array
+        """
+        self.games += len(turns)
+        self.wins += int(np.count_nonzero(won))
+        self.losses += len(turns) - int(np.count_nonzero(won))
+        self.turns = add_counts(self.turns, np.bincount(turns))
+        self.win_turns = add_counts(self.win_turns, np.bincount(turns[won]))
+        self.loss_turns = add_counts(
+            self.loss_turns, np.bincount(turns[~won]))
+
+    def merge(self, other):
+        self.games += other.games
+        self.wins += other.wins
+        self.losses += other.losses
+        self.unfinished += other.unfinished
+        self.turns = add_counts(self.turns, other.turns)
+        self.win_turns = add_counts(self.win_turns, other.win_turns)
+        self.loss_turns = add_counts(self.loss_turns, other.loss_turns)
+        self.visits = self.visits + other.visits
+        return self
+
+    def get_win_rate(self):
+        return self.wins / float(self.games) if self.games else 0.0
+
+    def get_mean_turns(self, turns=None):
+        """
+        Returns: mean dice rolls of the games of a turns histogram, by default
+        of all games
+        """
+        if turns is None:
+            turns = self.turns
+        total = turns.sum()
+        if total == 0:
+            return 0.0
+        return float(np.dot(np.arange(len(turns)), turns)) / total
+
+    def get_turns_percentile(self, percent, turns=None):
+        """
+        Returns: dice rolls within which percent % of the games ended
+        """
+        if turns is None:
+            turns = self.turns
+        cumulative = np.cumsum(turns)
+        if cumulative[-1] == 0:
+            return 0
+        return int(np.searchsorted(cumulative, cumulative[-1] * percent / 100.0))
+
+    def get_visit_frequencies(self):
+        """
+        Returns: array of the average landings on each square per game
+        """
+        return self.visits / float(max(self.games + self.unfinished, 1))
+
+    def get_report(self):
+        lines = [
+            'Games:        %d' % (self.games + self.unfinished),
+            'Win rate:     %.4f' % self.get_win_rate(),
+            'Wins:         %d' % self.wins,
+            'Losses:       %d' % self.losses,
+            'Unfinished:   %d' % self.unfinished,
+            'Turns:        mean %.2f (won %.2f, lost %.2f), median %d, 90%% %d, 99%% %d, max %d' % (
+                self.get_mean_turns(), self.get_mean_turns(self.win_turns),
+                self.get_mean_turns(self.loss_turns),
+                self.get_turns_percentile(50), self.get_turns_percentile(90),
+                self.get_turns_percentile(99), len(self.turns) - 1),
+            'Square visits per game:'
+        ]
+        frequencies = self.get_visit_frequencies()
+        for position in range(1, len(frequencies)):
+            lines.append('  %2d %.4f' % (position, frequencies[position]))
+        return '\n'.join(lines)
+
+
+def get_policy_function(tables, policy):
+    """
+    Returns: policy as a function of (positions, tpoints, dcrystals) arrays,
+    see simulate()
+    """
+    if not isinstance(policy, dict):
+        return policy
+    policy_table = tables.get_policy_table(policy)
+
+    def policy_function(positions, tpoints, dcrystals):
+        return policy_table[positions]
+    return policy_function
+
+
+def add_counts(a, b):
+    """
+    Returns: sum of two histograms of different lengths
+    """
+    if len(a) < len(b):
+        a, b = b, a
+    a = a.copy()
+    a[:len(b)] += b
+    return a
+
+
+def simulate(games, policy=DEFAULT_POLICY, seed=None, board=None,
+             max_turns=MAX_TURNS, rng=None):
+    """
+    Plays games at once, with the rules of strules.GameState.
+    games: number of games
+    policy: dict of the option chosen on each square kind, or a function
+    (positions, tpoints, dcrystals) returning a bool array, True where
+    the player moves, see BoardTables
+    seed: seed of the dice rolls, ignored if rng is given
+    rng: numpy Generator of the dice rolls
+    board: list of (kind, value) by position, by default the default board
+    Returns: SimulationResult
+    """
+    tables = BoardTables(board)
+    board = tables.board
+    policy = get_policy_function(tables, policy)
+    if rng is None:
+        rng = np.random.default_rng(seed)
+    result = SimulationResult(len(board))
+    while games > 0:
+        batch = min(games, BATCH_SIZE)
+        simulate_batch(tables, policy, batch, rng, max_turns, result)
+        games -= batch
+    return result
+
+
+def simulate_batch(tables, policy, games, rng, max_turns, result):
+    """
+    Plays games, keeping only the unfinished games in the arrays.
+    """
+    last = tables.last
+    position = np.ones(games, np.intp)
+    tpoints = np.full(games, stconfig.STARTING_TPOINTS, np.int16)
+    dcrystals = np.full(games, stconfig.STARTING_DCRYSTALS, np.int16)
+
+    for turn in range(1, max_turns + 1):
+        if not len(position):
+            break
+        position += rng.integers(1, 7, size=len(position))
+        np.minimum(position, last, out=position)
+        ended = land(tables, policy, position,
+                     tpoints, dcrystals, result.visits)
+
+        if ended.any():
+            result.add_games(np.full(np.count_nonzero(ended), turn, np.int64),
+                             tpoints[ended] > 0)
+            going = ~ended
+            position, tpoints, dcrystals = position[going], tpoints[going], dcrystals[going]
+
+    result.unfinished += len(position)
+    return result
+
+
+def apply_squares(tables, position, tpoints, dcrystals, visits=None):
+    """
+    Applies the effects of the squares the players moved to on their
+    inventory, changing the arrays in place. Choices are left to be made.
+    visits: array of landings by square to add to
+    Returns: bool array of the games that ended
+    """
+    if visits is not None:
+        visits += np.bincount(position, minlength=len(visits))
+    tpoints += tables.tpoints_add[position]
+    reset = tables.tpoints_set[position]
+    np.copyto(tpoints, reset, where=reset >= 0)
+    dcrystals += tables.dcrystals_add[position]
+    ended = (position == tables.last) | (tpoints <= 0)
+    np.maximum(tpoints, 0, out=tpoints)
+    return ended
+
+
+def land(tables, policy, position, tpoints, dcrystals, visits=None):
+    """
+    Applies the squares the players moved to, and the choices made on them,
+    changing the arrays in place.
+    visits: array of landings by square to add to
+    Returns: bool array of the games that ended
+    """
+    ended = apply_squares(tables, position, tpoints, dcrystals, visits)
+
+    choosing = np.flatnonzero(tables.choice[position] & ~ended)
+    if len(choosing):
+        p = position[choosing]
+        t = tpoints[choosing]
+        d = dcrystals[choosing]
+        moves = np.asarray(policy(p, t, d), bool) | (
+            tables.needs_dcrystal[p] & (d <= 0))
+        stay = ~moves
+        t[stay] += tables.stay_tpoints[p[stay]]
+        d[stay] += tables.stay_dcrystals[p[stay]]
+        p[moves] = np.clip(p[moves] + tables.move[p[moves]], 1, tables.last)
+
+        # land again where the players moved
+        moving = np.flatnonzero(moves)
+        if len(moving):
+            mp, mt, md = p[moving], t[moving], d[moving]
+            ended_again = land(tables, policy, mp, mt, md, visits)
+            p[moving], t[moving], d[moving] = mp, mt, md
+            ended[choosing[moving[ended_again]]] = True
+        position[choosing] = p
+        tpoints[choosing] = t
+        dcrystals[choosing] = d
+    return ended
+
+
+if __name__ == '__main__':
+    # usage: python stsim.py [games] [seed]
+    games = int(float(sys.argv[1])) if len(sys.argv) > 1 else 1000000
+    seed = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    print(simulate(games, seed=seed).get_report())
@@ -0,0 +1,462 @@
+"""
+Sleeping Troubles v0.1.3
+
+Sleeping Troubles is a simple board game, developed with Python and Pygame, implementing a State machine.
+Sleeping Troubles requires Pygame to be installed. Pygame can be downloaded from http://pygame.org.
+Developed by Yannis Maragos. Concept and design by Evi Filakouri.
+
+Copyright (C) 2018 Yannis Maragos.
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License version 2 only,
+as published by the Free Software Foundation.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import os
+import sys
+import json
+import hashlib
+import zipfile
+import numpy as np
+import stconfig
+import strules
+import stsim
+
+VERSION = 2
+MAX_TPOINTS = 40  # higher Time Points and Dream Crystals are counted as these,
+MAX_DCRYSTALS = 10  # games almost never get there
+TOLERANCE = 1e-12  # probability of the games still going when solving stops
+MAX_TURNS = 10000
+
+# solutions are cached next to the game, also in frozen builds
+if getattr(sys, 'frozen', False):
+    main_dir = os.path.split(os.path.abspath(sys.executable))[0]
+else:
+    main_dir = os.path.split(os.path.abspath(__file__))[0]
+cache_dir = os.path.join(main_dir, 'cache')
+
+
+class StateSpace(object):
+    """
+    All (position, Time Points, Dream Crystals) states a player can roll the
+    dice from, numbered from 0. Two more numbers stand for the won and lost
+    games.
+    Time Points go down to min_tpoints, a choice that costs Time Points can
+    leave less than 1 until the next landing.
+    """
+
+    def __init__(self, tables, max_tpoints=MAX_TPOINTS, max_dcrystals=MAX_DCRYSTALS):
+        self.last = tables.last
+        self.min_tpoints = min(0, 1 + int(tables.stay_tpoints.min()))
+        self.max_tpoints = max_tpoints
+        self.max_dcrystals = max_dcrystals
+        self.shape = (self.last + 1, max_tpoints - self.min_tpoints + 1,
+                      max_dcrystals + 1)
+        self.size = int(np.prod(self.shape))
+        self.won = self.size
+        self.lost = self.size + 1
+        position, tpoints, dcrystals = np.indices(self.shape)
+        self.positions = position.ravel()
+        self.tpoints = tpoints.ravel() + self.min_tpoints
+        self.dcrystals = dcrystals.ravel()
+
+    def get_state(self, position, tpoints, dcrystals):
+        """
+        Returns: number of the state, arrays of numbers for arrays
+        """
+        tpoints = np.clip(tpoints, self.min_tpoints,
+                          self.max_tpoints) - self.min_tpoints
+        dcrystals = np.minimum(dcrystals, self.max_dcrystals)
+        return (position * self.shape[1] + tpoints) * self.shape[2] + dcrystals
+
+    def get_transitions(self, tables, policy):
+        """
+        Plays every dice roll from every state.
+        policy: function of the player's choices, see stsim.simulate()
+        Returns: array of the next state of each state (rows) and dice roll
+        (columns)
+        """
+        transitions = np.empty((self.size, 6), np.intp)
+        for dice in range(1, 7):
+            position = np.minimum(self.positions + dice, self.last)
+            tpoints = self.tpoints.copy()
+            dcrystals = self.dcrystals.copy()
+            ended = stsim.land(tables, policy, position, tpoints, dcrystals)
+            states = self.get_state(position, tpoints, dcrystals)
+            states[ended] = np.where(
+                tpoints[ended] > 0, self.won, self.lost)
+            transitions[:, dice - 1] = states
+        return transitions
+
+
+class Solution(object):
+    """
+    Exact outcome of games played with a policy.
+    win_turns, loss_turns: probability of winning and losing on each turn
+    state_wins: probability of winning from each state, see StateSpace, nan
+    for the states the policy never reaches
+    """
+
+    def __init__(self, space, win_turns, loss_turns, state_wins):
+        self.space = space
+        self.win_turns = win_turns
+        self.loss_turns = loss_turns
+        self.state_wins = state_wins
+        self.turns = win_turns + loss_turns
+
+    def get_win_probability(self, position=1, tpoints=stconfig.STARTING_TPOINTS,
+                            dcrystals=stconfig.STARTING_DCRYSTALS):
+        """
+        Returns: probability of winning from a state, by default from the
+        start, nan if the policy never reaches the state
+        """
+        return float(self.state_wins[self.space.get_state(position, tpoints, dcrystals)])
+
+    def get_loss_probability(self):
+        return float(self.loss_turns.sum())
+
+    def get_unfinished_probability(self):
+        """
+        Returns: probability of the games left when solving stopped
+        """
+        return max(0.0, 1.0 - float(self.turns.sum()))
+
+    def get_expected_turns(self, turns=None):
+        """
+        Returns: expected dice rolls of the games of a turns distribution,
+        by default of all games
+        """
+        if turns is None:
+            turns = self.turns
+        return float(np.dot(np.arange(len(turns)), turns) / turns.sum())
+
+    def get_report(self):
+        cumulative = np.cumsum(self.turns)
+        lines = [
+            'Win probability:  %.6f' % self.get_win_probability(),
+            'Loss probability: %.6f' % self.get_loss_probability(),
+            'Expected turns:   %.4f (won %.4f, lost %.4f)' % (
+                self.get_expected_turns(), self.get_expected_turns(self.win_turns),
+                self.get_expected_turns(self.loss_turns)),
+            'Turns:            median %d, 90%% %d, 99%% %d' % tuple(
+                np.searchsorted(cumulative, cumulative[-1] * p) for p in (0.5, 0.9, 0.99)),
+            'Turns distribution:'
+        ]
+        for turn in range(1, len(self.turns)):
+            if self.turns[turn] >= 1e-6:
+                lines.append('  %3d %.6f' % (turn, self.turns[turn]))
+        return '\n'.join(lines)
+
+
+class OptimalPolicy(object):
+    """
+    Best option of every choice, for every position, Time Points and Dream
+    Crystals the choice is made with, see solve_optimal().
+    It can be used as a policy function, e.g. of solve() or stsim.simulate().
+    move_wins, stay_wins: win probability of the first (moving) and second
+    option of each choice state, numbered as in StateSpace, -1 where the
+    option is not available
+    state_wins: win probability from each state the dice are rolled from,
+    playing the best options
+    """
+
+    def __init__(self, space, board, move_wins, stay_wins, state_wins):
+        self.space = space
+        self.board = board
+        self.move_wins = move_wins
+        self.stay_wins = stay_wins
+        self.state_wins = state_wins
+        self.moves = move_wins >= stay_wins
+
+    def __call__(self, positions, tpoints, dcrystals):
+        return self.moves[self.space.get_state(positions, tpoints, dcrystals)]
+
+    def get_option_wins(self, position, tpoints, dcrystals):
+        """
+        Returns: dict of the win probability of each option available on
+        the choice square at position
+        """
+        kind = self.board[position][0]
+        state = self.space.get_state(position, tpoints, dcrystals)
+        wins = {}
+        for option, option_wins in zip(strules.CHOICES[kind], (self.move_wins, self.stay_wins)):
+            if option_wins[state] >= 0:
+                wins[option] = float(option_wins[state])
+        return wins
+
+    def get_advice(self, position, tpoints, dcrystals):
+        """
+        Returns: tuple of the best option of the choice square at position
+        and its win probability
+        """
+        wins = self.get_option_wins(position, tpoints, dcrystals)
+        option = max(strules.CHOICES[self.board[position][0]],
+                     key=lambda option: wins.get(option, -1))
+        return option, wins[option]
+
+    def get_win_probability(self, position=1, tpoints=stconfig.STARTING_TPOINTS,
+                            dcrystals=stconfig.STARTING_DCRYSTALS):
+        """
+        Returns: probability of winning from a state with the best options,
+        by default from the start
+        """
+        return float(self.state_wins[self.space.get_state(position, tpoints, dcrystals)])
+
+
+def get_reachable(space, transitions, start):
+    """
+    Returns: sorted array of the states that can be reached from start
+    """
+    reached = np.zeros(space.size + 2, bool)
+    reached[start] = True
+    frontier = np.array([start])
+    while len(frontier):
+        states = np.unique(transitions[frontier])
+        frontier = states[~reached[states]]
+        frontier = frontier[frontier < space.size]
+        reached[frontier] = True
+    return np.flatnonzero(reached[:space.size])
+
+
+def reduce_transitions(space, transitions, states):
+    """
+    Keeps only the transitions of states, numbering them from 0 in their
+    order, followed by the won and lost games.
+    Returns: transitions array
+    """
+    numbers = np.full(space.size + 2, -1, np.intp)
+    numbers[states] = np.arange(len(states))
+    numbers[space.won] = len(states)
+    numbers[space.lost] = len(states) + 1
+    return numbers[transitions[states]]
+
+
+def get_turns(transitions, start):
+    """
+    Follows the probability of the states turn by turn from start.
+    transitions: reduced transitions, see reduce_transitions()
+    Returns: probability of winning and losing on each turn
+    """
+    size = len(transitions)
+    mass = np.zeros(size)
+    mass[start] = 1.0
+    win_turns = [0.0]
+    loss_turns = [0.0]
+    for turn in range(MAX_TURNS):
+        states = np.bincount(transitions.ravel(), weights=np.repeat(mass / 6.0, 6),
+                             minlength=size + 2)
+        win_turns.append(states[size])
+        loss_turns.append(states[size + 1])
+        mass = states[:size]
+        if mass.sum() < TOLERANCE:
+            break
+    return np.array(win_turns), np.array(loss_turns)
+
+
+def get_state_wins(transitions):
+    """
+    Solves the probability of winning from every state, iterating
+    p(state) = mean of p(next state) over the dice rolls.
+    transitions: reduced transitions, see reduce_transitions()
+    """
+    size = len(transitions)
+    wins = np.zeros(size + 2)
+    wins[size] = 1.0
+    for i in range(MAX_TURNS):
+        new_wins = wins[transitions].mean(axis=1)
+        change = np.abs(new_wins - wins[:size]).max()
+        wins[:size] = new_wins
+        if change < TOLERANCE:
+            break
+    return wins[:size]
+
+
+def get_policy_key(tables, space, policy, board):
+    """
+    Returns: hash of the board, the state space and the choices the policy
+    makes on every choice square
+    """
+    choices = np.flatnonzero(tables.choice)
+    position, tpoints, dcrystals = [a.ravel() for a in np.meshgrid(
+        choices, np.arange(space.min_tpoints, space.max_tpoints + 1),
+        np.arange(space.max_dcrystals + 1), indexing='ij')]
+    decisions = np.asarray(policy(position, tpoints, dcrystals), bool)
+    key = hashlib.sha256()
+    key.update(json.dumps([VERSION, board, space.max_tpoints, space.max_dcrystals,
+                           stconfig.STARTING_TPOINTS, stconfig.STARTING_DCRYSTALS]).encode('utf-8'))
+    key.update(tables.tobytes())
+    key.update(np.packbits(decisions).tobytes())
+    return key.hexdigest()
+
+
+solutions = {}
+
+
+def solve(policy=stsim.DEFAULT_POLICY, board=None, cache=True):
+    """
+    Solves the games played with a policy, exactly up to TOLERANCE.
+    Solutions are cached in memory and in cache_dir, by a hash of the board
+    and the choices of the policy.
+    policy: dict of the option chosen on each square kind, or a function,
+    see stsim.simulate()
+    board: list of (kind, value) by position, by default the default board
+    Returns: Solution
+    """
+    tables = stsim.BoardTables(board)
+    board = tables.board
+    space = StateSpace(tables)
+    policy = stsim.get_policy_function(tables, policy)
+    key = get_policy_key(tables, space, policy, board)
+    if cache:
+        solution = solutions.get(key) or load_solution(space, key)
+        if solution is not None:
+            solutions[key] = solution
+            return solution
+
+    # only the states the policy reaches from the start are solved
+    start = space.get_state(1, stconfig.STARTING_TPOINTS,
+                            stconfig.STARTING_DCRYSTALS)
+    transitions = space.get_transitions(tables, policy)
+    states = get_reachable(space, transitions, start)
+    transitions = reduce_transitions(space, transitions, states)
+    win_turns, loss_turns = get_turns(
+        transitions, np.searchsorted(states, start))
+    state_wins = np.full(space.size, np.nan)
+    state_wins[states] = get_state_wins(transitions)
+    solution = Solution(space, win_turns, loss_turns, state_wins)
+    if cache:
+        solutions[key] = solution
+        save_solution(solution, key)
+    return solution
+
+
+def get_optimal_wins(space, tables):
+    """
+    Solves the win probability of every state with the best options, by
+    value iteration over the states the dice are rolled from and the states
+    choices are made in.
+    Returns: win probabilities of moving and staying in every choice state,
+    and of every state the dice are rolled from, see OptimalPolicy
+    """
+    size = space.size
+    won, lost = 2*size, 2*size + 1
+
+    def get_outcomes(position, tpoints, dcrystals):
+        # numbers of the states after landing, choice states come after
+        # the dice roll states
+        tpoints = tpoints.copy()
+        dcrystals = dcrystals.copy()
+        ended = stsim.apply_squares(tables, position, tpoints, dcrystals)
+        states = space.get_state(position, tpoints, dcrystals) + \
+            np.where(tables.choice[position], size, 0)
+        states[ended] = np.where(tpoints[ended] > 0, won, lost)
+        return states
+
+    positions, tpoints, dcrystals = space.positions, space.tpoints, space.dcrystals
+    rolls = np.empty((size, 6), np.intp)
+    for dice in range(1, 7):
+        rolls[:, dice - 1] = get_outcomes(
+            np.minimum(positions + dice, space.last), tpoints, dcrystals)
+    moves = get_outcomes(np.clip(positions + tables.move[positions], 1, space.last),
+                         tpoints, dcrystals)
+    stays = space.get_state(positions, tpoints + tables.stay_tpoints[positions],
+                            dcrystals + tables.stay_dcrystals[positions])
+    can_stay = ~(tables.needs_dcrystal[positions] & (dcrystals <= 0))
+
+    wins = np.zeros(2*size + 2)
+    wins[won] = 1.0
+    for i in range(MAX_TURNS):
+        state_wins = wins[rolls].mean(axis=1)
+        move_wins = wins[moves]
+        stay_wins = np.where(can_stay, wins[stays], -1.0)
+        change = np.abs(state_wins - wins[:size]).max()
+        wins[:size] = state_wins
+        wins[size:2*size] = np.maximum(move_wins, stay_wins)
+        if change < TOLERANCE:
+            break
+    return move_wins, stay_wins, state_wins
+
+
+optimal_policies = {}
+
+
+def solve_optimal(board=None, cache=True):
+    """
+    Finds the best option of every choice, saved in cache_dir so that it
+    is solved only once per board.
+    board: list of (kind, value) by position, by default the default board
+    Returns: OptimalPolicy
+    """
+    tables = stsim.BoardTables(board)
+    board = tables.board
+    space = StateSpace(tables)
+    key = hashlib.sha256(json.dumps([VERSION, board, space.max_tpoints, space.max_dcrystals,
+                                     stconfig.STARTING_TPOINTS, stconfig.STARTING_DCRYSTALS]).encode('utf-8'))
+    key.update(tables.tobytes())
+    key = key.hexdigest()
+    path = os.path.join(cache_dir, 'optimal-%s.npz' % key)
+    if cache:
+        policy = optimal_policies.get(key)
+        if policy is not None:
+            return policy
+        try:
+            with np.load(path) as data:
+                policy = OptimalPolicy(space, board, data['move_wins'],
+                                       data['stay_wins'], data['state_wins'])
+        except (OSError, EOFError, ValueError, KeyError, zipfile.BadZipFile):
+            policy = None
+        if policy is not None:
+            optimal_policies[key] = policy
+            return policy
+
+    policy = OptimalPolicy(space, board, *get_optimal_wins(space, tables))
+    if cache:
+        optimal_policies[key] = policy
+        try:
+            if not os.path.isdir(cache_dir):
+                os.makedirs(cache_dir)
+            np.savez(path, move_wins=policy.move_wins, stay_wins=policy.stay_wins,
+                     state_wins=policy.state_wins)
+        except OSError as message:
+            print("Couldn't save optimal policy:", message)
+    return policy
+
+
+def save_solution(solution, key):
+    try:
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+        np.savez(os.path.join(cache_dir, 'solution-%s.npz' % key),
+                 win_turns=solution.win_turns, loss_turns=solution.loss_turns,
+                 state_wins=solution.state_wins)
+    except OSError as message:
+        print("Couldn't save solution:", message)
+
+
+def load_solution(space, key):
+    """
+    Returns: Solution saved in cache_dir, None if there is none
+    """
+    try:
+        with np.load(os.path.join(cache_dir, 'solution-%s.npz' % key)) as data:
+            return Solution(space, data['win_turns'], data['loss_turns'], data['state_wins'])
+    except (OSError, EOFError, ValueError, KeyError, zipfile.BadZipFile):
+        return None
+
+
+if __name__ == '__main__':
+    # usage: python stsolver.py [optimal | telephone kitchen back risk options]
+    if sys.argv[1:2] == ['optimal']:
+        policy = solve_optimal()
+    else:
+        policy = dict(stsim.DEFAULT_POLICY)
+        for kind, option in zip(('telephone', 'kitchen', 'back', 'risk'), sys.argv[1:]):
+            policy[kind] = option
+    print(solve(policy).get_report())
@@ -0,0 +1,5 @@
+import os
+
+# pygame runs without a window or a sound device
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
@@ -0,0 +1,34 @@
+import stsolver
+import stsim
+import strules
+import random
+import pytest
+np = pytest.importorskip('numpy')
+
+GAMES = 20000
+
+
+def play_default_policy(state):
+    option = stsim.DEFAULT_POLICY[state.choice]
+    if option not in state.get_choices():
+        return state.get_choices()[0]
+    return option
+
+
+def test_rules_simulator_and_solver_agree():
+    solution = stsolver.solve(cache=False)
+    win_rate = solution.get_win_probability()
+    mean_turns = solution.get_expected_turns()
+
+    rng = random.Random(1)
+    games = [strules.play_game(lambda: rng.randint(1, 6), play_default_policy)
+             for i in range(GAMES)]
+    assert np.mean([game.won for game in games]
+                   ) == pytest.approx(win_rate, abs=0.02)
+    assert np.mean([game.turns for game in games]
+                   ) == pytest.approx(mean_turns, abs=0.3)
+
+    result = stsim.simulate(10*GAMES, seed=1)
+    assert result.unfinished == 0
+    assert result.get_win_rate() == pytest.approx(win_rate, abs=0.01)
+    assert result.get_mean_turns() == pytest.approx(mean_turns, abs=0.1)
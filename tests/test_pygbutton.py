@@ -0,0 +1,39 @@
+from collections import OrderedDict
+import pytest
+pg = pytest.importorskip('pygame')
+import pygbutton
+
+
+@pytest.fixture
+def display():
+    pg.display.init()
+    yield pg.display.set_mode((100, 100))
+    pg.display.quit()
+
+
+def test_buttons_share_their_skins(display):
+    button = pygbutton.PygButton((0, 0, 100, 30), 'Play')
+    other = pygbutton.PygButton((50, 50, 100, 30), 'Play')
+    assert other.surfaceNormal is button.surfaceNormal
+    assert other.surfaceHighlight is button.surfaceHighlight
+    assert pygbutton.PygButton((0, 0, 100, 30), 'Stop').surfaceNormal is not button.surfaceNormal
+    assert pygbutton.PygButton((0, 0, 120, 30), 'Play').surfaceNormal is not button.surfaceNormal
+
+
+def test_changed_button_gets_another_skin(display):
+    button = pygbutton.PygButton((0, 0, 100, 30), 'Play')
+    normal = button.surfaceNormal
+    button.caption = 'Stop'
+    assert button.surfaceNormal is not normal
+    button.caption = 'Play'
+    assert button.surfaceNormal is normal
+
+
+def test_skins_are_bounded(display, monkeypatch):
+    monkeypatch.setattr(pygbutton, 'MAX_SKINS', 2)
+    monkeypatch.setattr(pygbutton, 'skins', OrderedDict())
+    first = pygbutton.PygButton((0, 0, 50, 20), 'a')
+    pygbutton.PygButton((0, 0, 50, 20), 'b')
+    assert pygbutton.PygButton((0, 0, 50, 20), 'a').surfaceNormal is first.surfaceNormal
+    pygbutton.PygButton((0, 0, 50, 20), 'c')
+    assert [key[1] for key in pygbutton.skins] == ['a', 'c']
@@ -0,0 +1,131 @@
+import time
+import pytest
+pg = pytest.importorskip('pygame')
+import stconfig
+import stlayout
+import st
+
+
+def create_control():
+    pg.init()
+    app = st.Control(size=(stconfig.ST_SCREEN_WIDTH,
+                     stconfig.ST_SCREEN_HEIGHT), fps=stconfig.ST_FPS)
+    app.setup_states({'menu': st.Menu(), 'credits': st.Credits(), 'game': st.Game(),
+                      'help': st.Help(), 'pause': st.Pause()}, 'menu')
+    return app
+
+
+@pytest.fixture
+def control(monkeypatch):
+    monkeypatch.setattr(stconfig, 'RENDERER', 'software')
+    monkeypatch.setattr(stconfig, 'FULLSCREEN', False)
+    yield create_control()
+    st.States.game_on = False
+    pg.display.quit()
+
+
+def test_scheduler_runs_at_the_highest_requested_rate():
+    scheduler = st.FrameScheduler(30)
+    scheduler.set_frame_rates({'state': 0, 'dice': 20})
+    assert scheduler.fps == 20
+    scheduler.set_frame_rates({'state': 0, 'player': 60})
+    assert scheduler.fps == 30
+    scheduler.set_frame_rates({})
+    assert scheduler.fps == 0
+
+
+def test_scheduler_paces_frames():
+    scheduler = st.FrameScheduler(100)
+    scheduler.set_frame_rates({'player': 100})
+    scheduler.wait_frame()
+    start = time.perf_counter()
+    for i in range(5):
+        scheduler.wait_frame()
+    assert time.perf_counter() - start >= 0.045
+    assert scheduler.get_stats()['frames'] == 6
+
+
+def test_control_sleeps_while_idle(control, monkeypatch):
+    monkeypatch.setattr(stconfig, 'IDLE_TIMEOUT', 50)
+    control.update(0.0)
+    control.scheduler.set_frame_rates(control.state.get_frame_rates())
+    assert control.is_idle()
+    pg.event.clear()
+    start = time.perf_counter()
+    control.wait_event()
+    assert time.perf_counter() - start >= 0.04
+
+
+def test_advisor_is_off_if_it_cant_be_solved(control, monkeypatch):
+    stsolver = pytest.importorskip('stsolver')
+
+    def solve_optimal(board=None, cache=True):
+        raise OSError('cache is not writable')
+    monkeypatch.setattr(stconfig, 'ADVISOR', True)
+    monkeypatch.setattr(stsolver, 'solve_optimal', solve_optimal)
+    assert st.Game().advisor is None
+
+
+def test_popups_of_old_sizes_are_dropped(control, monkeypatch):
+    monkeypatch.setattr(stconfig, 'POPUP_CACHE_SIZE', 2)
+    game = control.state_dict['game']
+    game.popups.clear()
+    popup = game.get_popup('end', True)
+    for size in ((1000, 700), (1100, 700), (1200, 700)):
+        game.set_layout(stlayout.get_layout(size))
+        game.get_popup('end', True)
+    assert len(game.popups) == 2
+    game.set_layout(stlayout.get_layout(
+        (stconfig.ST_SCREEN_WIDTH, stconfig.ST_SCREEN_HEIGHT)))
+    assert game.get_popup('end', True) is not popup
+
+
+@pytest.fixture
+def gpu_control(monkeypatch):
+    monkeypatch.setattr(stconfig, 'RENDERER', 'gpu')
+    monkeypatch.setattr(stconfig, 'FULLSCREEN', False)
+    app = create_control()
+    if st.States.renderer is None:
+        pg.display.quit()
+        pytest.skip('the SDL2 render API is not available')
+    yield app
+    st.States.renderer = None
+    st.States.game_on = False
+    pg.display.quit()
+
+
+def click(app, button):
+    for event_type in (pg.MOUSEBUTTONDOWN, pg.MOUSEBUTTONUP):
+        app.handle_event(pg.event.Event(
+            event_type, pos=button.rect.center, button=1))
+
+
+def press(app, key):
+    app.handle_event(pg.event.Event(pg.KEYDOWN, key=key, mod=0, unicode=''))
+
+
+def test_gpu_renderer_draws_pauses_and_resizes(gpu_control):
+    app = gpu_control
+    app.update(0.0)
+    click(app, [button for button in app.state.menuButtons
+                if button._propGetId() == 'game'][0])
+    app.update(0.0)
+    app.update(0.0)
+    assert app.state_name == 'game'
+    assert not app.state.redraw
+
+    press(app, pg.K_ESCAPE)
+    app.update(0.0)
+    app.update(0.0)
+    assert app.state_name == 'pause'
+
+    size = (stconfig.ST_SCREEN_WIDTH + 200, stconfig.ST_SCREEN_HEIGHT + 100)
+    app.handle_event(pg.event.Event(
+        pg.WINDOWSIZECHANGED, x=size[0], y=size[1]))
+    app.update(0.0)
+    press(app, pg.K_ESCAPE)
+    app.update(0.0)
+    app.update(0.0)
+    assert app.state_name == 'game'
+    assert app.screen.get_size() == size
+    assert app.state.layout.size == size
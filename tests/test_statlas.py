@@ -0,0 +1,68 @@
+import os
+import shutil
+import pytest
+pg = pytest.importorskip('pygame')
+import statlas
+
+data_dir = os.path.join(os.path.dirname(
+    os.path.dirname(os.path.abspath(__file__))), 'data')
+NAMES = ['dice_1.png', 'dice_question.png', 'hourglass.png']
+
+
+def test_pack_places_images_apart():
+    sizes = [(30, 20), (10, 40), (25, 25), (5, 5), (60, 10)]
+    places, sheets = statlas.pack(sizes, 64, padding=1)
+    rects = [pg.Rect(x - 1, y - 1, w + 2, h + 2)
+             for (sheet, x, y), (w, h) in zip(places, sizes)]
+    for i, rect in enumerate(rects):
+        assert pg.Rect((0, 0), sheets[places[i][0]]).contains(rect)
+        for j in range(i):
+            if places[i][0] == places[j][0]:
+                assert not rect.colliderect(rects[j])
+
+
+def test_pack_rejects_images_larger_than_a_sheet():
+    with pytest.raises(ValueError):
+        statlas.pack([(10, 10), (70, 10)], 64)
+
+
+@pytest.fixture
+def atlas(tmp_path):
+    data = tmp_path / 'data'
+    data.mkdir()
+    for name in NAMES:
+        shutil.copy(os.path.join(data_dir, name), str(data))
+    return str(data), str(tmp_path / 'cache')
+
+
+def test_atlas_keeps_the_pixels(atlas):
+    data, cache = atlas
+    manifest = statlas.get_atlas(NAMES, data, cache)
+    sheets = [statlas.load_sheet(sheet, cache)
+              for sheet in manifest['sheets']]
+    for name in NAMES:
+        sheet, x, y, w, h = manifest['images'][name]
+        image = pg.image.load(os.path.join(data, name))
+        region = sheets[sheet].subsurface((x, y, w, h))
+        assert pg.image.tobytes(region, 'RGBA') == pg.image.tobytes(
+            image, 'RGBA')
+
+
+def test_atlas_is_built_again_when_out_of_date(atlas):
+    data, cache = atlas
+    manifest = statlas.get_atlas(NAMES, data, cache)
+    assert statlas.load_manifest(NAMES, data, cache) == manifest
+
+    # a changed image
+    os.utime(os.path.join(data, NAMES[0]), ns=(0, 0))
+    assert statlas.load_manifest(NAMES, data, cache) is None
+    manifest = statlas.get_atlas(NAMES, data, cache)
+    assert statlas.load_manifest(NAMES, data, cache) == manifest
+
+    # another list of images
+    assert statlas.load_manifest(NAMES[:2], data, cache) is None
+
+    # a truncated sheet
+    with open(os.path.join(cache, manifest['sheets'][0]['file']), 'wb') as f:
+        f.write(b'\0')
+    assert statlas.load_manifest(NAMES, data, cache) is None
@@ -0,0 +1,12 @@
+import stbatch
+import pytest
+np = pytest.importorskip('numpy')
+
+
+def test_run_does_not_depend_on_processes():
+    single, seed = stbatch.run(20000, seed=1, shards=4, processes=1)
+    pooled, seed = stbatch.run(20000, seed=1, shards=4, processes=2)
+    assert (single.games, single.wins, single.unfinished) == (
+        pooled.games, pooled.wins, pooled.unfinished)
+    assert np.array_equal(single.turns, pooled.turns)
+    assert np.array_equal(single.visits, pooled.visits)
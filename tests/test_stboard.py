@@ -0,0 +1,93 @@
+import json
+import os
+import pytest
+import stboard
+import strules
+
+
+def make_layout(*kinds):
+    return {'squares': [{'type': kind, 'grid': [i, 0]} for i, kind in enumerate(kinds)]}
+
+
+def test_default_board_goes_from_start_to_end():
+    board = stboard.load_board(cache=False)
+    assert len(board) == 41
+    assert board.board[1] == ('start', None)
+    assert board.board[-1] == ('end', None)
+
+
+def test_risk_square_goes_back_to_the_bathroom():
+    compiled = stboard.compile_layout(
+        make_layout('start', 'bathroom', 'normal', 'risk', 'end'), 'test')
+    assert compiled['board'][3] == ('risk', -2)
+
+
+@pytest.mark.parametrize('layout', [
+    make_layout('start', 'dragon', 'end'),
+    make_layout('start', 'tpoints', 'end'),
+    make_layout('start', 'normal:2', 'end'),
+    make_layout('start', 'normal', 'normal'),
+    make_layout('normal', 'end'),
+    make_layout('start', 'normal', 'risk', 'end'),
+    {'squares': [{'type': 'start', 'grid': [0, 0]}, {'type': 'end', 'grid': [2, 0]}]},
+    {'squares': [{'type': 'start', 'grid': [0, 0]}, {'type': 'normal', 'grid': [1, 0]},
+                 {'type': 'end', 'grid': [0, 0]}]},
+    {'squares': [{'type': 'start', 'grid': [0, 0], 'colour': 'red'}, {'type': 'end', 'grid': [1, 0]}]},
+])
+def test_compile_layout_rejects_bad_layouts(layout):
+    with pytest.raises(ValueError):
+        stboard.compile_layout(layout, 'test')
+
+
+@pytest.fixture
+def boards(tmp_path, monkeypatch):
+    monkeypatch.setattr(stboard, 'boards_dir', str(tmp_path / 'boards'))
+    monkeypatch.setattr(stboard, 'cache_dir', str(tmp_path / 'cache'))
+    monkeypatch.setattr(stboard, 'boards', {})
+    os.mkdir(stboard.boards_dir)
+
+    def write(*kinds):
+        with open(os.path.join(stboard.boards_dir, 'test.json'), 'w') as f:
+            json.dump(make_layout(*kinds), f)
+    return write
+
+
+def test_changed_board_is_compiled_again(boards):
+    boards('start', 'normal', 'end')
+    board = stboard.load_board('test')
+    assert stboard.load_board('test') is board
+    assert len(os.listdir(stboard.cache_dir)) == 1
+
+    boards('start', 'tpoints:3', 'end')
+    changed = stboard.load_board('test')
+    assert changed.key != board.key
+    assert changed.board[2] == ('tpoints', 3)
+    assert len(os.listdir(stboard.cache_dir)) == 2
+
+
+def test_corrupt_compiled_board_is_compiled_again(boards):
+    boards('start', 'normal', 'end')
+    key = stboard.load_board('test').key
+    with open(os.path.join(stboard.cache_dir, 'board-%s.bin' % key), 'wb') as f:
+        f.write(b'\0garbage')
+    stboard.boards.clear()
+    assert stboard.load_board('test').board[2] == ('normal', None)
+
+
+class QuietEffect(strules.SquareEffect):
+    kind = 'quiet'
+
+
+def test_board_takes_the_registered_effects(boards, monkeypatch):
+    boards('start', 'quiet', 'end')
+    with pytest.raises(ValueError):
+        stboard.load_board('test')
+
+    monkeypatch.setitem(strules.EFFECTS, 'quiet', QuietEffect())
+    assert stboard.load_board('test').board[2] == ('quiet', None)
+
+    # the compiled board isn't used without the effect
+    monkeypatch.delitem(strules.EFFECTS, 'quiet')
+    stboard.boards.clear()
+    with pytest.raises(ValueError):
+        stboard.load_board('test')
@@ -0,0 +1,140 @@
+from collections import OrderedDict
+import pytest
+pg = pytest.importorskip('pygame')
+import stconfig
+import sthelper
+
+RED = (255, 0, 0)
+GREEN = (0, 255, 0)
+BLUE = (0, 0, 255)
+
+
+@pytest.fixture
+def display():
+    pg.display.init()
+    pg.font.init()
+    yield pg.display.set_mode((100, 100))
+    pg.display.quit()
+
+
+def test_text_cache_evicts_least_recently_used(display):
+    size = sthelper.TextCache(1)
+    size.render('Text', 24, RED)
+    cache = sthelper.TextCache(2*size.bytes)
+    red = cache.render('Text', 24, RED)
+    cache.render('Text', 24, GREEN)
+    assert cache.render('Text', 24, RED) is red
+    cache.render('Text', 24, BLUE)
+    assert cache.get_stats() == {'hits': 1, 'misses': 3, 'surfaces': 2,
+                                 'bytes': 2*size.bytes, 'max_bytes': 2*size.bytes}
+    assert cache.render('Text', 24, RED) is red
+    assert cache.render('Text', 24, GREEN) is not None
+    assert cache.get_stats()['misses'] == 4
+
+
+def test_text_cache_keeps_the_newest_surface(display):
+    cache = sthelper.TextCache(1)
+    cache.render('Text', 24, RED)
+    text = cache.render('More text', 24, RED)
+    assert cache.get_stats()['surfaces'] == 1
+    assert cache.render('More text', 24, RED) is text
+    cache.clear()
+    assert cache.get_stats()['bytes'] == 0
+
+
+def test_get_font_shares_fonts():
+    font = sthelper.get_font(20)
+    assert sthelper.get_font(20) is font
+    assert sthelper.get_font(21) is not font
+    assert sthelper.get_font(20, 'freesansbold.ttf') is not font
+
+
+def test_get_font_keeps_the_recently_used_fonts(monkeypatch):
+    monkeypatch.setattr(stconfig, 'FONT_CACHE_SIZE', 2)
+    monkeypatch.setattr(sthelper, 'fonts', OrderedDict())
+    font = sthelper.get_font(10)
+    sthelper.get_font(11)
+    assert sthelper.get_font(10) is font
+    sthelper.get_font(12)
+    assert list(sthelper.fonts) == [(None, 10), (None, 12)]
+
+
+def test_asset_manager_decodes_images_once(display):
+    assets = sthelper.AssetManager()
+    image = assets.get_image('dice_1.png', True)
+    assert assets.get_image('dice_1.png', True) is image
+    opaque = assets.get_image('dice_1.png')
+    assert opaque is not image
+    assert assets.get_image('dice_1.png') is opaque
+
+
+def test_asset_manager_shares_sounds(display):
+    try:
+        pg.mixer.init()
+    except pg.error:
+        pytest.skip('no sound device')
+    try:
+        assets = sthelper.AssetManager()
+        sound = assets.get_sound('bathroom.wav')
+        assert assets.get_sound('bathroom.wav') is sound
+        quiet = assets.get_sound('bathroom.wav', 0.5)
+        assert quiet is not sound
+        assert assets.get_sound('bathroom.wav', 0.5) is quiet
+        assert sound.get_volume() == pytest.approx(1.0)
+        assert quiet.get_volume() == pytest.approx(0.5, abs=0.01)
+    finally:
+        pg.mixer.quit()
+
+
+def test_scaled_images_of_old_sizes_are_dropped(display, monkeypatch):
+    assets = sthelper.AssetManager()
+    image = assets.get_image('dice_1.png', True)
+    assert assets.scale_image(image, 1) is image
+    half = assets.scale_image(image, 0.5)
+    assert assets.scale_image(image, 0.5) is half
+    assert half.get_width() == int(image.get_width()*0.5)
+
+    monkeypatch.setattr(stconfig, 'SCALED_IMAGE_CACHE_SIZE', 0)
+    larger = assets.scale_image(image, 1.5)
+    assert list(assets.scaled_images.values()) == [larger]
+    assert assets.get_memory_usage()['scaled_images'] == \
+        larger.get_pitch()*larger.get_height()
+
+
+def test_merge_rects_clips_and_merges():
+    bounds = pg.Rect(0, 0, 100, 100)
+    rects = sthelper.merge_rects([(0, 0, 10, 10), (5, 5, 10, 10), (50, 50, 10, 10),
+                                  (95, 95, 10, 10), (200, 200, 5, 5)], bounds)
+    assert sorted(tuple(rect) for rect in rects) == [
+        (0, 0, 15, 15), (50, 50, 10, 10), (95, 95, 5, 5)]
+
+
+def test_merge_rects_merges_the_rects_a_union_overlaps():
+    rects = sthelper.merge_rects([(0, 0, 10, 10), (20, 0, 10, 10), (5, 0, 20, 5)],
+                                 pg.Rect(0, 0, 100, 100))
+    assert rects == [pg.Rect(0, 0, 30, 10)]
+
+
+def test_compositor_redraws_only_the_changed_areas(display):
+    screen = pg.Surface((100, 100))
+    compositor = sthelper.Compositor(['back', 'front'])
+    back = pg.Surface((100, 100))
+    back.fill(RED)
+    compositor['back'].set_surface(back)
+    assert compositor.compose(screen) == [pg.Rect(0, 0, 100, 100)]
+    assert compositor.compose(screen) == []
+
+    dot = pg.Surface((10, 10))
+    dot.fill(BLUE)
+    compositor['front'].blit(dot, (20, 20))
+    assert compositor.compose(screen) == [pg.Rect(20, 20, 10, 10)]
+    assert screen.get_at((25, 25)) == BLUE
+    compositor['front'].blit(dot, (20, 20))
+    assert compositor.compose(screen) == []
+
+    # the area of the removed dot is drawn again from the layer below
+    assert compositor.compose(screen) == [pg.Rect(20, 20, 10, 10)]
+    assert screen.get_at((25, 25)) == RED
+
+    compositor.invalidate()
+    assert compositor.compose(screen) == [pg.Rect(0, 0, 100, 100)]
@@ -0,0 +1,42 @@
+import pytest
+pg = pytest.importorskip('pygame')
+import stconfig
+import stlayout
+import sthelper
+
+DEFAULT_SIZE = (stconfig.ST_SCREEN_WIDTH, stconfig.ST_SCREEN_HEIGHT)
+MIN_SIZE = (stconfig.MIN_SCREEN_WIDTH, stconfig.MIN_SCREEN_HEIGHT)
+# longest line of the help page
+LONGEST_LINE = "Eugene calls Nick and has a new task for him. Nick must either move 4 squares back or lose 2 Time Points."
+
+
+def test_default_size_is_not_scaled():
+    layout = stlayout.Layout(DEFAULT_SIZE)
+    assert layout.scale == 1
+    assert layout.popup.size == (stconfig.POPUP_WIDTH, stconfig.POPUP_HEIGHT)
+    assert layout.get_page_line(2) == 110 + 2*37
+    assert layout.get_page_square(1) == pg.Rect(50, 330 + 42, 140, 32)
+    assert layout.get_page_square_text(1) == (200, 339 + 42)
+
+
+@pytest.mark.parametrize('size', [MIN_SIZE, DEFAULT_SIZE, (1920, 1080)])
+def test_pages_fit_between_the_topbar_and_the_toolbar(size):
+    pg.font.init()
+    layout = stlayout.Layout(size)
+    assert layout.get_page_line(0) >= layout.topbar.bottom
+    assert layout.get_page_square(0).top > layout.get_page_line(5)
+    assert layout.get_page_square(6).bottom <= size[1]
+    text = sthelper.render_text(LONGEST_LINE, layout.page_text_size, stconfig.ST_BLACK)
+    assert layout.get_page_square_text(0)[0] + text.get_width() <= layout.toolbar.left
+
+
+def test_layouts_of_old_sizes_are_dropped(monkeypatch):
+    monkeypatch.setattr(stlayout, 'layouts', stlayout.OrderedDict())
+    layout = stlayout.get_layout(DEFAULT_SIZE)
+    for width in range(MIN_SIZE[0], MIN_SIZE[0] + stconfig.LAYOUT_CACHE_SIZE - 1):
+        stlayout.get_layout((width, MIN_SIZE[1]))
+    assert stlayout.get_layout(list(DEFAULT_SIZE)) is layout
+    for width in range(MIN_SIZE[0], MIN_SIZE[0] + stconfig.LAYOUT_CACHE_SIZE):
+        stlayout.get_layout((width + 100, MIN_SIZE[1]))
+    assert len(stlayout.layouts) == stconfig.LAYOUT_CACHE_SIZE
+    assert stlayout.get_layout(DEFAULT_SIZE) is not layout
@@ -0,0 +1,50 @@
+import os
+import random
+import subprocess
+import sys
+import pytest
+import strules
+
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_back_without_dcrystal_must_move_back():
+    state = strules.GameState(dcrystals=0)
+    state.position = 16
+    state.roll(6)
+    assert (state.position, state.choice) == (22, 'back')
+    assert state.get_choices() == ('back',)
+    with pytest.raises(ValueError):
+        state.choose('dcrystals')
+    assert state.choose('back')
+    assert state.position == 15
+
+
+def test_back_with_dcrystal_pays_it():
+    state = strules.GameState(dcrystals=1)
+    state.position = 16
+    state.roll(6)
+    assert not state.choose('dcrystals')
+    assert (state.position, state.dcrystals, state.choice) == (22, 0, None)
+
+
+def test_choose_needs_pending_choice():
+    state = strules.GameState()
+    with pytest.raises(ValueError):
+        state.choose('back')
+
+
+def test_play_game_always_ends():
+    rng = random.Random(1)
+    for i in range(200):
+        state = strules.play_game(lambda: rng.randint(1, 6),
+                                  lambda state: state.get_choices()[-1])
+        assert state.end
+        assert state.won == (state.tpoints > 0)
+
+
+def test_default_board_is_loaded_when_needed():
+    # a new interpreter, the tests have already loaded the board
+    code = ('import strules, stsim, stsolver; assert strules.default_board is None; '
+            'strules.GameState(); assert strules.default_board is not None')
+    subprocess.check_call([sys.executable, '-c', code], cwd=root_dir)
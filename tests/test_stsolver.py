@@ -0,0 +1,30 @@
+import os
+import pytest
+np = pytest.importorskip('numpy')
+import stsim
+import stsolver
+
+
+def test_optimal_policy_wins_most():
+    optimal = stsolver.solve(stsolver.solve_optimal(cache=False), cache=False)
+    for policy in (stsim.DEFAULT_POLICY, {'telephone': 'back', 'kitchen': 'forward',
+                                          'back': 'back', 'risk': 'bathroom'}):
+        solution = stsolver.solve(policy, cache=False)
+        assert optimal.get_win_probability() >= solution.get_win_probability()
+
+
+def test_corrupt_cache_is_solved_again(tmp_path, monkeypatch):
+    monkeypatch.setattr(stsolver, 'cache_dir', str(tmp_path))
+    monkeypatch.setattr(stsolver, 'optimal_policies', {})
+    monkeypatch.setattr(stsolver, 'solutions', {})
+    optimal = stsolver.solve_optimal()
+    solution = stsolver.solve(optimal)
+    files = os.listdir(str(tmp_path))
+    assert len(files) == 2
+    for name in files:
+        with open(os.path.join(str(tmp_path), name), 'wb') as f:
+            f.write(b'PK\3\4garbage')
+    stsolver.optimal_policies.clear()
+    stsolver.solutions.clear()
+    assert stsolver.solve(stsolver.solve_optimal()).get_win_probability() == \
+        pytest.approx(solution.get_win_probability())